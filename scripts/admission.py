@@ -0,0 +1,156 @@
+import contextvars
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict
+
+from settings import (
+    ADMISSION_MAX_IN_FLIGHT, ADMISSION_MAX_QUEUE, ADMISSION_QUEUE_TIMEOUT_MS,
+    RETRIEVAL_WORKERS, GENERATION_WORKERS
+)
+
+
+class Overloaded(Exception):
+    def __init__(self, retry_after: int):
+        """الطلب رُفض لامتلاء النظام؛ retry_after بالثواني"""
+        super().__init__(f"النظام مشغول - أعد المحاولة بعد {retry_after} ثانية")
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    def __init__(self, max_in_flight: int = ADMISSION_MAX_IN_FLIGHT,
+                 max_queue: int = ADMISSION_MAX_QUEUE,
+                 queue_timeout_ms: float = ADMISSION_QUEUE_TIMEOUT_MS):
+        """حد أقصى للطلبات قيد التنفيذ وطابور انتظار محدود، والرفض السريع عند الامتلاء"""
+        self.max_in_flight = max_in_flight
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = max(0.0, queue_timeout_ms) / 1000.0
+
+        self._condition = threading.Condition()
+        self._in_flight = 0
+        self._waiting = 0
+        self._admitted = 0
+        self._rejected = 0
+        # متوسط زمن الخدمة (متوسط متحرك أسي) لتقدير Retry-After
+        self._avg_service = 1.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_in_flight > 0
+
+    def retry_after(self) -> int:
+        """تقدير الوقت حتى يتفرغ مكان: زمن الخدمة × (المنتظرون + 1) / السعة"""
+        slots = max(1, self.max_in_flight)
+        return max(1, math.ceil(self._avg_service * (self._waiting + 1) / slots))
+
+    def acquire(self):
+        """حجز مكان أو الانتظار في الطابور، وإلا رفع Overloaded فوراً"""
+        if not self.enabled:
+            return
+        with self._condition:
+            if self._in_flight < self.max_in_flight:
+                self._in_flight += 1
+                self._admitted += 1
+                return
+            if self._waiting >= self.max_queue:
+                self._rejected += 1
+                raise Overloaded(self.retry_after())
+
+            self._waiting += 1
+            try:
+                admitted = self._condition.wait_for(
+                    lambda: self._in_flight < self.max_in_flight, timeout=self.queue_timeout
+                )
+            finally:
+                self._waiting -= 1
+            if not admitted:
+                self._rejected += 1
+                raise Overloaded(self.retry_after())
+            self._in_flight += 1
+            self._admitted += 1
+
+    def release(self, service_time: float = None):
+        if not self.enabled:
+            return
+        with self._condition:
+            self._in_flight -= 1
+            if service_time is not None:
+                self._avg_service = 0.8 * self._avg_service + 0.2 * service_time
+            self._condition.notify()
+
+    @contextmanager
+    def admit(self):
+        """حجز مكان طوال تنفيذ الكتلة"""
+        self.acquire()
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - start)
+
+    def stats(self) -> Dict:
+        with self._condition:
+            return {
+                'enabled': self.enabled,
+                'max_in_flight': self.max_in_flight,
+                'max_queue': self.max_queue,
+                'in_flight': self._in_flight,
+                'waiting': self._waiting,
+                'admitted': self._admitted,
+                'rejected': self._rejected,
+                'avg_service_ms': self._avg_service * 1000
+            }
+
+
+class StageExecutor:
+    def __init__(self, name: str, workers: int):
+        """مجمع خيوط محدود لمرحلة حسابية (0 = التنفيذ على خيط الطلب نفسه)"""
+        self.name = name
+        self.workers = workers
+        # خيوط المجمع تُنشأ عند أول إرسال، فلا تُنشأ في العملية الرئيسية قبل fork
+        self._pool = ThreadPoolExecutor(workers, thread_name_prefix=f"stage-{name}") if workers > 0 else None
+
+    def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """تشغيل المرحلة ضمن حد التوازي الخاص بها وانتظار نتيجتها
+
+        خيط الطلب يبقى محجوزاً حتى تنتهي المرحلة: المجمع يحد التوازي الحسابي فقط،
+        أما عدد خيوط الطلبات المنتظرة فيحده متحكم القبول"""
+        if self._pool is None:
+            return fn(*args, **kwargs)
+        # نقل سياق الطلب (مثل توقيتات المراحل) إلى خيط المجمع
+        context = contextvars.copy_context()
+        return self._pool.submit(context.run, fn, *args, **kwargs).result()
+
+
+_admission = None
+_executors: Dict[str, StageExecutor] = {}
+_lock = threading.Lock()
+
+_STAGE_WORKERS = {
+    'retrieval': RETRIEVAL_WORKERS,
+    'generation': GENERATION_WORKERS
+}
+
+
+def get_admission_controller() -> AdmissionController:
+    """متحكم القبول المشترك في العملية"""
+    global _admission
+    if _admission is None:
+        with _lock:
+            if _admission is None:
+                _admission = AdmissionController()
+    return _admission
+
+
+def get_stage_executor(stage: str) -> StageExecutor:
+    """مجمع خيوط واحد مشترك لكل مرحلة"""
+    executor = _executors.get(stage)
+    if executor is None:
+        with _lock:
+            executor = _executors.get(stage)
+            if executor is None:
+                executor = StageExecutor(stage, _STAGE_WORKERS.get(stage, 0))
+                _executors[stage] = executor
+    return executor
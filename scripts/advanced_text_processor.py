@@ -1,6 +1,7 @@
 import re
 import string
 import os
+from collections import Counter
 from typing import List, Dict, Tuple
 import nltk
 from nltk.corpus import stopwords
@@ -11,10 +12,12 @@ from nltk.tag import pos_tag
 import numpy as np
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
-from sentence_transformers import SentenceTransformer
 import spacy
 from textblob import TextBlob
-import difflib
+from keyword_matcher import KeywordMatcher
+from model_registry import get_model_registry
+from metrics import record_model_call
+from similarity_kernels import hashed_shingles, ngram_jaccard_many, sequence_ratio, tfidf_pair_cosine
 
 class AdvancedArabicProcessor:
     def __init__(self):
@@ -61,7 +64,12 @@ class AdvancedArabicProcessor:
         except Exception as e:
             print(f"تحذير: خطأ في إعداد موارد NLTK - سيتم استخدام التحليل البسيط: {str(e)}")       
         self.stemmer = ISRIStemmer()
-        self.sentence_model = SentenceTransformer('paraphrase-multilingual-MiniLM-L12-v2')
+        # نموذج التمثيل مشترك مع المسترجع عبر سجل النماذج
+        self.sentence_model_name = 'paraphrase-multilingual-MiniLM-L12-v2'
+        self.model_registry = get_model_registry()
+        
+        # محلل TF-IDF (كلمات وثنائيات) المستخدم في حساب التشابه بين الأزواج
+        self._tfidf_analyzer = TfidfVectorizer(ngram_range=(1, 2)).build_analyzer()
         
        
         self.arabic_stopwords = set([
@@ -92,6 +100,10 @@ class AdvancedArabicProcessor:
         except:
             self.nlp = None
     
+    @property
+    def sentence_model(self):
+        return self.model_registry.get_encoder(self.sentence_model_name)
+    
     def advanced_clean_text(self, text: str) -> str:
         
         if not text:
@@ -239,121 +251,138 @@ class AdvancedArabicProcessor:
     
     def calculate_advanced_similarity(self, text1: str, text2: str) -> Dict:
         """حساب التشابه المتقدم بين النصوص"""
-        # تنظيف النصوص
-        clean1 = self.advanced_clean_text(text1)
-        clean2 = self.advanced_clean_text(text2)
-        
-        similarities = {}
-        
-        # 1. Jaccard Similarity with n-grams
-        def get_ngrams(text, n):
-            words = text.split()
-            ngrams = []
-            for i in range(len(words) - n + 1):
-                ngrams.append(' '.join(words[i:i+n]))
-            return set(ngrams)
-        
-        # حساب تشابه جاكارد للكلمات المفردة و الثنائية والثلاثية
-        unigrams_sim = 0
-        bigrams_sim = 0
-        trigrams_sim = 0
-        
-        # Unigrams
-        set1_uni = set(clean1.split())
-        set2_uni = set(clean2.split())
-        inter_uni = len(set1_uni.intersection(set2_uni))
-        union_uni = len(set1_uni.union(set2_uni))
-        unigrams_sim = inter_uni / union_uni if union_uni > 0 else 0.0
-        
-        # Bigrams
-        set1_bi = get_ngrams(clean1, 2)
-        set2_bi = get_ngrams(clean2, 2)
-        inter_bi = len(set1_bi.intersection(set2_bi))
-        union_bi = len(set1_bi.union(set2_bi))
-        bigrams_sim = inter_bi / union_bi if union_bi > 0 else 0.0
-        
-        # Trigrams
-        set1_tri = get_ngrams(clean1, 3)
-        set2_tri = get_ngrams(clean2, 3)
-        inter_tri = len(set1_tri.intersection(set2_tri))
-        union_tri = len(set1_tri.union(set2_tri))
-        trigrams_sim = inter_tri / union_tri if union_tri > 0 else 0.0
-        
-        # Combined Jaccard similarity with weights
-        similarities['jaccard'] = (unigrams_sim * 0.5 + bigrams_sim * 0.3 + trigrams_sim * 0.2)
-        
-        # 2. Cosine Similarity using TF-IDF with better error handling
+        return self.calculate_similarity_matrix([text1], [text2])[0][0]
+    
+    def _similarity_features(self, text: str) -> Dict:
+        """الخصائص المستقلة عن الزوج لكل نص: تُحسب مرة واحدة مهما تعددت المقارنات"""
+        clean = self.advanced_clean_text(text)
+        words = clean.split()
+        
+        # كثافة المحتوى المعلوماتي
+        unique_words = set(words)
+        total_chars = sum(len(word) for word in unique_words)
+        
+        # تقييم جودة الإجابة: طول مناسب، وجود أرقام أو رموز خاصة
+        length_score = min(1.0, len(words) / 20)  # الطول المثالي حوالي 20 كلمة
+        has_numbers = any(char.isdigit() for char in clean)
+        has_special_chars = any(char in '٪$@#' for char in clean)
+        format_score = (0.7 + (0.15 if has_numbers else 0) + (0.15 if has_special_chars else 0))
+        
+        return {
+            'clean': clean,
+            'num_words': len(words),
+            'shingles': hashed_shingles(words),
+            'tfidf_counts': Counter(self._tfidf_analyzer(clean)),
+            'info_density': len(unique_words) / total_chars if total_chars > 0 else 0,
+            'quality': length_score * 0.7 + format_score * 0.3
+        }
+    
+    def embed_texts(self, texts: List[str]) -> Dict[str, np.ndarray]:
+        """تمثيلات مطبعة للنصوص الفريدة بدفعة واحدة، بمفتاح النص الأصلي؛ تُمرر إلى
+        calculate_similarity_matrix لإعادة استخدامها بدلاً من ترميز النصوص نفسها مرة أخرى"""
+        unique_texts = list(dict.fromkeys(texts))
+        if not unique_texts:
+            return {}
         try:
-            vectorizer = TfidfVectorizer(ngram_range=(1, 2))  # Include bigrams
-            tfidf_matrix = vectorizer.fit_transform([clean1, clean2])
-            cosine_sim = cosine_similarity(tfidf_matrix[0:1], tfidf_matrix[1:2])[0][0]
-            similarities['cosine_tfidf'] = float(cosine_sim)
+            embeddings = np.asarray(self.sentence_model.encode(
+                [self.advanced_clean_text(text) for text in unique_texts]
+            ))
+            record_model_call('encoder', 'similarity', len(unique_texts))
         except Exception as e:
-            print(f"تحذير في حساب تشابه TF-IDF: {str(e)}")
-            similarities['cosine_tfidf'] = 0.0
-        
-        # 3. Semantic Similarity using Sentence Transformers with confidence
+            print(f"تحذير في حساب التشابه الدلالي: {str(e)}")
+            return {}
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        embeddings = embeddings / np.where(norms == 0, 1, norms)
+        return dict(zip(unique_texts, embeddings))
+    
+    def calculate_similarity_matrix(self, texts1: List[str], texts2: List[str],
+                                    embeddings: Dict[str, np.ndarray] = None) -> List[List[Dict]]:
+        """حساب التشابه المتقدم لكل زوج (texts1[i], texts2[j]) بتمرير واحد:
+        تنظيف وتجزئة كل نص مرة واحدة ودفعة تمثيل واحدة لجميع النصوص
+        (embeddings: تمثيلات محسوبة مسبقاً من embed_texts؛ يُرمَّز الباقي فقط)"""
+        unique_texts = list(dict.fromkeys(list(texts1) + list(texts2)))
+        features = {text: self._similarity_features(text) for text in unique_texts}
+        
+        # 3. دفعة تمثيل واحدة للنصوص الفريدة التي لا يوجد تمثيلها مسبقاً
+        semantic_matrix = None
+        known = embeddings if embeddings is not None else {}
+        missing = [text for text in unique_texts if text not in known]
         try:
-            embeddings = self.sentence_model.encode([clean1, clean2])
-            semantic_sim = cosine_similarity([embeddings[0]], [embeddings[1]])[0][0]
-            # تطبيق معامل ثقة للتشابه الدلالي
-            confidence = min(len(clean1.split()), len(clean2.split())) / 20  # معامل ثقة بناءً على طول النص
-            confidence = min(1.0, max(0.5, confidence))  # تقييد معامل الثقة بين 0.5 و 1.0
-            similarities['semantic'] = float(semantic_sim * confidence)
+            if missing:
+                encoded = np.asarray(self.sentence_model.encode([features[t]['clean'] for t in missing]))
+                record_model_call('encoder', 'similarity', len(missing))
+                norms = np.linalg.norm(encoded, axis=1, keepdims=True)
+                known = {**known, **dict(zip(missing, encoded / np.where(norms == 0, 1, norms)))}
+            rows = np.stack([known[t] for t in texts1]) if texts1 else None
+            cols = np.stack([known[t] for t in texts2]) if texts2 else None
+            if rows is not None and cols is not None:
+                semantic_matrix = rows @ cols.T
         except Exception as e:
             print(f"تحذير في حساب التشابه الدلالي: {str(e)}")
-            similarities['semantic'] = 0.0
-        
-        # 4. Sequence Similarity
-        similarities['sequence'] = difflib.SequenceMatcher(None, clean1, clean2).ratio()
-        
-        # حساب مقاييس إضافية للتشابه
-        
-        # 5. تشابه المحتوى المعلوماتي
-        def information_density(text):
-            words = set(text.split())
-            total_chars = sum(len(word) for word in words)
-            return len(words) / total_chars if total_chars > 0 else 0
-        
-        info_sim1 = information_density(clean1)
-        info_sim2 = information_density(clean2)
-        similarities['info_density'] = 1 - abs(info_sim1 - info_sim2)
-        
-        # 6. تقييم جودة الإجابة
-        def answer_quality(text):
-            words = text.split()
-            # عوامل الجودة: طول مناسب، وجود كلمات مفتاحية محددة
-            length_score = min(1.0, len(words) / 20)  # الطول المثالي حوالي 20 كلمة
-            has_numbers = any(char.isdigit() for char in text)
-            has_special_chars = any(char in '٪$@#' for char in text)
-            format_score = (0.7 + (0.15 if has_numbers else 0) + (0.15 if has_special_chars else 0))
-            return (length_score * 0.7 + format_score * 0.3)
-        
-        similarities['quality'] = answer_quality(clean2)
-        
-        # حساب التشابه المركب مع الأوزان المحسنة
-        similarities['composite'] = (
-            similarities['jaccard'] * 0.25 +      # تشابه المحتوى
-            similarities['cosine_tfidf'] * 0.20 + # تشابه الكلمات
-            similarities['semantic'] * 0.30 +     # التشابه الدلالي
-            similarities['sequence'] * 0.10 +     # تشابه التسلسل
-            similarities['info_density'] * 0.05 + # كثافة المعلومات
-            similarities['quality'] * 0.10        # جودة الإجابة
-        )
-        
-        # إضافة تصنيف الثقة
-        if similarities['composite'] > 0.8:
-            similarities['confidence'] = 'عالية جداً'
-        elif similarities['composite'] > 0.6:
-            similarities['confidence'] = 'عالية'
-        elif similarities['composite'] > 0.4:
-            similarities['confidence'] = 'متوسطة'
-        elif similarities['composite'] > 0.2:
-            similarities['confidence'] = 'منخفضة'
-        else:
-            similarities['confidence'] = 'منخفضة جداً'
-        
-        return similarities
+        
+        others_shingles = [features[text2]['shingles'] for text2 in texts2]
+        matrix = []
+        for i, text1 in enumerate(texts1):
+            f1 = features[text1]
+            # 1. تشابه جاكارد للـ n-grams بين النص وجميع نصوص العمود دفعة واحدة
+            jaccard_row = ngram_jaccard_many(f1['shingles'], others_shingles)
+            row = []
+            for j, text2 in enumerate(texts2):
+                f2 = features[text2]
+                similarities = {}
+                
+                # 1. Jaccard Similarity with n-grams
+                # تشابه جاكارد للكلمات المفردة والثنائية والثلاثية عبر تجزئات صحيحة بدلاً من مجموعات نصية
+                similarities['jaccard'] = float(jaccard_row[j])
+                
+                # 2. Cosine Similarity using TF-IDF (مكافئ لملاءمة المتجه على النصين فقط)
+                similarities['cosine_tfidf'] = tfidf_pair_cosine(f1['tfidf_counts'], f2['tfidf_counts'])
+                
+                # 3. Semantic Similarity using Sentence Transformers with confidence
+                if semantic_matrix is not None:
+                    # تطبيق معامل ثقة للتشابه الدلالي
+                    confidence = min(f1['num_words'], f2['num_words']) / 20  # معامل ثقة بناءً على طول النص
+                    confidence = min(1.0, max(0.5, confidence))  # تقييد معامل الثقة بين 0.5 و 1.0
+                    similarities['semantic'] = float(semantic_matrix[i, j] * confidence)
+                else:
+                    similarities['semantic'] = 0.0
+                
+                # 4. Sequence Similarity
+                # difflib على مستوى الأحرف للنصوص القصيرة فقط، وعلى مستوى الكلمات للسياقات الطويلة
+                similarities['sequence'] = sequence_ratio(f1['clean'], f2['clean'])
+                
+                # 5. تشابه المحتوى المعلوماتي
+                similarities['info_density'] = 1 - abs(f1['info_density'] - f2['info_density'])
+                
+                # 6. تقييم جودة الإجابة
+                similarities['quality'] = f2['quality']
+                
+                # حساب التشابه المركب مع الأوزان المحسنة
+                similarities['composite'] = (
+                    similarities['jaccard'] * 0.25 +      # تشابه المحتوى
+                    similarities['cosine_tfidf'] * 0.20 + # تشابه الكلمات
+                    similarities['semantic'] * 0.30 +     # التشابه الدلالي
+                    similarities['sequence'] * 0.10 +     # تشابه التسلسل
+                    similarities['info_density'] * 0.05 + # كثافة المعلومات
+                    similarities['quality'] * 0.10        # جودة الإجابة
+                )
+                
+                # إضافة تصنيف الثقة
+                if similarities['composite'] > 0.8:
+                    similarities['confidence'] = 'عالية جداً'
+                elif similarities['composite'] > 0.6:
+                    similarities['confidence'] = 'عالية'
+                elif similarities['composite'] > 0.4:
+                    similarities['confidence'] = 'متوسطة'
+                elif similarities['composite'] > 0.2:
+                    similarities['confidence'] = 'منخفضة'
+                else:
+                    similarities['confidence'] = 'منخفضة جداً'
+                
+                row.append(similarities)
+            matrix.append(row)
+        
+        return matrix
     
     def simple_sentence_tokenize(self, text: str) -> List[str]:
         """تقسيم بسيط للنص إلى جمل"""
@@ -390,9 +419,22 @@ class AdvancedArabicProcessor:
             # إرجاع النص كاملاً كجملة واحدة كحل بديل نهائي
             return [text.strip()] if text.strip() else []
 
-    def extract_answer_candidates(self, question: str, context: str) -> List[Dict]:
+    def build_question_matcher(self, question_info: Dict) -> KeywordMatcher:
+        """بناء مطابق واحد للكلمات المفتاحية والكيانات الخاصة بالسؤال"""
+        patterns = list(question_info['keywords'])
+        patterns.extend(entity['text'] for entity in question_info['entities'])
+        return KeywordMatcher(patterns)
+
+    def extract_answer_candidates(self, question: str, context: str,
+                                  question_info: Dict = None,
+                                  matcher: KeywordMatcher = None) -> List[Dict]:
         """استخراج مرشحي الإجابات من السياق"""
-        question_info = self.extract_question_type(question)
+        if question_info is None:
+            question_info = self.extract_question_type(question)
+        if matcher is None:
+            matcher = self.build_question_matcher(question_info)
+        
+        entity_texts = [entity['text'] for entity in question_info['entities']]
         
         # اختيار طريقة التقسيم المناسبة للجمل
         sentences = []
@@ -409,26 +451,19 @@ class AdvancedArabicProcessor:
         
         candidates = []
         
-        for i, sentence in enumerate(sentences):
-            if len(sentence.strip()) < 10:
-                continue
-            
-            # حساب التشابه مع السؤال
-            similarity = self.calculate_advanced_similarity(question, sentence)
-            
-            # فحص وجود الكلمات المفتاحية
-            keyword_score = 0
-            for keyword in question_info['keywords']:
-                if keyword in sentence:
-                    keyword_score += 1
-            keyword_score = keyword_score / len(question_info['keywords']) if question_info['keywords'] else 0
+        # حساب التشابه بين السؤال وجميع الجمل المؤهلة بتمرير واحد
+        eligible = [(i, sentence) for i, sentence in enumerate(sentences) if len(sentence.strip()) >= 10]
+        similarity_row = self.calculate_similarity_matrix(
+            [question], [sentence for _, sentence in eligible]
+        )[0] if eligible else []
+        
+        for (i, sentence), similarity in zip(eligible, similarity_row):
             
-            # فحص وجود الكيانات
-            entity_score = 0
-            for entity in question_info['entities']:
-                if entity['text'] in sentence:
-                    entity_score += 1
-            entity_score = entity_score / len(question_info['entities']) if question_info['entities'] else 0
+            # فحص وجود الكلمات المفتاحية والكيانات بمسح واحد للجملة
+            found = matcher.matched(sentence)
+            keywords = question_info['keywords']
+            keyword_score = sum(1 for keyword in keywords if keyword in found) / len(keywords) if keywords else 0
+            entity_score = sum(1 for entity in entity_texts if entity in found) / len(entity_texts) if entity_texts else 0
             
             # حساب النتيجة المركبة
             composite_score = (
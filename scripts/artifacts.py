@@ -0,0 +1,173 @@
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from metrics import stage_timer
+
+# embeddings/versions/<الإصدار>/{faiss_index.index, unique_contexts.txt} و embeddings/CURRENT يشير إلى الإصدار النشط
+VERSIONS_DIR = 'versions'
+CURRENT_FILE = 'CURRENT'
+INDEX_FILE = 'faiss_index.index'
+CONTEXTS_FILE = 'unique_contexts.txt'
+
+
+def new_version_name() -> str:
+    return time.strftime('%Y%m%d-%H%M%S')
+
+
+def version_dir(embeddings_dir: str, version: str) -> str:
+    return os.path.join(embeddings_dir, VERSIONS_DIR, version)
+
+
+def read_current_version(embeddings_dir: str) -> Optional[str]:
+    """الإصدار النشط من ملف CURRENT (None إن لم يوجد)"""
+    try:
+        with open(os.path.join(embeddings_dir, CURRENT_FILE), 'r', encoding='utf-8') as f:
+            version = f.read().strip()
+    except FileNotFoundError:
+        return None
+    return version or None
+
+
+def resolve_artifacts(embeddings_dir: str) -> Tuple[Optional[str], str, str]:
+    """(الإصدار، مسار الفهرس، مسار السياقات) للإصدار النشط، أو الملفات المسطحة القديمة
+    في embeddings/ مباشرة عند عدم وجود CURRENT"""
+    version = read_current_version(embeddings_dir)
+    if version:
+        directory = version_dir(embeddings_dir, version)
+        return version, os.path.join(directory, INDEX_FILE), os.path.join(directory, CONTEXTS_FILE)
+    return None, os.path.join(embeddings_dir, INDEX_FILE), os.path.join(embeddings_dir, CONTEXTS_FILE)
+
+
+def publish_version(embeddings_dir: str, version: str):
+    """جعل الإصدار نشطاً باستبدال CURRENT ذرياً (بعد اكتمال كتابة ملفاته)"""
+    directory = version_dir(embeddings_dir, version)
+    for name in (INDEX_FILE, CONTEXTS_FILE):
+        if not os.path.exists(os.path.join(directory, name)):
+            raise FileNotFoundError(f"الإصدار {version} ناقص: لا يوجد {name}")
+    current_path = os.path.join(embeddings_dir, CURRENT_FILE)
+    tmp_path = f"{current_path}.tmp-{os.getpid()}"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(version + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, current_path)
+
+
+def artifacts_fingerprint(embeddings_dir: str) -> Tuple:
+    """بصمة رخيصة للإصدار النشط: اسمه وحجم ووقت تعديل ملفاته"""
+    version, index_path, contexts_path = resolve_artifacts(embeddings_dir)
+    parts = [version]
+    for path in (index_path, contexts_path):
+        try:
+            stat = os.stat(path)
+            parts.append((stat.st_size, stat.st_mtime_ns))
+        except FileNotFoundError:
+            parts.append(None)
+    return tuple(parts)
+
+
+class ArtifactReloader:
+    def __init__(self, retriever, embeddings_dir: str):
+        """إعادة تحميل الفهرس والسياقات دون توقف: يُبنى الإصدار الجديد في الخلفية
+        ثم يُستبدل مرجع حالة المسترجع مرة واحدة، والطلبات الجارية تكمل على الإصدار القديم"""
+        self.retriever = retriever
+        self.embeddings_dir = embeddings_dir
+        self._fingerprint = artifacts_fingerprint(embeddings_dir)
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._watcher = None
+        self.reloads = 0
+        self.failures = 0
+        self.last_reload: Optional[Dict] = None
+
+    @property
+    def version(self) -> Optional[str]:
+        return self.retriever.state.version
+
+    @property
+    def in_progress(self) -> bool:
+        return self._lock.locked()
+
+    def reload(self, force: bool = False) -> Dict:
+        """بناء الإصدار النشط وتبديله إن تغيرت ملفاته (أو دائماً مع force)"""
+        if not self._lock.acquire(blocking=False):
+            return {'status': 'in_progress', 'version': self.version}
+        try:
+            fingerprint = artifacts_fingerprint(self.embeddings_dir)
+            if not force and fingerprint == self._fingerprint:
+                return {'status': 'unchanged', 'version': self.version}
+
+            previous_version = self.version
+            version, index_path, contexts_path = resolve_artifacts(self.embeddings_dir)
+            started = time.perf_counter()
+            try:
+                with stage_timer('artifact_reload'):
+                    state = self.retriever.reload(index_path, contexts_path, version)
+            except Exception as e:
+                self.failures += 1
+                # لا يعيد المراقب المحاولة على الملفات نفسها؛ أي تعديل لاحق يغير البصمة
+                self._fingerprint = fingerprint
+                print(f"تحذير: فشلت إعادة تحميل الإصدار {version}: {e} - يستمر العمل على {previous_version}")
+                self.last_reload = {'status': 'failed', 'version': version, 'error': str(e), 'at': time.time()}
+                return dict(self.last_reload, active_version=previous_version)
+
+            self._fingerprint = fingerprint
+            self.reloads += 1
+            self.last_reload = {
+                'status': 'reloaded',
+                'version': version,
+                'previous_version': previous_version,
+                'contexts': len(state.contexts),
+                'seconds': round(time.perf_counter() - started, 3),
+                'at': time.time()
+            }
+            print(f"🔄 تم تبديل البيانات من الإصدار {previous_version} إلى {version} "
+                  f"({len(state.contexts)} سياق في {self.last_reload['seconds']} ثانية)")
+            return dict(self.last_reload)
+        finally:
+            self._lock.release()
+
+    def reload_in_background(self, force: bool = False) -> bool:
+        """بدء إعادة التحميل في خيط خلفي (False إن كانت إعادة تحميل أخرى جارية)"""
+        if self.in_progress:
+            return False
+        threading.Thread(target=self.reload, args=(force,), name="artifact-reload", daemon=True).start()
+        return True
+
+    def start_watching(self, interval_seconds: float):
+        """مراقبة CURRENT وملفات الإصدار النشط كل interval_seconds ثانية (0 = معطل)"""
+        if interval_seconds <= 0 or self._watcher is not None:
+            return
+
+        def watch():
+            pending = None
+            while not self._stop_event.wait(interval_seconds):
+                fingerprint = artifacts_fingerprint(self.embeddings_dir)
+                if fingerprint == self._fingerprint:
+                    pending = None
+                    continue
+                # انتظار دورة بلا تغيير حتى لا يُحمّل ملف ما زال قيد الكتابة
+                if fingerprint != pending:
+                    pending = fingerprint
+                    continue
+                self.reload()
+                pending = None
+
+        self._stop_event.clear()
+        self._watcher = threading.Thread(target=watch, name="artifact-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self):
+        self._stop_event.set()
+        self._watcher = None
+
+    def stats(self) -> Dict:
+        return {
+            'version': self.version,
+            'in_progress': self.in_progress,
+            'reloads': self.reloads,
+            'failures': self.failures,
+            'last_reload': self.last_reload
+        }
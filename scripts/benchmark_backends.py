@@ -0,0 +1,146 @@
+import os
+import gc
+import re
+import time
+import argparse
+import numpy as np
+from inference_backends import BACKENDS, load_encoder, load_seq2seq_pipeline
+
+ENCODER_NAME = 'paraphrase-multilingual-MiniLM-L12-v2'
+GENERATOR_NAME = 't5-small'
+
+
+def current_rss_mb() -> float:
+    """الذاكرة المقيمة الحالية للعملية بالميجابايت"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def load_samples(contexts_path, limit):
+    """سياقات حقيقية وأسئلة تقريبية (أول جملة من كل سياق) لقياس التوافق"""
+    with open(contexts_path, 'r', encoding='utf-8') as f:
+        contexts = [line.strip() for line in f if line.strip()][:limit]
+    questions = [re.split(r'[.،؟!?]', context)[0][:120] for context in contexts]
+    return contexts, questions
+
+
+def timed_load(loader, *args):
+    gc.collect()
+    rss_before = current_rss_mb()
+    start = time.perf_counter()
+    model = loader(*args)
+    load_time = time.perf_counter() - start
+    return model, load_time, current_rss_mb() - rss_before
+
+
+def normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def benchmark_encoder(backend, contexts, questions):
+    model, load_time, memory = timed_load(load_encoder, ENCODER_NAME, backend)
+
+    # زمن استعلام واحد (المسار الحرج في كل طلب)
+    model.encode(questions[:2])
+    start = time.perf_counter()
+    question_embeddings = [model.encode([question])[0] for question in questions]
+    query_ms = (time.perf_counter() - start) * 1000 / len(questions)
+
+    start = time.perf_counter()
+    context_embeddings = model.encode(contexts, batch_size=32)
+    batch_ms = (time.perf_counter() - start) * 1000 / len(contexts)
+
+    return {
+        'backend': backend,
+        'load_s': load_time,
+        'memory_mb': memory,
+        'query_ms': query_ms,
+        'batch_ms_per_text': batch_ms,
+        'questions': normalize(question_embeddings),
+        'contexts': normalize(context_embeddings)
+    }
+
+
+def benchmark_generator(backend, contexts, questions, reference_answers):
+    generator, load_time, memory = timed_load(load_seq2seq_pipeline, GENERATOR_NAME, backend)
+
+    answers = []
+    start = time.perf_counter()
+    for question, context in zip(questions, contexts):
+        output = generator(
+            f"question: {question} context: {context}",
+            max_new_tokens=48,
+            do_sample=False
+        )
+        answers.append(output[0].get('generated_text', ''))
+    latency_ms = (time.perf_counter() - start) * 1000 / len(questions)
+
+    result = {
+        'backend': backend,
+        'load_s': load_time,
+        'memory_mb': memory,
+        'latency_ms': latency_ms,
+        'answers': answers
+    }
+    if reference_answers is not None:
+        matches = sum(1 for a, b in zip(answers, reference_answers) if a.strip() == b.strip())
+        result['exact_match_to_fp32'] = matches / len(answers)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="مقارنة خلفيات الاستدلال (fp32/int8/onnx) للتمثيل والتوليد")
+    parser.add_argument('--contexts', default=os.path.join("embeddings", "unique_contexts.txt"))
+    parser.add_argument('--samples', type=int, default=32)
+    parser.add_argument('--backends', default=','.join(b for b in BACKENDS if b != 'stub'))
+    parser.add_argument('--skip-generator', action='store_true')
+    args = parser.parse_args()
+
+    contexts, questions = load_samples(args.contexts, args.samples)
+    backends = ['fp32'] + [b for b in args.backends.split(',') if b and b != 'fp32']
+
+    print("=== نموذج التمثيل ===")
+    reference = None
+    for backend in backends:
+        result = benchmark_encoder(backend, contexts, questions)
+        # أقرب سياق لكل سؤال: يقيس هل يغير التكميم ترتيب الاسترجاع
+        top1 = np.argmax(result['questions'] @ result['contexts'].T, axis=1)
+        line = (f"{backend:5s} تحميل {result['load_s']:.1f}s | ذاكرة +{result['memory_mb']:.0f}MB | "
+                f"استعلام {result['query_ms']:.1f}ms | دفعة {result['batch_ms_per_text']:.1f}ms/نص")
+        if reference is None:
+            reference = (result['contexts'], top1)
+        else:
+            cosine = float(np.mean(np.sum(result['contexts'] * reference[0], axis=1)))
+            agreement = float(np.mean(top1 == reference[1]))
+            line += f" | cos مع fp32 {cosine:.4f} | توافق top-1 {agreement:.0%}"
+        print(line)
+        del result
+        gc.collect()
+
+    if args.skip_generator:
+        return
+
+    print("\n=== نموذج التوليد ===")
+    reference_answers = None
+    for backend in backends:
+        result = benchmark_generator(backend, contexts, questions, reference_answers)
+        line = (f"{backend:5s} تحميل {result['load_s']:.1f}s | ذاكرة +{result['memory_mb']:.0f}MB | "
+                f"توليد {result['latency_ms']:.0f}ms/سؤال")
+        if reference_answers is None:
+            reference_answers = result['answers']
+        else:
+            line += f" | تطابق الإجابات مع fp32 {result['exact_match_to_fp32']:.0%}"
+        print(line)
+        gc.collect()
+
+
+if __name__ == "__main__":
+    main()
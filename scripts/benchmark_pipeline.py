@@ -0,0 +1,282 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+import numpy as np
+import pandas as pd
+
+from artifacts import resolve_artifacts
+from decoding import get_generation_cache
+from enhanced_retriever import EnhancedContextRetriever
+from metrics import collect_timings
+from smart_answer_generator import SmartAnswerGenerator
+from settings import (
+    CASCADE_THRESHOLD, DECODING_PROFILE, ENCODER_BACKEND, GENERATOR_BACKEND, GENERATION_BATCHING
+)
+
+VALIDATION_PATH = os.path.join("data", "validation.csv")
+# عينة صغيرة مرفقة بالمستودع (سؤال، سياقه، إجابته) عند عدم توفر بيانات التحقق
+SAMPLE_PATH = os.path.join("data", "sample_questions.csv")
+PERCENTILES = (50, 95, 99)
+
+# المقاييس التي تُقارن بخط الأساس: أعلى أسوأ للأزمنة والذاكرة، وأقل أسوأ للإنتاجية
+LOWER_IS_BETTER = ('_ms', '_mb')
+HIGHER_IS_BETTER = ('throughput_qps',)
+
+
+def default_questions_path() -> str:
+    return VALIDATION_PATH if os.path.exists(VALIDATION_PATH) else SAMPLE_PATH
+
+
+def load_questions(path: str, limit: int = 0) -> List[Dict]:
+    """الأسئلة (مع السياق والإجابة إن وُجدا) من CSV بأعمدة question و context كما في data/validation.csv"""
+    df = pd.read_csv(path)
+    if 'question' not in df.columns:
+        raise ValueError(f"{path} لا يحتوي على عمود question")
+    df = df.dropna(subset=['question'])
+    if limit > 0:
+        df = df.head(limit)
+    return [
+        {
+            'question': str(row['question']).strip(),
+            'context': str(row['context']).strip() if 'context' in df.columns else None,
+            'answer': str(row['answer']).strip() if 'answer' in df.columns and pd.notna(row['answer']) else None
+        }
+        for _, row in df.iterrows()
+    ]
+
+
+def peak_rss_mb() -> float:
+    """أقصى ذاكرة مقيمة وصلتها العملية بالميجابايت"""
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # كيلوبايت على لينكس وبايت على macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def percentiles(values: List[float]) -> Dict:
+    if not values:
+        return {'count': 0}
+    summary = {'count': len(values), 'mean_ms': round(float(np.mean(values)), 3)}
+    for p in PERCENTILES:
+        summary[f'p{p}_ms'] = round(float(np.percentile(values, p)), 3)
+    return summary
+
+
+def load_pipeline(embeddings_dir: str) -> Tuple[EnhancedContextRetriever, SmartAnswerGenerator]:
+    version, index_path, contexts_path = resolve_artifacts(embeddings_dir)
+    retriever = EnhancedContextRetriever(index_path, contexts_path, version=version)
+    return retriever, SmartAnswerGenerator()
+
+
+def run_question(retriever, generator, question: str, top_k: int) -> Dict[str, float]:
+    """سؤال واحد عبر الاسترجاع والتوليد؛ يعيد زمن كل مرحلة بالميلي ثانية"""
+    with collect_timings() as timings:
+        start = time.perf_counter()
+        retrieval = retriever.retrieve_with_context_analysis(question, top_k)
+        retrieved = time.perf_counter()
+        result = generator.generate_smart_answer(question, retrieval.get('analyzed_results', []))
+        finished = time.perf_counter()
+    stages = dict(timings)
+    stages['retrieval'] = (retrieved - start) * 1000
+    stages['answering'] = (finished - retrieved) * 1000
+    stages['total'] = (finished - start) * 1000
+    if result.get('source') == 'error':
+        stages['error'] = 1
+    return stages
+
+
+def run_sequential(retriever, generator, questions: List[Dict], top_k: int) -> Tuple[List[Dict], float]:
+    started = time.perf_counter()
+    runs = [run_question(retriever, generator, item['question'], top_k) for item in questions]
+    return runs, time.perf_counter() - started
+
+
+def run_concurrent(retriever, generator, questions: List[Dict], top_k: int,
+                   concurrency: int) -> Tuple[List[Dict], float]:
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        runs = list(pool.map(lambda item: run_question(retriever, generator, item['question'], top_k), questions))
+    return runs, time.perf_counter() - started
+
+
+def stage_summary(runs: List[Dict]) -> Dict:
+    stages: Dict[str, List[float]] = {}
+    for run in runs:
+        for stage, ms in run.items():
+            if stage != 'error':
+                stages.setdefault(stage, []).append(ms)
+    return {stage: percentiles(values) for stage, values in sorted(stages.items())}
+
+
+def level_summary(runs: List[Dict], wall_seconds: float) -> Dict:
+    summary = percentiles([run['total'] for run in runs])
+    summary['throughput_qps'] = round(len(runs) / wall_seconds, 3) if wall_seconds > 0 else 0.0
+    summary['wall_s'] = round(wall_seconds, 3)
+    summary['errors'] = sum(run.get('error', 0) for run in runs)
+    return summary
+
+
+def benchmark(args) -> Dict:
+    questions = load_questions(args.questions, args.limit)
+    if not questions:
+        raise ValueError(f"لا توجد أسئلة في {args.questions}")
+    levels = sorted({int(level) for level in args.concurrency.split(',') if level.strip()})
+    cache = get_generation_cache()
+
+    load_start = time.perf_counter()
+    retriever, generator = load_pipeline(args.embeddings_dir)
+    load_seconds = time.perf_counter() - load_start
+
+    # الإحماء: تحميل T5 وتهيئة النوى خارج القياس
+    for item in questions[:args.warmup]:
+        run_question(retriever, generator, item['question'], args.top_k)
+    rss_after_load = peak_rss_mb()
+
+    # تمريرة تسلسلية لأزمنة المراحل (بدون تداخل الطلبات)، وتُحتسب كمستوى التزامن 1
+    cache.clear()
+    print(f"تمريرة تسلسلية على {len(questions)} سؤال...")
+    runs, wall = run_sequential(retriever, generator, questions, args.top_k)
+    stages = stage_summary(runs)
+    concurrency = {'1': level_summary(runs, wall)} if 1 in levels else {}
+
+    for level in levels:
+        if level == 1:
+            continue
+        # ذاكرة التوليد تُفرغ حتى لا تقيس المستويات التالية إجابات مخزنة
+        cache.clear()
+        print(f"تزامن {level}...")
+        runs, wall = run_concurrent(retriever, generator, questions, args.top_k, level)
+        concurrency[str(level)] = level_summary(runs, wall)
+
+    return {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'questions_file': args.questions,
+            'questions': len(questions),
+            'top_k': args.top_k,
+            'artifact_version': retriever.state.version,
+            'contexts': len(retriever.contexts),
+            'load_s': round(load_seconds, 3),
+            'settings': {
+                'encoder_backend': ENCODER_BACKEND,
+                'generator_backend': GENERATOR_BACKEND,
+                'decoding_profile': DECODING_PROFILE,
+                'cascade_threshold': CASCADE_THRESHOLD,
+                'generation_batching': GENERATION_BATCHING
+            },
+            'python': platform.python_version(),
+            'cpu_count': os.cpu_count()
+        },
+        'stages': stages,
+        'concurrency': concurrency,
+        'memory': {
+            'rss_after_load_mb': round(rss_after_load, 1),
+            'peak_rss_mb': round(peak_rss_mb(), 1)
+        }
+    }
+
+
+def flatten_metrics(results: Dict) -> Dict[str, float]:
+    """المقاييس القابلة للمقارنة بمفاتيح مسطحة مثل stages.generation.p95_ms"""
+    flat = {}
+    for section in ('stages', 'concurrency', 'memory'):
+        for name, value in results.get(section, {}).items():
+            if isinstance(value, dict):
+                for metric, number in value.items():
+                    if metric.endswith(LOWER_IS_BETTER) or metric in HIGHER_IS_BETTER:
+                        flat[f'{section}.{name}.{metric}'] = number
+            elif name.endswith(LOWER_IS_BETTER):
+                flat[f'{section}.{name}'] = value
+    return flat
+
+
+def compare_results(baseline: Dict, current: Dict, threshold: float, min_delta_ms: float) -> List[Dict]:
+    """مقاييس ساءت بأكثر من threshold (نسبة) مقارنة بخط الأساس.
+    فروق الأزمنة الأصغر من min_delta_ms تُعد ضجيجاً."""
+    base_flat, current_flat = flatten_metrics(baseline), flatten_metrics(current)
+    rows = []
+    for key in sorted(set(base_flat) & set(current_flat)):
+        old, new = base_flat[key], current_flat[key]
+        if not old:
+            continue
+        change = (new - old) / old
+        if key.endswith(HIGHER_IS_BETTER):
+            regressed = change < -threshold
+        else:
+            regressed = change > threshold and not (key.endswith('_ms') and new - old < min_delta_ms)
+        rows.append({'metric': key, 'baseline': old, 'current': new,
+                     'change': round(change, 4), 'regression': regressed})
+    return rows
+
+
+def print_results(results: Dict):
+    meta = results['meta']
+    print(f"\n=== {meta['questions']} سؤال | الإصدار {meta['artifact_version'] or 'legacy'} | "
+          f"{meta['settings']} ===")
+    print(f"{'المرحلة':24s} {'p50':>10s} {'p95':>10s} {'p99':>10s}")
+    for stage, summary in results['stages'].items():
+        # مرحلة لم تُنفذ في أي طلب (مثل neural_generation عند تخطيها) لا أزمنة لها
+        if not summary.get('count'):
+            continue
+        print(f"{stage:24s} {summary['p50_ms']:10.1f} {summary['p95_ms']:10.1f} {summary['p99_ms']:10.1f}")
+    print(f"\n{'التزامن':8s} {'سؤال/ث':>10s} {'p50':>10s} {'p95':>10s} {'p99':>10s} {'أخطاء':>8s}")
+    for level, summary in results['concurrency'].items():
+        if not summary.get('count'):
+            continue
+        print(f"{level:8s} {summary['throughput_qps']:10.2f} {summary['p50_ms']:10.1f} "
+              f"{summary['p95_ms']:10.1f} {summary['p99_ms']:10.1f} {summary['errors']:8d}")
+    memory = results['memory']
+    print(f"\nالذاكرة: بعد التحميل {memory['rss_after_load_mb']:.0f}MB | الذروة {memory['peak_rss_mb']:.0f}MB")
+
+
+def print_comparison(rows: List[Dict]) -> int:
+    regressions = [row for row in rows if row['regression']]
+    print(f"\n=== المقارنة مع خط الأساس: {len(regressions)} تراجع من {len(rows)} مقياس ===")
+    for row in regressions:
+        print(f"❌ {row['metric']:45s} {row['baseline']:12.2f} → {row['current']:12.2f} ({row['change']:+.1%})")
+    return len(regressions)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="قياس زمن خط المعالجة الكامل (استرجاع + توليد) على أسئلة التحقق")
+    parser.add_argument('--questions', default=default_questions_path(),
+                        help="CSV بعمود question (الافتراضي data/validation.csv أو العينة المرفقة)")
+    parser.add_argument('--limit', type=int, default=50, help="عدد الأسئلة (0 = الكل)")
+    parser.add_argument('--concurrency', default='1,2,4', help="مستويات التزامن مفصولة بفواصل")
+    parser.add_argument('--top-k', type=int, default=3)
+    parser.add_argument('--warmup', type=int, default=2, help="أسئلة إحماء لا تُحتسب")
+    parser.add_argument('--embeddings-dir', default="embeddings")
+    parser.add_argument('--output', default="benchmark_pipeline.json")
+    parser.add_argument('--compare', help="ملف نتائج سابق يُعد خط الأساس")
+    parser.add_argument('--current', help="مقارنة ملف نتائج موجود بدلاً من تشغيل القياس")
+    parser.add_argument('--threshold', type=float, default=0.10, help="نسبة التراجع المسموحة (0.10 = 10%%)")
+    parser.add_argument('--min-delta-ms', type=float, default=1.0, help="أصغر فرق زمني يُعد تراجعاً")
+    args = parser.parse_args()
+
+    if args.current:
+        with open(args.current, 'r', encoding='utf-8') as f:
+            results = json.load(f)
+    else:
+        results = benchmark(args)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"تم حفظ النتائج في {args.output}")
+    print_results(results)
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('meta', {}).get('settings') != results['meta'].get('settings'):
+            print("تحذير: إعدادات خط الأساس تختلف عن الإعدادات الحالية")
+        # رمز خروج غير صفري عند التراجع ليُستخدم في CI
+        if print_comparison(compare_results(baseline, results, args.threshold, args.min_delta_ms)):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
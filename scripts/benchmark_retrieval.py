@@ -0,0 +1,176 @@
+import os
+import json
+import time
+import argparse
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import faiss
+
+from artifacts import resolve_artifacts
+from benchmark_pipeline import default_questions_path, load_questions
+from build_index import INDEX_TYPES, create_index
+from enhanced_retriever import EnhancedContextRetriever, RetrieverState, SEARCH_MODES
+
+
+def gold_ids(questions: List[Dict], contexts: List[str]) -> Tuple[List[str], List[int]]:
+    """الأسئلة التي يوجد سياقها الذهبي بين السياقات المفهرسة، ورقم ذلك السياق"""
+    positions = {}
+    for idx, context in enumerate(contexts):
+        positions.setdefault(context, idx)
+    matched_questions, matched_ids = [], []
+    for item in questions:
+        idx = positions.get(item['context'])
+        if idx is not None:
+            matched_questions.append(item['question'])
+            matched_ids.append(idx)
+    return matched_questions, matched_ids
+
+
+def load_context_embeddings(retriever: EnhancedContextRetriever, embeddings_path: str) -> np.ndarray:
+    """تمثيلات السياقات مطبعة: من context_embeddings.npy، أو من الفهرس المسطح الحالي، أو بترميزها"""
+    contexts = retriever.contexts
+    if os.path.exists(embeddings_path):
+        embeddings = np.load(embeddings_path).astype(np.float32)
+        if embeddings.shape[0] == len(contexts):
+            faiss.normalize_L2(embeddings)
+            return embeddings
+        print(f"تحذير: عدد التمثيلات في {embeddings_path} لا يطابق السياقات - سيتم تجاهله")
+    try:
+        embeddings = retriever.index.reconstruct_n(0, retriever.index.ntotal).astype(np.float32)
+    except RuntimeError:
+        print("ترميز السياقات (الفهرس الحالي لا يدعم استرجاع المتجهات)...")
+        embeddings = np.asarray(retriever.model.encode(contexts, batch_size=32), dtype=np.float32)
+    faiss.normalize_L2(embeddings)
+    return embeddings
+
+
+def index_size_mb(index) -> float:
+    return faiss.serialize_index(index).nbytes / (1024 * 1024)
+
+
+def quality(results: List[List[Tuple[int, float]]], gold: List[int], ks: List[int]) -> Dict:
+    """recall@k لكل k، و MRR على أطول قائمة"""
+    summary = {}
+    ranks = []
+    for hits, gold_id in zip(results, gold):
+        ids = [idx for idx, _ in hits]
+        ranks.append(ids.index(gold_id) + 1 if gold_id in ids else None)
+    for k in ks:
+        summary[f'recall@{k}'] = round(sum(1 for rank in ranks if rank and rank <= k) / len(gold), 4)
+    summary['mrr'] = round(sum(1.0 / rank for rank in ranks if rank) / len(gold), 4)
+    return summary
+
+
+def single_query_latency(retriever, questions: List[str], mode: str, top_k: int, state) -> Dict:
+    """زمن الاستعلام الواحد كما في /api/retrieve"""
+    latencies = []
+    for question in questions:
+        start = time.perf_counter()
+        retriever.search_ids(question, mode, top_k, state)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return {
+        'p50_ms': round(float(np.percentile(latencies, 50)), 3),
+        'p95_ms': round(float(np.percentile(latencies, 95)), 3),
+        'p99_ms': round(float(np.percentile(latencies, 99)), 3)
+    }
+
+
+def evaluate(retriever, state, questions: List[str], gold: List[int], mode: str,
+             ks: List[int], latency_questions: int) -> Dict:
+    top_k = max(ks)
+    start = time.perf_counter()
+    results = retriever.search_ids_batch(questions, mode, top_k, state)
+    batch_ms = (time.perf_counter() - start) * 1000
+    row = quality(results, gold, ks)
+    row['batch_ms_per_query'] = round(batch_ms / len(questions), 3)
+    row.update(single_query_latency(retriever, questions[:latency_questions], mode, top_k, state))
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description="جودة الاسترجاع مقابل سرعته: recall@k و MRR وزمن الاستعلام لكل نمط ونوع فهرس")
+    parser.add_argument('--questions', default=default_questions_path(),
+                        help="CSV بعمودي question و context (الافتراضي data/validation.csv أو العينة المرفقة)")
+    parser.add_argument('--limit', type=int, default=0, help="عدد الأسئلة (0 = الكل)")
+    parser.add_argument('--k', default='1,3,5,10', help="قيم k لحساب recall@k")
+    parser.add_argument('--modes', default=','.join(SEARCH_MODES))
+    parser.add_argument('--index-types', default=','.join(INDEX_TYPES))
+    parser.add_argument('--hnsw-m', type=int, default=32)
+    parser.add_argument('--hnsw-ef-search', type=int, default=64)
+    parser.add_argument('--ivf-nlist', type=int, default=0, help="عدد العناقيد (0 = الجذر التربيعي لعدد السياقات)")
+    parser.add_argument('--ivf-nprobe', type=int, default=8)
+    parser.add_argument('--latency-queries', type=int, default=100,
+                        help="أسئلة تُقاس فرادى لحساب p50/p95/p99")
+    parser.add_argument('--embeddings-dir', default="embeddings")
+    parser.add_argument('--output', default="benchmark_retrieval.json")
+    args = parser.parse_args()
+
+    ks = sorted({int(k) for k in args.k.split(',') if k.strip()})
+    modes = [mode for mode in args.modes.split(',') if mode]
+    index_types = [index_type for index_type in args.index_types.split(',') if index_type]
+
+    version, index_path, contexts_path = resolve_artifacts(args.embeddings_dir)
+    retriever = EnhancedContextRetriever(index_path, contexts_path, version=version)
+    base = retriever.state
+
+    questions, gold = gold_ids(load_questions(args.questions, args.limit), base.contexts)
+    if not questions:
+        print("لا توجد أسئلة يوجد سياقها الذهبي في السياقات المفهرسة.")
+        return
+    print(f"{len(questions)} سؤال بسياق ذهبي من {args.questions} | {len(base.contexts)} سياق")
+
+    embeddings = load_context_embeddings(retriever, os.path.join(args.embeddings_dir, "context_embeddings.npy"))
+    # إحماء المرمز وTF-IDF خارج القياس
+    retriever.search_ids_batch(questions[:2], 'hybrid', max(ks))
+
+    rows = []
+    keyword_row: Optional[Dict] = None
+    for index_type in index_types:
+        start = time.perf_counter()
+        index = create_index(embeddings.copy(), index_type, args.hnsw_m, args.hnsw_ef_search,
+                             args.ivf_nlist, args.ivf_nprobe)
+        build_s = time.perf_counter() - start
+        # حالة تشارك السياقات و TF-IDF مع الإصدار الحالي وتختلف في الفهرس فقط
+        state = RetrieverState(index, base.contexts, base.tfidf_vectorizer, base.tfidf_matrix, base.version)
+        for mode in modes:
+            # البحث بالكلمات المفتاحية لا يستخدم الفهرس فيُقاس مرة واحدة
+            if mode == 'keyword' and keyword_row is not None:
+                continue
+            row = evaluate(retriever, state, questions, gold, mode, ks, args.latency_queries)
+            row.update({'mode': mode, 'index_type': '-' if mode == 'keyword' else index_type})
+            if mode != 'keyword':
+                row['index_build_s'] = round(build_s, 3)
+                row['index_size_mb'] = round(index_size_mb(index), 2)
+            else:
+                keyword_row = row
+            rows.append(row)
+
+    recall_columns = [f'recall@{k}' for k in ks]
+    header = f"{'النمط':10s} {'الفهرس':7s} " + ' '.join(f'{c:>10s}' for c in recall_columns)
+    print('\n' + header + f" {'MRR':>7s} {'دفعة ms/س':>10s} {'p50':>8s} {'p95':>8s}")
+    for row in rows:
+        print(f"{row['mode']:10s} {row['index_type']:7s} " + ' '.join(f'{row[c]:10.3f}' for c in recall_columns)
+              + f" {row['mrr']:7.3f} {row['batch_ms_per_query']:10.2f} {row['p50_ms']:8.2f} {row['p95_ms']:8.2f}")
+
+    results = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'questions_file': args.questions,
+            'questions': len(questions),
+            'contexts': len(base.contexts),
+            'artifact_version': version,
+            'ks': ks,
+            'params': {
+                'hnsw_m': args.hnsw_m, 'hnsw_ef_search': args.hnsw_ef_search,
+                'ivf_nlist': args.ivf_nlist, 'ivf_nprobe': args.ivf_nprobe
+            }
+        },
+        'results': rows
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"\nتم حفظ النتائج في {args.output}")
+
+
+if __name__ == "__main__":
+    main()
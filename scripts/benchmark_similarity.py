@@ -0,0 +1,76 @@
+import os
+import re
+import time
+import random
+import argparse
+import difflib
+import numpy as np
+from similarity_kernels import sequence_ratio
+
+# وزن تشابه التسلسل في composite (AdvancedArabicProcessor.calculate_similarity_matrix)
+SEQUENCE_COMPOSITE_WEIGHT = 0.10
+
+
+def load_texts(contexts_path):
+    """تحميل السياقات وتطبيع المسافات"""
+    with open(contexts_path, 'r', encoding='utf-8') as f:
+        return [re.sub(r'\s+', ' ', line).strip() for line in f if line.strip()]
+
+
+def build_pairs(texts, num_pairs, seed):
+    """أزواج تمثل الاستخدام الفعلي: جملة مقابل سؤال، إجابة مقابل سياق، وسياق مقابل سياق"""
+    rng = random.Random(seed)
+    sentences = [s.strip() for text in texts for s in re.split(r'[.؟!?]', text) if len(s.strip()) > 10]
+
+    pairs = {'sentence_vs_sentence': [], 'sentence_vs_context': [], 'context_vs_context': []}
+    for _ in range(num_pairs):
+        pairs['sentence_vs_sentence'].append((rng.choice(sentences), rng.choice(sentences)))
+        pairs['sentence_vs_context'].append((rng.choice(sentences), rng.choice(texts)))
+        pairs['context_vs_context'].append((rng.choice(texts), rng.choice(texts)))
+
+    # سياق مقابل نفسه أو جزء منه (حالة التحقق من إجابة مستخرجة)
+    for _ in range(num_pairs // 4):
+        text = rng.choice(texts)
+        pairs['sentence_vs_context'].append((text[:len(text) // 2], text))
+    return pairs
+
+
+def time_kernel(kernel, pairs):
+    """تشغيل دالة التشابه على جميع الأزواج وقياس الزمن"""
+    start = time.perf_counter()
+    values = [kernel(a, b) for a, b in pairs]
+    return np.array(values), time.perf_counter() - start
+
+
+def difflib_ratio(text1, text2):
+    return difflib.SequenceMatcher(None, text1, text2).ratio()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="مقارنة sequence_ratio مع difflib على أحرف النص")
+    parser.add_argument('--contexts', default=os.path.join("embeddings", "unique_contexts.txt"))
+    parser.add_argument('--pairs', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    texts = load_texts(args.contexts)
+    print(f"تم تحميل {len(texts)} سياق")
+
+    for name, pairs in build_pairs(texts, args.pairs, args.seed).items():
+        reference, reference_time = time_kernel(difflib_ratio, pairs)
+        fast, fast_time = time_kernel(sequence_ratio, pairs)
+        diff = np.abs(reference - fast)
+        speedup = reference_time / fast_time if fast_time > 0 else float('inf')
+
+        print(f"\n{name} ({len(pairs)} زوج)")
+        print(f"  difflib:        {reference_time * 1000 / len(pairs):.3f} ms/زوج")
+        print(f"  sequence_ratio: {fast_time * 1000 / len(pairs):.3f} ms/زوج (تسريع {speedup:.1f}x)")
+        print(f"  الفرق المطلق: متوسط {diff.mean():.4f}، أقصى {diff.max():.4f}")
+        # الفرق ينتقل إلى composite مضروباً في وزنه، وقد يقلب عتبتي إزالة التكرار والتتالي القريبتين منه
+        print(f"  الأثر على composite: متوسط {diff.mean() * SEQUENCE_COMPOSITE_WEIGHT:.4f}، "
+              f"أقصى {diff.max() * SEQUENCE_COMPOSITE_WEIGHT:.4f}")
+        print(f"  المتوسط: difflib {reference.mean():.4f}، sequence_ratio {fast.mean():.4f}")
+
+
+if __name__ == "__main__":
+    main()
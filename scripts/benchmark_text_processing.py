@@ -0,0 +1,174 @@
+import os
+import re
+import json
+import time
+import random
+import argparse
+import platform
+import subprocess
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
+
+from advanced_text_processor import AdvancedArabicProcessor
+from benchmark_pipeline import default_questions_path, load_questions
+
+HISTORY_PATH = "benchmark_text_processing.jsonl"
+
+
+def load_inputs(contexts_path: str, questions_path: str, samples: int, seed: int) -> Dict[str, List]:
+    """مدخلات واقعية: سياقات وجمل حقيقية، وأسئلة العينة مع سياقاتها الذهبية"""
+    rng = random.Random(seed)
+    with open(contexts_path, 'r', encoding='utf-8') as f:
+        contexts = [line.strip() for line in f if line.strip()]
+    contexts = rng.sample(contexts, min(samples, len(contexts)))
+    sentences = [s.strip() for text in contexts for s in re.split(r'[.؟!?]', text) if len(s.strip()) > 10]
+
+    items = [item for item in load_questions(questions_path) if item['context']]
+    questions = [item['question'] for item in items]
+    return {
+        'contexts': contexts,
+        'questions': questions,
+        'question_sentence_pairs': [(rng.choice(questions), rng.choice(sentences)) for _ in range(samples)],
+        'question_context_pairs': [(item['question'], item['context']) for item in items]
+    }
+
+
+def build_cases(processor: AdvancedArabicProcessor, inputs: Dict[str, List]) -> Dict[str, Tuple[Callable, List]]:
+    """(الدالة، قائمة المعاملات) لكل دالة مقاسة؛ تُستدعى بالتناوب على المدخلات"""
+    # تحليل السؤال والمطابق يُحسبان مسبقاً كما في SmartAnswerGenerator.extract_candidates
+    candidate_args = []
+    for question, context in inputs['question_context_pairs']:
+        question_info = processor.extract_question_type(question)
+        matcher = processor.build_question_matcher(question_info)
+        candidate_args.append((question, context, question_info, matcher))
+
+    return {
+        'advanced_clean_text': (processor.advanced_clean_text, [(text,) for text in inputs['contexts']]),
+        'simple_word_tokenize': (processor.simple_word_tokenize, [(text,) for text in inputs['contexts']]),
+        'simple_sentence_tokenize': (processor.simple_sentence_tokenize, [(text,) for text in inputs['contexts']]),
+        'extract_question_type': (processor.extract_question_type, [(q,) for q in inputs['questions']]),
+        'calculate_advanced_similarity': (processor.calculate_advanced_similarity, inputs['question_sentence_pairs']),
+        'extract_answer_candidates': (processor.extract_answer_candidates, candidate_args)
+    }
+
+
+def measure_speed(fn: Callable, args_list: List[Tuple], min_time: float, repeats: int) -> Dict:
+    """أفضل ووسيط عدد الاستدعاءات في الثانية عبر عدة تكرارات، كل منها min_time ثانية على الأقل"""
+    for args in args_list[:3]:
+        fn(*args)
+    rates = []
+    for _ in range(repeats):
+        calls = 0
+        start = time.perf_counter()
+        deadline = start + min_time
+        while True:
+            for args in args_list:
+                fn(*args)
+            calls += len(args_list)
+            if time.perf_counter() >= deadline:
+                break
+        rates.append(calls / (time.perf_counter() - start))
+    best = max(rates)
+    return {
+        'ops_per_sec': round(best, 2),
+        'median_ops_per_sec': round(float(np.median(rates)), 2),
+        'us_per_call': round(1e6 / best, 3)
+    }
+
+
+def measure_allocations(fn: Callable, args_list: List[Tuple], calls: int) -> Dict:
+    """متوسط ذروة الذاكرة المخصصة لكل استدعاء، والذاكرة المتبقية بعد جميع الاستدعاءات (تسرب أو ذاكرة مخبئية)"""
+    calls = max(1, min(calls, len(args_list)))
+    tracemalloc.start()
+    try:
+        baseline, _ = tracemalloc.get_traced_memory()
+        peaks = []
+        for args in args_list[:calls]:
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            fn(*args)
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - before)
+        retained, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        'peak_kb_per_call': round(float(np.mean(peaks)) / 1024, 2),
+        'retained_kb': round((retained - baseline) / 1024, 2)
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def load_history(path: str) -> List[Dict]:
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="قياس أداء دوال معالجة النص العربي الأكثر استدعاءً")
+    parser.add_argument('--contexts', default=os.path.join("embeddings", "unique_contexts.txt"))
+    parser.add_argument('--questions', default=default_questions_path())
+    parser.add_argument('--samples', type=int, default=50, help="عدد السياقات وأزواج التشابه")
+    parser.add_argument('--functions', default='', help="أسماء الدوال مفصولة بفواصل (فارغ = الكل)")
+    parser.add_argument('--min-time', type=float, default=1.0, help="أقل زمن لكل تكرار بالثواني")
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--alloc-calls', type=int, default=20, help="استدعاءات قياس الذاكرة (tracemalloc)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--history', default=HISTORY_PATH, help="ملف JSONL يُلحق به سجل كل تشغيل")
+    parser.add_argument('--label', default='', help="وصف اختياري للتشغيل في السجل")
+    args = parser.parse_args()
+
+    processor = AdvancedArabicProcessor()
+    inputs = load_inputs(args.contexts, args.questions, args.samples, args.seed)
+    cases = build_cases(processor, inputs)
+    selected = [name.strip() for name in args.functions.split(',') if name.strip()] or list(cases)
+    unknown = [name for name in selected if name not in cases]
+    if unknown:
+        parser.error(f"دوال غير معروفة: {', '.join(unknown)} (المتاح: {', '.join(cases)})")
+
+    history = load_history(args.history)
+    previous = history[-1]['results'] if history else {}
+
+    results = {}
+    print(f"{'الدالة':30s} {'استدعاء/ث':>12s} {'µs/استدعاء':>12s} {'ذروة KB':>10s} {'متبقٍ KB':>10s} {'التغير':>8s}")
+    for name in selected:
+        fn, args_list = cases[name]
+        row = measure_speed(fn, args_list, args.min_time, args.repeats)
+        row.update(measure_allocations(fn, args_list, args.alloc_calls))
+        results[name] = row
+
+        change = ''
+        if name in previous and previous[name].get('ops_per_sec'):
+            change = f"{row['ops_per_sec'] / previous[name]['ops_per_sec'] - 1:+.1%}"
+        print(f"{name:30s} {row['ops_per_sec']:12.1f} {row['us_per_call']:12.1f} "
+              f"{row['peak_kb_per_call']:10.1f} {row['retained_kb']:10.1f} {change:>8s}")
+
+    record = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'commit': git_commit(),
+        'label': args.label,
+        'python': platform.python_version(),
+        'nltk_punkt': processor.punkt_available,
+        'spacy': processor.nlp is not None,
+        'samples': args.samples,
+        'seed': args.seed,
+        'results': results
+    }
+    with open(args.history, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record, ensure_ascii=False) + '\n')
+    print(f"\nأُضيف التشغيل رقم {len(history) + 1} إلى {args.history}"
+          + (f" (التغير مقارنة بتشغيل {history[-1]['timestamp']})" if history else ''))
+
+
+if __name__ == "__main__":
+    main()
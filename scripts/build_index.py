@@ -1,25 +1,79 @@
+import argparse
 import os
+import shutil
 import numpy as np
 import faiss
 
-def build_faiss_index(embeddings, index_path):
-    """بناء فهرس FAISS للبحث السريع"""
-    # الحصول على أبعاد التمثيلات الرقمية
+from artifacts import CONTEXTS_FILE, INDEX_FILE, new_version_name, publish_version, version_dir
+
+# أنواع الفهارس: flat (بحث دقيق)، hnsw و ivf (بحث تقريبي أسرع على المجموعات الكبيرة)
+INDEX_TYPES = ('flat', 'hnsw', 'ivf')
+
+def create_index(embeddings, index_type='flat', hnsw_m=32, hnsw_ef_search=64, ivf_nlist=0, ivf_nprobe=8):
+    """إنشاء فهرس Inner Product من تمثيلات مطبعة (float32)"""
     dimension = embeddings.shape[1]
-    
-    # إنشاء فهرس FAISS
-    index = faiss.IndexFlatIP(dimension)  # استخدام Inner Product للتشابه
-    
-    # إضافة التمثيلات الرقمية إلى الفهرس
-    faiss.normalize_L2(embeddings)  # تطبيع المتجهات للحصول على تشابه الجيب تمام
+    if index_type == 'flat':
+        index = faiss.IndexFlatIP(dimension)
+    elif index_type == 'hnsw':
+        index = faiss.IndexHNSWFlat(dimension, hnsw_m, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efSearch = hnsw_ef_search
+    elif index_type == 'ivf':
+        # عدد العناقيد الافتراضي ~ الجذر التربيعي لعدد السياقات
+        nlist = ivf_nlist or max(1, int(np.sqrt(embeddings.shape[0])))
+        quantizer = faiss.IndexFlatIP(dimension)
+        index = faiss.IndexIVFFlat(quantizer, dimension, nlist, faiss.METRIC_INNER_PRODUCT)
+        index.train(embeddings)
+        index.nprobe = min(ivf_nprobe, nlist)
+    else:
+        raise ValueError(f"نوع فهرس غير معروف: {index_type} (المتاح: {', '.join(INDEX_TYPES)})")
     index.add(embeddings)
+    return index
+
+def build_faiss_index(embeddings, index_path, index_type='flat'):
+    """بناء فهرس FAISS للبحث السريع"""
+    # تطبيع المتجهات للحصول على تشابه الجيب تمام باستخدام Inner Product
+    faiss.normalize_L2(embeddings)
+    index = create_index(embeddings, index_type)
     
     # حفظ الفهرس
     faiss.write_index(index, index_path)
     print(f"تم حفظ فهرس FAISS في {index_path}")
     return index
 
+def build_version(embeddings, embeddings_dir, version=None, publish=True, index_type='flat'):
+    """بناء إصدار جديد في embeddings/versions/<version> مع نسخة من السياقات،
+    ثم تفعيله بتحديث CURRENT ذرياً ليلتقطه الخادم دون إعادة تشغيل"""
+    version = version or new_version_name()
+    directory = version_dir(embeddings_dir, version)
+    if os.path.exists(directory):
+        raise FileExistsError(f"الإصدار {version} موجود مسبقاً")
+    
+    # البناء في مجلد مؤقت ثم إعادة تسميته حتى لا يُرى إصدار ناقص
+    tmp_dir = f"{directory}.tmp-{os.getpid()}"
+    os.makedirs(tmp_dir)
+    try:
+        build_faiss_index(embeddings, os.path.join(tmp_dir, INDEX_FILE), index_type)
+        shutil.copyfile(os.path.join(embeddings_dir, CONTEXTS_FILE), os.path.join(tmp_dir, CONTEXTS_FILE))
+        os.rename(tmp_dir, directory)
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    
+    if publish:
+        publish_version(embeddings_dir, version)
+        print(f"الإصدار النشط الآن: {version}")
+    return version
+
 def main():
+    parser = argparse.ArgumentParser(description="بناء فهرس FAISS من التمثيلات الرقمية")
+    parser.add_argument('--version', nargs='?', const='', default=None,
+                        help="بناء إصدار مستقل في embeddings/versions (اسم تلقائي إن لم يُحدد)")
+    parser.add_argument('--no-publish', action='store_true',
+                        help="بناء الإصدار دون تفعيله في embeddings/CURRENT")
+    parser.add_argument('--index-type', choices=INDEX_TYPES, default='flat',
+                        help="نوع الفهرس (قارن الجودة والسرعة بـ benchmark_retrieval.py)")
+    args = parser.parse_args()
+    
     # التأكد من وجود مجلد التمثيلات الرقمية
     embeddings_dir = "embeddings"
     os.makedirs(embeddings_dir, exist_ok=True)
@@ -33,9 +87,14 @@ def main():
     embeddings = np.load(embeddings_path)
     print(f"تم تحميل {embeddings.shape[0]} تمثيل رقمي بأبعاد {embeddings.shape[1]}")
     
+    if args.version is not None:
+        build_version(embeddings, embeddings_dir, args.version or None,
+                      publish=not args.no_publish, index_type=args.index_type)
+        return
+    
     # بناء وحفظ فهرس FAISS
     index_path = os.path.join(embeddings_dir, "faiss_index.index")
-    build_faiss_index(embeddings, index_path)
+    build_faiss_index(embeddings, index_path, args.index_type)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
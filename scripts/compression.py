@@ -0,0 +1,35 @@
+import gzip
+from typing import Optional, Tuple
+
+from settings import COMPRESSION_MIN_BYTES, GZIP_LEVEL, BROTLI_QUALITY
+
+try:
+    import brotli
+except ImportError:
+    # Brotli اختياري (pip install brotli)؛ بدونه يُستخدم gzip فقط
+    brotli = None
+
+
+def supported_encodings() -> Tuple[str, ...]:
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def choose_encoding(accept_encodings) -> Optional[str]:
+    """أعلى ترميز مدعوم جودةً في Accept-Encoding (br مفضل عند التساوي)"""
+    best, best_quality = None, 0
+    for encoding in supported_encodings():
+        quality = accept_encodings[encoding]
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress_body(body: bytes, encoding: str) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+def should_compress(body_size: int) -> bool:
+    """الحمولات الصغيرة لا تستحق كلفة الضغط"""
+    return COMPRESSION_MIN_BYTES > 0 and body_size >= COMPRESSION_MIN_BYTES
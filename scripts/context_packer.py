@@ -0,0 +1,119 @@
+import re
+from typing import Any, Callable, Dict, List, Optional
+
+from settings import GENERATION_MAX_INPUT_TOKENS
+
+
+class ContextPacker:
+    def __init__(self, tokenizer_getter: Callable[[], Any] = None,
+                 max_input_tokens: int = GENERATION_MAX_INPUT_TOKENS):
+        """تعبئة السياقات ضمن ميزانية رموز النموذج قبل التوليد"""
+        self.tokenizer_getter = tokenizer_getter
+        self.max_input_tokens = max_input_tokens
+        self._tiktoken_encoding = None
+
+    def _tokenizer(self) -> Optional[Any]:
+        if self.tokenizer_getter is None:
+            return None
+        try:
+            return self.tokenizer_getter()
+        except Exception:
+            return None
+
+    def count_tokens(self, text: str) -> int:
+        """عدد الرموز بمقسم النموذج، أو tiktoken كبديل، أو عدد الكلمات"""
+        if not text:
+            return 0
+        tokenizer = self._tokenizer()
+        if tokenizer is not None:
+            return len(tokenizer(text, add_special_tokens=False)['input_ids'])
+        if self._tiktoken_encoding is None:
+            try:
+                import tiktoken
+                self._tiktoken_encoding = tiktoken.get_encoding("cl100k_base")
+            except Exception:
+                self._tiktoken_encoding = False
+        if self._tiktoken_encoding:
+            return len(self._tiktoken_encoding.encode(text))
+        return len(text.split())
+
+    def split_sentences(self, text: str) -> List[str]:
+        """تقسيم المقطع إلى جمل مع الإبقاء على علامات الترقيم"""
+        sentences = [s.strip() for s in re.split(r'(?<=[.؟!?\n])\s+', text)]
+        return [s for s in sentences if s]
+
+    def pack(self, question: str, contexts: List[str], scores: List[float] = None,
+             candidates: List[Dict] = None) -> Dict:
+        """اختيار المقاطع ثم الجمل الأعلى درجة حتى امتلاء الميزانية"""
+        scores = scores if scores is not None else [1.0] * len(contexts)
+        prefix = f"question: {question} context: "
+        # رمز نهاية التسلسل يضاف تلقائياً عند الترميز
+        budget = max(0, self.max_input_tokens - self.count_tokens(prefix) - 1)
+
+        # درجات الجمل من مرشحي الإجابات المستخرجة مسبقاً
+        candidate_scores = {}
+        for candidate in candidates or []:
+            text = candidate['text']
+            candidate_scores[text] = max(candidate_scores.get(text, 0.0), candidate['composite_score'])
+
+        ranked = sorted(range(len(contexts)), key=lambda i: scores[i], reverse=True)
+        selected: Dict[int, List[int]] = {}
+        sentences_by_passage: Dict[int, List[str]] = {}
+        used = 0
+        full_passages = 0
+        overflow = []
+
+        # 1. المقاطع الكاملة بترتيب درجة الاسترجاع ما دامت تتسع
+        for i in ranked:
+            tokens = self.count_tokens(contexts[i])
+            if used + tokens <= budget:
+                selected[i] = None
+                used += tokens
+                full_passages += 1
+            else:
+                overflow.append(i)
+
+        # 2. الجمل الأعلى درجة من المقاطع التي لم تتسع كاملة
+        sentence_pool = []
+        for rank, i in enumerate(overflow):
+            sentences_by_passage[i] = self.split_sentences(contexts[i])
+            for position, sentence in enumerate(sentences_by_passage[i]):
+                score = max(
+                    (value for text, value in candidate_scores.items() if text in sentence),
+                    default=0.0
+                )
+                sentence_pool.append((score, -rank, -position, i, position))
+        sentence_pool.sort(reverse=True)
+
+        dropped_sentences = 0
+        for _, _, _, i, position in sentence_pool:
+            tokens = self.count_tokens(sentences_by_passage[i][position]) + 1
+            if used + tokens <= budget:
+                selected.setdefault(i, [])
+                selected[i].append(position)
+                used += tokens
+            else:
+                dropped_sentences += 1
+
+        # إعادة تجميع المقاطع بترتيب الدرجة والجمل بترتيبها الأصلي
+        parts = []
+        for i in ranked:
+            if i not in selected:
+                continue
+            if selected[i] is None:
+                parts.append(contexts[i])
+            else:
+                parts.append(' '.join(sentences_by_passage[i][p] for p in sorted(selected[i])))
+
+        packed_context = "\n".join(parts)
+        input_text = prefix + packed_context
+        return {
+            'input_text': input_text,
+            'context': packed_context,
+            'input_tokens': self.count_tokens(input_text) + 1,
+            'budget': self.max_input_tokens,
+            'full_passages': full_passages,
+            'partial_passages': sum(1 for i in overflow if i in selected),
+            'dropped_passages': sum(1 for i in overflow if i not in selected),
+            'dropped_sentences': dropped_sentences
+        }
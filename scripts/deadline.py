@@ -0,0 +1,80 @@
+import threading
+import time
+from typing import Dict, List, Optional
+
+from metrics import STAGE_DURATION
+from settings import REQUEST_DEADLINE_MS
+
+# تقدير مبدئي لزمن كل مرحلة اختيارية (بالميلي ثانية) قبل توفر قياسات فعلية
+DEFAULT_STAGE_ESTIMATES_MS = {
+    'context_analysis': 150.0,
+    'neural_generation': 1500.0,
+    'combination': 100.0
+}
+
+# المراحل الفعلية في مدرج الأزمنة التي تكوّن كل مرحلة اختيارية
+_STAGE_COMPONENTS = {
+    'context_analysis': ('context_analysis',),
+    'neural_generation': ('context_packing', 'generation'),
+    'combination': ('combination',)
+}
+
+
+def estimate_stage_ms(stage: str) -> float:
+    """متوسط الزمن المقاس للمرحلة في هذه العملية، أو التقدير المبدئي"""
+    total = 0.0
+    for component in _STAGE_COMPONENTS.get(stage, (stage,)):
+        mean = STAGE_DURATION.mean(stage=component)
+        if mean is None:
+            return DEFAULT_STAGE_ESTIMATES_MS.get(stage, 0.0)
+        total += mean * 1000
+    return total
+
+
+class Deadline:
+    def __init__(self, budget_ms: Optional[float] = None):
+        """ميزانية زمن الطلب؛ تُفحص بين المراحل لتخطي الاختيارية منها عند اقترابها"""
+        self.budget_ms = budget_ms if budget_ms and budget_ms > 0 else None
+        self.started_at = time.monotonic()
+        self.skipped_stages: List[str] = []
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.budget_ms is not None
+
+    def elapsed_ms(self) -> float:
+        return (time.monotonic() - self.started_at) * 1000
+
+    def remaining_ms(self) -> float:
+        if not self.enabled:
+            return float('inf')
+        return self.budget_ms - self.elapsed_ms()
+
+    def allows(self, stage: str) -> bool:
+        """هل يتسع الوقت المتبقي للمرحلة الاختيارية؟ وإلا تُسجّل كمرحلة متخطاة"""
+        if not self.enabled or self.remaining_ms() >= estimate_stage_ms(stage):
+            return True
+        with self._lock:
+            if stage not in self.skipped_stages:
+                self.skipped_stages.append(stage)
+        return False
+
+    def summary(self) -> Dict:
+        return {
+            'budget_ms': self.budget_ms,
+            'elapsed_ms': round(self.elapsed_ms(), 3),
+            'skipped_stages': list(self.skipped_stages)
+        }
+
+
+def parse_deadline(header_value=None, param_value=None) -> Deadline:
+    """الميزانية من ترويسة X-Request-Deadline-Ms أو معامل deadline_ms، وإلا الافتراضية"""
+    for value in (header_value, param_value):
+        if value in (None, ''):
+            continue
+        try:
+            return Deadline(float(value))
+        except (TypeError, ValueError):
+            print(f"تحذير: ميزانية زمن غير صالحة {value!r} - سيتم تجاهلها")
+    return Deadline(REQUEST_DEADLINE_MS)
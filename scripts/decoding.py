@@ -0,0 +1,126 @@
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from settings import DECODING_PROFILE, GENERATION_CACHE_SIZE
+
+# ملفات فك الترميز المتاحة
+#   sampling: السلوك الأصلي (عشوائي، حتى 200 رمز) - لا يمكن تخزين نتائجه
+#   greedy:   حتمي وأسرع: اختيار الرمز الأعلى احتمالاً مع حد للرموز الجديدة
+#   beam:     حتمي بحزمة صغيرة وتوقف مبكر عند اكتمال جميع الفرضيات
+DECODING_PROFILES = {
+    'sampling': {
+        'max_length': 200,
+        'num_return_sequences': 1,
+        'temperature': 0.7,
+        'do_sample': True
+    },
+    'greedy': {
+        'max_new_tokens': 64,
+        'num_return_sequences': 1,
+        'num_beams': 1,
+        'do_sample': False,
+        'use_cache': True
+    },
+    'beam': {
+        'max_new_tokens': 64,
+        'num_return_sequences': 1,
+        'num_beams': 2,
+        'early_stopping': True,
+        'do_sample': False,
+        'use_cache': True
+    }
+}
+
+
+def get_decoding_config(profile: str = DECODING_PROFILE) -> Dict:
+    """إعدادات generate لملف فك الترميز المطلوب"""
+    if profile not in DECODING_PROFILES:
+        print(f"تحذير: ملف فك ترميز غير معروف {profile} - سيتم استخدام sampling")
+        profile = 'sampling'
+    return dict(DECODING_PROFILES[profile])
+
+
+def is_deterministic(config: Dict) -> bool:
+    """النتيجة حتمية (قابلة للتخزين) عند تعطيل العينة العشوائية"""
+    return not config.get('do_sample', False)
+
+
+class GenerationCache:
+    def __init__(self, max_entries: int = GENERATION_CACHE_SIZE):
+        """ذاكرة LRU لنتائج التوليد الحتمية بمفتاح (النموذج، المدخل، إعدادات فك الترميز)"""
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple, List[Dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(model_name: str, input_text: str, config: Dict) -> Tuple:
+        return (model_name, input_text, tuple(sorted(config.items())))
+
+    def get(self, model_name: str, input_text: str, config: Dict) -> Optional[List[Dict]]:
+        """النتيجة المخزنة إن وجدت (None للإعدادات غير الحتمية)"""
+        if self.max_entries <= 0 or not is_deterministic(config):
+            return None
+        key = self.make_key(model_name, input_text, config)
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return [dict(item) for item in cached]
+
+    def put(self, model_name: str, input_text: str, config: Dict, result: List[Dict]):
+        """تخزين نتيجة توليد حتمية"""
+        if self.max_entries <= 0 or not is_deterministic(config):
+            return
+        key = self.make_key(model_name, input_text, config)
+        with self._lock:
+            self._entries[key] = [dict(item) for item in result]
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_generate(self, model_name: str, input_text: str, config: Dict,
+                        generate: Callable[[], List[Dict]]) -> List[Dict]:
+        """إرجاع النتيجة المخزنة أو توليدها وتخزينها إن كانت حتمية"""
+        cached = self.get(model_name, input_text, config)
+        if cached is not None:
+            return cached
+        result = generate()
+        self.put(model_name, input_text, config, result)
+        return result
+
+    def clear(self):
+        """إفراغ الذاكرة وتصفير الإحصاءات"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_generation_cache() -> GenerationCache:
+    """ذاكرة نتائج التوليد المشتركة في العملية"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = GenerationCache()
+    return _cache
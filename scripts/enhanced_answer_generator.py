@@ -1,4 +1,5 @@
-from transformers import pipeline, AutoTokenizer, AutoModelForSeq2SeqLM
+from model_registry import get_model_registry
+from decoding import get_decoding_config, get_generation_cache
 from text_processor import ArabicTextProcessor
 from typing import List, Dict
 import re
@@ -8,25 +9,16 @@ class EnhancedAnswerGenerator:
         """تهيئة مولد الإجابات المحسن"""
         self.text_processor = ArabicTextProcessor()
         
-        print(f"تحميل نموذج {model_name}...")
-        try:
-            # استخدام نموذج أكثر استقراراً
-            self.generator = pipeline(
-                "text2text-generation",
-                model="t5-small",
-                tokenizer="t5-small",
-                max_length=512,
-                device=-1
-            )
-        except Exception as e:
-            print(f"خطأ في تحميل النموذج: {e}")
-            # نموذج احتياطي
-            self.generator = pipeline(
-                "text-generation",
-                model="gpt2",
-                max_length=200,
-                device=-1
-            )
+        # T5 مشترك مع باقي المولدات ويُحمّل عند أول استخدام
+        self.model_registry = get_model_registry()
+    
+    @property
+    def generator(self):
+        """نموذج T5، أو GPT-2 كنموذج احتياطي إذا تعذر تحميل T5"""
+        generator = self.model_registry.get('t5')
+        if generator is None:
+            generator = self.model_registry.get('gpt2')
+        return generator
     
     def extract_answer_from_context(self, question: str, context: str) -> str:
         """استخراج الإجابة من السياق باستخدام قواعد NLP"""
@@ -113,19 +105,20 @@ class EnhancedAnswerGenerator:
             context_text = "\n".join(context_texts)
             
             # تكوين النص المدخل
-            if "t5" in str(self.generator.model.config._name_or_path).lower():
+            generator = self.generator
+            if "t5" in str(generator.model.config._name_or_path).lower():
                 input_text = f"question: {question} context: {context_text}"
             else:
                 input_text = f"السياق: {context_text}\nالسؤال: {question}\nالإجابة:"
             
             # توليد الإجابة
-            result = self.generator(
+            decoding_config = get_decoding_config()
+            decoding_config['pad_token_id'] = generator.tokenizer.eos_token_id
+            result = get_generation_cache().get_or_generate(
+                generator.model.config._name_or_path,
                 input_text,
-                max_length=200,
-                num_return_sequences=1,
-                temperature=0.7,
-                do_sample=True,
-                pad_token_id=self.generator.tokenizer.eos_token_id
+                decoding_config,
+                lambda: generator(input_text, **decoding_config)
             )
             
             generated_answer = ""
@@ -1,175 +1,312 @@
 import os
+import time
 import numpy as np
 import faiss
-from sentence_transformers import SentenceTransformer
 from typing import List, Dict, Tuple
 from text_processor import ArabicTextProcessor
+from model_registry import get_model_registry
+from metrics import record_model_call, stage_timer
+from deadline import Deadline
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
 
+# أنماط البحث المتاحة عبر search_ids
+SEARCH_MODES = ('semantic', 'keyword', 'hybrid')
+
+class RetrieverState:
+    def __init__(self, index, contexts: List[str], tfidf_vectorizer, tfidf_matrix, version: str = None):
+        """إصدار واحد غير قابل للتعديل من بيانات الاسترجاع (الفهرس والسياقات و TF-IDF).
+        يُستبدل المرجع إليه كاملاً عند إعادة التحميل فيكمل كل طلب على الإصدار الذي بدأ به"""
+        self.index = index
+        self.contexts = contexts
+        self.tfidf_vectorizer = tfidf_vectorizer
+        self.tfidf_matrix = tfidf_matrix
+        self.version = version
+        self.loaded_at = time.time()
+
 class EnhancedContextRetriever:
-    def __init__(self, index_path, contexts_path, model_name='paraphrase-multilingual-MiniLM-L12-v2'):
+    def __init__(self, index_path, contexts_path, model_name='paraphrase-multilingual-MiniLM-L12-v2',
+                 version: str = None):
         # تحميل معالج النصوص
         self.text_processor = ArabicTextProcessor()
         
-        # تحميل نموذج التمثيل الرقمي
-        self.model = SentenceTransformer(model_name)
+        # نموذج التمثيل الرقمي مشترك عبر سجل النماذج
+        self.model_name = model_name
+        self.model_registry = get_model_registry()
+        if self.model is None:
+            raise RuntimeError(f"تعذر تحميل نموذج التمثيل {model_name}")
         
+        self.state = self.load_state(index_path, contexts_path, version)
+    
+    @property
+    def model(self):
+        """نموذج التمثيل الرقمي بالخلفية المحددة في RAG_ENCODER_BACKEND"""
+        return self.model_registry.get_encoder(self.model_name)
+    
+    # توافق مع الاستخدام السابق: خصائص الإصدار الحالي
+    @property
+    def index(self):
+        return self.state.index
+    
+    @property
+    def contexts(self) -> List[str]:
+        return self.state.contexts
+    
+    @property
+    def tfidf_vectorizer(self):
+        return self.state.tfidf_vectorizer
+    
+    @property
+    def tfidf_matrix(self):
+        return self.state.tfidf_matrix
+    
+    def load_state(self, index_path, contexts_path, version: str = None) -> RetrieverState:
+        """تحميل الفهرس والسياقات وبناء TF-IDF في إصدار جديد دون المساس بالإصدار الحالي"""
         # تحميل فهرس FAISS
-        self.index = faiss.read_index(index_path)
+        index = faiss.read_index(index_path)
         
         # تحميل السياقات
         with open(contexts_path, 'r', encoding='utf-8') as f:
-            self.contexts = [line.strip() for line in f.readlines()]
+            contexts = [line.strip() for line in f.readlines()]
+        
+        if index.ntotal != len(contexts):
+            print(f"تحذير: عدد متجهات الفهرس ({index.ntotal}) لا يطابق عدد السياقات ({len(contexts)})")
         
         # إنشاء TF-IDF vectorizer للبحث التقليدي
-        self.setup_tfidf()
+        tfidf_vectorizer, tfidf_matrix = self.build_tfidf(contexts)
+        return RetrieverState(index, contexts, tfidf_vectorizer, tfidf_matrix, version)
+    
+    def reload(self, index_path, contexts_path, version: str = None) -> RetrieverState:
+        """بناء إصدار جديد ثم استبداله بعملية إسناد واحدة (النماذج تبقى محملة)"""
+        state = self.load_state(index_path, contexts_path, version)
+        self.state = state
+        return state
     
-    def setup_tfidf(self):
+    def build_tfidf(self, contexts: List[str]):
         """إعداد TF-IDF للبحث التقليدي"""
         processed_contexts = []
-        for context in self.contexts:
+        for context in contexts:
             processed = self.text_processor.process_text(context)
             processed_text = ' '.join(processed['stemmed_tokens'])
             processed_contexts.append(processed_text)
         
-        self.tfidf_vectorizer = TfidfVectorizer(
+        tfidf_vectorizer = TfidfVectorizer(
             max_features=5000,
             ngram_range=(1, 2),
             min_df=2
         )
         
         try:
-            self.tfidf_matrix = self.tfidf_vectorizer.fit_transform(processed_contexts)
+            tfidf_matrix = tfidf_vectorizer.fit_transform(processed_contexts)
         except:
-            self.tfidf_matrix = None
+            tfidf_matrix = None
+        return tfidf_vectorizer, tfidf_matrix
     
     def semantic_search(self, query: str, top_k: int = 5) -> List[Tuple[str, float]]:
         """البحث الدلالي باستخدام FAISS"""
         # معالجة الاستعلام
         processed_query = self.text_processor.process_text(query)
+        state = self.state
+        return self._with_texts(state, self._semantic_ids(state, [processed_query], top_k))[0]
+    
+    def _semantic_ids(self, state: RetrieverState, processed_queries: List[Dict],
+                      top_k: int) -> List[List[Tuple[int, float]]]:
+        """بحث دلالي لعدة استعلامات معالجة: ترميز واحد وبحث FAISS واحد"""
+        # تحويل الاستعلامات إلى تمثيل رقمي
+        with stage_timer('retrieval_encode'):
+            query_embeddings = np.ascontiguousarray(
+                self.model.encode([processed['cleaned'] for processed in processed_queries]), dtype=np.float32
+            )
+        record_model_call('encoder', 'retrieval', len(processed_queries))
         
-        # تحويل الاستعلام إلى تمثيل رقمي
-        query_embedding = self.model.encode([processed_query['cleaned']])
-        
-        # تطبيع المتجه
-        faiss.normalize_L2(query_embedding)
+        # تطبيع المتجهات
+        faiss.normalize_L2(query_embeddings)
         
         # البحث في الفهرس
-        scores, indices = self.index.search(query_embedding, top_k)
+        with stage_timer('retrieval_faiss'):
+            scores, indices = state.index.search(query_embeddings, top_k)
         
-        # استرجاع السياقات المقابلة
-        results = []
-        for idx, score in zip(indices[0], scores[0]):
-            if idx < len(self.contexts):
-                results.append((self.contexts[idx], float(score)))
+        # أرقام السياقات المقابلة (FAISS يعيد -1 عند نقص النتائج)
+        all_results = []
+        for row_indices, row_scores in zip(indices, scores):
+            results = []
+            for idx, score in zip(row_indices, row_scores):
+                if 0 <= idx < len(state.contexts):
+                    results.append((int(idx), float(score)))
+            all_results.append(results)
         
-        return results
+        return all_results
     
     def keyword_search(self, query: str, top_k: int = 5) -> List[Tuple[str, float]]:
         """البحث بالكلمات المفتاحية باستخدام TF-IDF"""
-        if self.tfidf_matrix is None:
-            return []
-        
         # معالجة الاستعلام
         processed_query = self.text_processor.process_text(query)
-        processed_text = ' '.join(processed_query['stemmed_tokens'])
+        state = self.state
+        return self._with_texts(state, self._keyword_ids(state, [processed_query], top_k))[0]
+    
+    def _keyword_ids(self, state: RetrieverState, processed_queries: List[Dict],
+                     top_k: int) -> List[List[Tuple[int, float]]]:
+        """بحث TF-IDF لعدة استعلامات معالجة بضرب مصفوفات واحد"""
+        if state.tfidf_matrix is None:
+            return [[] for _ in processed_queries]
+        
+        processed_texts = [' '.join(processed['stemmed_tokens']) for processed in processed_queries]
         
         try:
-            # تحويل الاستعلام إلى متجه TF-IDF
-            query_vector = self.tfidf_vectorizer.transform([processed_text])
-            
-            # حساب التشابه
-            similarities = cosine_similarity(query_vector, self.tfidf_matrix).flatten()
-            
-            # ترتيب النتائج
-            top_indices = similarities.argsort()[-top_k:][::-1]
+            with stage_timer('retrieval_keyword'):
+                # تحويل الاستعلامات إلى متجهات TF-IDF
+                query_vectors = state.tfidf_vectorizer.transform(processed_texts)
+                
+                # حساب التشابه
+                similarity_rows = cosine_similarity(query_vectors, state.tfidf_matrix)
             
-            results = []
-            for idx in top_indices:
-                if similarities[idx] > 0:
-                    results.append((self.contexts[idx], float(similarities[idx])))
+            all_results = []
+            for similarities in similarity_rows:
+                # ترتيب النتائج
+                top_indices = similarities.argsort()[-top_k:][::-1]
+                
+                results = []
+                for idx in top_indices:
+                    if similarities[idx] > 0:
+                        results.append((int(idx), float(similarities[idx])))
+                all_results.append(results)
             
-            return results
+            return all_results
         except:
-            return []
+            return [[] for _ in processed_queries]
     
     def hybrid_search(self, query: str, top_k: int = 3) -> List[Tuple[str, float]]:
         """البحث المختلط (دلالي + كلمات مفتاحية)"""
+        processed_query = self.text_processor.process_text(query)
+        state = self.state
+        return self._with_texts(state, self._hybrid_ids(state, [processed_query], top_k))[0]
+    
+    def _hybrid_ids(self, state: RetrieverState, processed_queries: List[Dict],
+                    top_k: int) -> List[List[Tuple[int, float]]]:
+        """بحث مختلط لعدة استعلامات معالجة"""
         # البحث الدلالي
-        semantic_results = self.semantic_search(query, top_k * 2)
+        semantic_batch = self._semantic_ids(state, processed_queries, top_k * 2)
         
         # البحث بالكلمات المفتاحية
-        keyword_results = self.keyword_search(query, top_k * 2)
-        
-        # دمج النتائج وإزالة التكرار
-        combined_results = {}
-        
-        # إضافة النتائج الدلالية بوزن أعلى
-        for context, score in semantic_results:
-            combined_results[context] = score * 0.7
+        keyword_batch = self._keyword_ids(state, processed_queries, top_k * 2)
         
-        # إضافة نتائج الكلمات المفتاحية
-        for context, score in keyword_results:
-            if context in combined_results:
-                combined_results[context] += score * 0.3
-            else:
-                combined_results[context] = score * 0.3
-        
-        # ترتيب النتائج النهائية
-        sorted_results = sorted(combined_results.items(), key=lambda x: x[1], reverse=True)
+        all_results = []
+        for semantic_results, keyword_results in zip(semantic_batch, keyword_batch):
+            # دمج النتائج وإزالة التكرار (حسب نص السياق مع الاحتفاظ بأول رقم له)
+            combined_results = {}
+            
+            # إضافة النتائج الدلالية بوزن أعلى
+            for idx, score in semantic_results:
+                combined_results[state.contexts[idx]] = [idx, score * 0.7]
+            
+            # إضافة نتائج الكلمات المفتاحية
+            for idx, score in keyword_results:
+                context = state.contexts[idx]
+                if context in combined_results:
+                    combined_results[context][1] += score * 0.3
+                else:
+                    combined_results[context] = [idx, score * 0.3]
+            
+            # ترتيب النتائج النهائية
+            sorted_results = sorted(combined_results.values(), key=lambda x: x[1], reverse=True)
+            all_results.append([(idx, score) for idx, score in sorted_results[:top_k]])
         
-        return sorted_results[:top_k]
+        return all_results
+    
+    def _with_texts(self, state: RetrieverState,
+                    id_results: List[List[Tuple[int, float]]]) -> List[List[Tuple[str, float]]]:
+        """تحويل أرقام السياقات إلى نصوصها"""
+        return [[(state.contexts[idx], score) for idx, score in results] for results in id_results]
     
-    def retrieve_with_context_analysis(self, query: str, top_k: int = 3) -> Dict:
+    def search_ids(self, query: str, mode: str = 'hybrid', top_k: int = 5,
+                   state: RetrieverState = None) -> List[Tuple[int, float]]:
+        """بحث خفيف بدون تحليل السياقات: أرقام السياقات ودرجاتها فقط
+        (تُمرر state لقراءة النصوص من الإصدار نفسه الذي بُحث فيه)"""
+        return self.search_ids_batch([query], mode, top_k, state)[0]
+    
+    def search_ids_batch(self, queries: List[str], mode: str = 'hybrid', top_k: int = 5,
+                         state: RetrieverState = None) -> List[List[Tuple[int, float]]]:
+        """search_ids لعدة استعلامات بترميز وبحث FAISS وضرب TF-IDF واحد"""
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"نمط بحث غير معروف: {mode} (المتاح: {', '.join(SEARCH_MODES)})")
+        with stage_timer('query_processing'):
+            processed_queries = [self.text_processor.process_text(query) for query in queries]
+        search = {
+            'semantic': self._semantic_ids,
+            'keyword': self._keyword_ids,
+            'hybrid': self._hybrid_ids
+        }[mode]
+        return search(state or self.state, processed_queries, top_k)
+    
+    def retrieve_with_context_analysis(self, query: str, top_k: int = 3, deadline: Deadline = None) -> Dict:
         """استرجاع متقدم مع تحليل السياق"""
-        # معالجة الاستعلام
-        query_analysis = self.text_processor.process_text(query)
+        return self.retrieve_with_context_analysis_batch([query], top_k, deadline)[0]
+    
+    def retrieve_with_context_analysis_batch(self, queries: List[str], top_k: int = 3,
+                                             deadline: Deadline = None) -> List[Dict]:
+        """استرجاع متقدم لعدة استعلامات: ترميز وبحث FAISS و TF-IDF دفعة واحدة،
+        وتحليل كل سياق مسترجع مرة واحدة حتى لو تكرر بين الاستعلامات.
+        عند اقتراب نهاية ميزانية الزمن يُتخطى تحليل السياقات وتُرتب بدرجة البحث فقط"""
+        # معالجة الاستعلامات
+        with stage_timer('query_processing'):
+            query_analyses = [self.text_processor.process_text(query) for query in queries]
         
-        # البحث المختلط
-        results = self.hybrid_search(query, top_k)
+        # البحث المختلط على إصدار واحد طوال الطلب
+        state = self.state
+        results_batch = self._hybrid_ids(state, query_analyses, top_k)
         
-        # تحليل النتائج
-        analyzed_results = []
-        for context, score in results:
-            context_analysis = self.text_processor.process_text(context)
-            
-            # حساب التشابه النصي
-            text_similarity = self.text_processor.calculate_similarity(
-                query_analysis['cleaned'], 
-                context_analysis['cleaned']
-            )
-            
-            # تحليل الكيانات المشتركة
-            query_entities = set([ent['text'] for ent in query_analysis['entities']])
-            context_entities = set([ent['text'] for ent in context_analysis['entities']])
-            entity_overlap = len(query_entities.intersection(context_entities))
+        if deadline is not None and not deadline.allows('context_analysis'):
+            return [{
+                'analyzed_results': [{
+                    'id': idx,
+                    'context': state.contexts[idx],
+                    'semantic_score': score,
+                    'final_score': score,
+                    'entities': []
+                } for idx, score in results],
+                'query_analysis': query_analysis
+            } for query_analysis, results in zip(query_analyses, results_batch)]
+        
+        context_analyses = {}
+        outputs = []
+        with stage_timer('context_analysis'):
+            for query_analysis, results in zip(query_analyses, results_batch):
+                # تحليل النتائج
+                analyzed_results = []
+                for idx, score in results:
+                    context = state.contexts[idx]
+                    context_analysis = context_analyses.get(context)
+                    if context_analysis is None:
+                        context_analysis = self.text_processor.process_text(context)
+                        context_analyses[context] = context_analysis
+                
+                    # حساب التشابه النصي
+                    text_similarity = self.text_processor.calculate_similarity(
+                        query_analysis['cleaned'], 
+                        context_analysis['cleaned']
+                    )
+                
+                    # تحليل الكيانات المشتركة
+                    query_entities = set([ent['text'] for ent in query_analysis['entities']])
+                    context_entities = set([ent['text'] for ent in context_analysis['entities']])
+                    entity_overlap = len(query_entities.intersection(context_entities))
+                
+                    analyzed_results.append({
+                        'id': idx,
+                        'context': context,
+                        'semantic_score': score,
+                        'text_similarity': text_similarity,
+                        'entity_overlap': entity_overlap,
+                        'final_score': score * 0.6 + text_similarity * 0.3 + (entity_overlap * 0.1),
+                        'entities': context_analysis['entities']
+                    })
             
-            # حساب درجة التقييم النهائية
-            final_score = (score + text_similarity + (entity_overlap * 0.2)) / 3
+                # إعادة ترتيب حسب النتيجة النهائية
+                analyzed_results.sort(key=lambda x: x['final_score'], reverse=True)
             
-            analyzed_results.append({
-                'context': context,
-                'semantic_score': score,
-                'text_similarity': text_similarity,
-                'entity_overlap': entity_overlap,
-                'final_score': final_score,
-                'text_similarity': text_similarity,
-                'entity_overlap': entity_overlap,
-                'final_score': score * 0.6 + text_similarity * 0.3 + (entity_overlap * 0.1),
-                'entities': context_analysis['entities']
-            })
-        
-        # إعادة ترتيب حسب النتيجة النهائية
-        analyzed_results.sort(key=lambda x: x['final_score'], reverse=True)
-        
-        return {
-            'analyzed_results': analyzed_results[:top_k],
-            'query_analysis': query_analysis
-        }
-        analyzed_results.sort(key=lambda x: x['final_score'], reverse=True)
-        
-        return {
-            'query_analysis': query_analysis,
-            'results': analyzed_results[:top_k]
-        }
\ No newline at end of file
+                outputs.append({
+                    'analyzed_results': analyzed_results[:top_k],
+                    'query_analysis': query_analysis
+                })
+        
+        return outputs
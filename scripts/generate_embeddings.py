@@ -1,7 +1,9 @@
 import os
+import argparse
 import pandas as pd
 import numpy as np
-from sentence_transformers import SentenceTransformer
+from inference_backends import load_encoder
+from settings import ENCODER_BACKEND
 
 def load_data(file_path):
     """تحميل البيانات من ملف CSV"""
@@ -10,25 +12,35 @@ def load_data(file_path):
 
 def generate_embeddings(contexts, model_name='paraphrase-multilingual-MiniLM-L12-v2'):
     """تحويل السياقات إلى embeddings باستخدام نموذج متعدد اللغات"""
-    print(f"تحميل نموذج {model_name}...")
-    model = SentenceTransformer(model_name)
+    print(f"تحميل نموذج {model_name} (الخلفية {ENCODER_BACKEND})...")
+    # الخلفية stub تولد تمثيلات حتمية دون تنزيل النموذج (لبناء فهرس اختبارات الحمل)
+    model = load_encoder(model_name, ENCODER_BACKEND)
     print("توليد التمثيلات الرقمية للسياقات...")
     embeddings = model.encode(contexts, show_progress_bar=True)
     return embeddings
 
 def main():
+    parser = argparse.ArgumentParser(description="توليد تمثيلات السياقات الرقمية")
+    parser.add_argument('--contexts-file',
+                        help="ترميز سياقات ملف نصي (سياق في كل سطر) بدلاً من data/train.csv و data/validation.csv")
+    args = parser.parse_args()
+    
     # إنشاء مجلد للتمثيلات الرقمية إذا لم يكن موجودًا
     os.makedirs("embeddings", exist_ok=True)
     
-    # تحميل البيانات
-    train_df = load_data("data/train.csv")
-    val_df = load_data("data/validation.csv")
-    
-    # دمج البيانات للحصول على جميع السياقات
-    all_df = pd.concat([train_df, val_df], ignore_index=True)
-    
-    # إزالة السياقات المكررة
-    unique_contexts = all_df['context'].unique()
+    if args.contexts_file:
+        with open(args.contexts_file, 'r', encoding='utf-8') as f:
+            unique_contexts = list(dict.fromkeys(line.strip() for line in f if line.strip()))
+    else:
+        # تحميل البيانات
+        train_df = load_data("data/train.csv")
+        val_df = load_data("data/validation.csv")
+        
+        # دمج البيانات للحصول على جميع السياقات
+        all_df = pd.concat([train_df, val_df], ignore_index=True)
+        
+        # إزالة السياقات المكررة
+        unique_contexts = all_df['context'].unique()
     print(f"عدد السياقات الفريدة: {len(unique_contexts)}")
     
     # توليد التمثيلات الرقمية
@@ -0,0 +1,178 @@
+import os
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
+
+from metrics import get_metrics_registry
+from model_registry import get_model_registry
+from settings import GENERATION_MAX_BATCH_SIZE, GENERATION_MAX_WAIT_MS
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+
+BATCH_SIZE = get_metrics_registry().histogram(
+    'rag_scheduler_batch_size', 'Generation batch sizes executed by the scheduler', BATCH_SIZE_BUCKETS
+)
+QUEUE_WAIT = get_metrics_registry().histogram(
+    'rag_scheduler_queue_wait_seconds', 'Time generation requests wait in the scheduler queue'
+)
+
+
+class _GenerationRequest:
+    __slots__ = ('input_text', 'kwargs', 'key', 'future', 'enqueued_at')
+
+    def __init__(self, input_text: str, kwargs: Dict):
+        self.input_text = input_text
+        self.kwargs = kwargs
+        # الطلبات ذات إعدادات التوليد نفسها فقط يمكن دمجها في دفعة واحدة
+        self.key = tuple(sorted(kwargs.items()))
+        self.future = Future()
+        self.enqueued_at = time.monotonic()
+
+
+class GenerationScheduler:
+    def __init__(self, model_getter: Callable[[], Any], name: str = 'generator',
+                 max_batch_size: int = GENERATION_MAX_BATCH_SIZE,
+                 max_wait_ms: float = GENERATION_MAX_WAIT_MS):
+        """مجدول توليد يجمع الطلبات المتزامنة خلال نافذة قصيرة ويشغلها كدفعة واحدة
+        (name يُستخدم كتسمية model في المقاييس)"""
+        self.model_getter = model_getter
+        self.name = name
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+
+        self._stats_lock = threading.Lock()
+        self._batch_sizes = Counter()
+        self._requests = 0
+        self._batches = 0
+        self._total_wait = 0.0
+
+        self._worker_lock = threading.Lock()
+        self._start_worker()
+
+    def _start_worker(self):
+        """طابور جديد وخيط عامل جديد (عند الإنشاء، وفي العملية الابنة بعد fork)"""
+        self._pid = os.getpid()
+        self._queue: "queue.Queue[_GenerationRequest]" = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name="generation-scheduler", daemon=True)
+        self._worker.start()
+
+    def _ensure_worker(self):
+        """إعادة تشغيل الخيط العامل إن لم يعد حياً، حتى لا ينتظر المستدعون Future لن يكتمل
+
+        الخيوط لا تنتقل مع fork: المجدول المنشأ قبل التفريع يصل إلى العامل بلا خيط، وطابوره
+        (وأقفاله) نسخة من العملية الرئيسية فيُستبدل بطابور جديد"""
+        if self._worker.is_alive() and self._pid == os.getpid():
+            return
+        with self._worker_lock:
+            if self._pid != os.getpid():
+                self._worker_lock = threading.Lock()
+                self._stats_lock = threading.Lock()
+                self._start_worker()
+            elif not self._worker.is_alive():
+                print("تحذير: توقف خيط مجدول التوليد - إعادة تشغيله")
+                self._worker = threading.Thread(target=self._run, name="generation-scheduler", daemon=True)
+                self._worker.start()
+
+    def submit(self, input_text: str, **generate_kwargs) -> Future:
+        """إضافة طلب توليد إلى الطابور وإرجاع Future بنتيجة الـ pipeline"""
+        self._ensure_worker()
+        request = _GenerationRequest(input_text, generate_kwargs)
+        self._queue.put(request)
+        return request.future
+
+    def generate(self, input_text: str, timeout: Optional[float] = None, **generate_kwargs) -> List[Dict]:
+        """توليد متزامن: نفس شكل نتيجة استدعاء الـ pipeline لنص واحد"""
+        return self.submit(input_text, **generate_kwargs).result(timeout=timeout)
+
+    def _collect_batch(self) -> List[_GenerationRequest]:
+        """انتظار أول طلب ثم جمع ما يصل حتى امتلاء الدفعة أو انتهاء النافذة"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+
+            groups: Dict[tuple, List[_GenerationRequest]] = {}
+            for request in batch:
+                groups.setdefault(request.key, []).append(request)
+
+            for requests in groups.values():
+                self._run_group(requests)
+
+    def _run_group(self, requests: List[_GenerationRequest]):
+        """تشغيل مجموعة طلبات كدفعة واحدة وتوزيع المخرجات على أصحابها"""
+        now = time.monotonic()
+        waits = [now - request.enqueued_at for request in requests]
+        with self._stats_lock:
+            self._batches += 1
+            self._requests += len(requests)
+            self._batch_sizes[len(requests)] += 1
+            self._total_wait += sum(waits)
+        BATCH_SIZE.observe(len(requests), model=self.name)
+        for wait in waits:
+            QUEUE_WAIT.observe(wait, model=self.name)
+
+        try:
+            model = self.model_getter()
+            if model is None:
+                raise RuntimeError("نموذج التوليد غير متاح")
+
+            inputs = [request.input_text for request in requests]
+            # الـ pipeline يحشو المدخلات ويشغل generate مرة واحدة لكل batch_size
+            outputs = model(inputs, batch_size=len(inputs), **requests[0].kwargs)
+
+            for request, output in zip(requests, outputs):
+                # توحيد الشكل مع استدعاء النص الواحد: قائمة من القواميس
+                request.future.set_result(output if isinstance(output, list) else [output])
+        except Exception as e:
+            for request in requests:
+                if not request.future.done():
+                    request.future.set_exception(e)
+
+    def stats(self) -> Dict:
+        """عمق الطابور وتوزيع أحجام الدفعات"""
+        with self._stats_lock:
+            return {
+                'queue_depth': self._queue.qsize(),
+                'requests': self._requests,
+                'batches': self._batches,
+                'avg_batch_size': self._requests / self._batches if self._batches else 0.0,
+                'avg_queue_wait_ms': self._total_wait * 1000 / self._requests if self._requests else 0.0,
+                'batch_size_histogram': dict(sorted(self._batch_sizes.items()))
+            }
+
+
+_schedulers: Dict[str, GenerationScheduler] = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_generation_scheduler(model_name: str) -> GenerationScheduler:
+    """مجدول واحد مشترك لكل نموذج في العملية"""
+    scheduler = _schedulers.get(model_name)
+    if scheduler is None:
+        with _schedulers_lock:
+            scheduler = _schedulers.get(model_name)
+            if scheduler is None:
+                registry = get_model_registry()
+                scheduler = GenerationScheduler(lambda: registry.get(model_name), model_name)
+                _schedulers[model_name] = scheduler
+    return scheduler
+
+
+def generation_scheduler_stats() -> Dict[str, Dict]:
+    """إحصاءات جميع المجدولات النشطة"""
+    return {name: scheduler.stats() for name, scheduler in list(_schedulers.items())}
@@ -0,0 +1,108 @@
+from typing import Any
+
+# الخلفيات المدعومة لكل مكوّن
+#   fp32: PyTorch بدقة كاملة (السلوك الأصلي)
+#   int8: تكميم ديناميكي لطبقات Linear إلى int8 على المعالج
+#   onnx: تصدير إلى ONNX Runtime (يتطلب optimum[onnxruntime])
+#   stub: نماذج حتمية بلا أوزان ولا شبكة (stub_models.py) لاختبارات الحمل دون اتصال
+BACKENDS = ('fp32', 'int8', 'onnx', 'stub')
+
+
+def _check_backend(backend: str) -> str:
+    backend = (backend or 'fp32').lower()
+    if backend not in BACKENDS:
+        print(f"تحذير: خلفية غير معروفة {backend} - سيتم استخدام fp32")
+        return 'fp32'
+    return backend
+
+
+def _quantize_int8(model):
+    """تكميم ديناميكي لطبقات Linear (الأوزان int8 والتفعيلات تُكمّم أثناء التشغيل)"""
+    import torch
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+
+def load_encoder(model_name: str, backend: str = 'fp32') -> Any:
+    """تحميل نموذج التمثيل (SentenceTransformer) بالخلفية المطلوبة"""
+    backend = _check_backend(backend)
+    if backend == 'stub':
+        from stub_models import StubEncoder
+        return StubEncoder(model_name)
+
+    from sentence_transformers import SentenceTransformer
+
+    if backend == 'onnx':
+        try:
+            return SentenceTransformer(model_name, device='cpu', backend='onnx')
+        except Exception as e:
+            print(f"تحذير: تعذر تحميل {model_name} عبر ONNX Runtime - سيتم استخدام fp32: {e}")
+            return SentenceTransformer(model_name)
+
+    model = SentenceTransformer(model_name, device='cpu' if backend == 'int8' else None)
+    if backend == 'int8':
+        try:
+            model = _quantize_int8(model)
+        except Exception as e:
+            print(f"تحذير: تعذر تكميم {model_name} - سيتم استخدام fp32: {e}")
+    return model
+
+
+def load_seq2seq_pipeline(model_name: str, backend: str = 'fp32', max_length: int = 512) -> Any:
+    """تحميل pipeline توليد النصوص (text2text) بالخلفية المطلوبة"""
+    backend = _check_backend(backend)
+    if backend == 'stub':
+        from stub_models import StubGenerationPipeline
+        return StubGenerationPipeline(model_name, 'text2text-generation', max_length)
+
+    from transformers import pipeline, AutoTokenizer, AutoModelForSeq2SeqLM
+
+    if backend == 'fp32':
+        return pipeline(
+            "text2text-generation",
+            model=model_name,
+            tokenizer=model_name,
+            max_length=max_length,
+            device=-1
+        )
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = None
+
+    if backend == 'onnx':
+        try:
+            from optimum.onnxruntime import ORTModelForSeq2SeqLM
+            model = ORTModelForSeq2SeqLM.from_pretrained(model_name, export=True)
+        except Exception as e:
+            print(f"تحذير: تعذر تصدير {model_name} إلى ONNX Runtime - سيتم استخدام fp32: {e}")
+
+    if model is None:
+        model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
+        if backend == 'int8':
+            try:
+                model = _quantize_int8(model)
+            except Exception as e:
+                print(f"تحذير: تعذر تكميم {model_name} - سيتم استخدام fp32: {e}")
+
+    return pipeline(
+        "text2text-generation",
+        model=model,
+        tokenizer=tokenizer,
+        max_length=max_length,
+        device=-1
+    )
+
+
+def load_text_generation_pipeline(model_name: str, backend: str = 'fp32', max_length: int = 200) -> Any:
+    """تحميل pipeline توليد نصوص سببي (GPT-2)؛ int8 و onnx غير مدعومين له فيُستخدم fp32"""
+    backend = _check_backend(backend)
+    if backend == 'stub':
+        from stub_models import StubGenerationPipeline
+        return StubGenerationPipeline(model_name, 'text-generation', max_length)
+
+    from transformers import pipeline
+    return pipeline(
+        "text-generation",
+        model=model_name,
+        max_length=max_length,
+        device=-1
+    )
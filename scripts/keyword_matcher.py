@@ -0,0 +1,82 @@
+from collections import deque
+from typing import Dict, Iterable, List, Set
+
+
+class KeywordMatcher:
+    def __init__(self, patterns: Iterable[str]):
+        """مطابق كلمات مفتاحية متعدد الأنماط (Aho-Corasick) يُبنى مرة واحدة لكل سؤال"""
+        # الأنماط الفريدة بترتيب ظهورها الأول
+        self.patterns = list(dict.fromkeys(p for p in patterns if p is not None))
+
+        # جداول الآلة: الانتقالات، رابط الفشل، والأنماط المنتهية عند كل حالة
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[int]] = [[]]
+
+        # النمط الفارغ موجود في أي نص (نفس سلوك '' in text)
+        self._always: List[int] = []
+
+        for pattern_id, pattern in enumerate(self.patterns):
+            if not pattern:
+                self._always.append(pattern_id)
+                continue
+            self._add_pattern(pattern, pattern_id)
+
+        self._build_failure_links()
+
+    def _add_pattern(self, pattern: str, pattern_id: int):
+        """إضافة نمط إلى شجرة البادئات"""
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = next_state
+        self._output[state].append(pattern_id)
+
+    def _build_failure_links(self):
+        """حساب روابط الفشل بالعرض أولاً ودمج المخرجات"""
+        queue = deque(self._goto[0].values())
+
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[next_state] = target if target != next_state else 0
+
+                # كل حالة ترث الأنماط المنتهية عند رابط فشلها
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def count_matches(self, text: str) -> Dict[str, int]:
+        """مسح النص مرة واحدة وإرجاع عدد مرات ظهور كل نمط"""
+        counts = [0] * len(self.patterns)
+        for pattern_id in self._always:
+            counts[pattern_id] = 1
+
+        if text and len(self._goto) > 1:
+            goto = self._goto
+            fail = self._fail
+            output = self._output
+            state = 0
+            for char in text:
+                while state and char not in goto[state]:
+                    state = fail[state]
+                state = goto[state].get(char, 0)
+                for pattern_id in output[state]:
+                    counts[pattern_id] += 1
+
+        return {pattern: count for pattern, count in zip(self.patterns, counts)}
+
+    def matched(self, text: str) -> Set[str]:
+        """الأنماط الموجودة في النص (مكافئ لـ pattern in text لكل نمط)"""
+        return {pattern for pattern, count in self.count_matches(text).items() if count > 0}
+
@@ -0,0 +1,205 @@
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+# حدود مدرجات الزمن بالثواني (من أجزاء الميلي ثانية حتى توليد T5 الطويل)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# توقيتات الطلب الحالي (مفعلة فقط داخل collect_timings)
+_request_timings: contextvars.ContextVar = contextvars.ContextVar('request_timings', default=None)
+
+
+def _labels_key(labels: Dict[str, str]) -> Tuple:
+    return tuple(sorted((labels or {}).items()))
+
+
+def _format_labels(key: Tuple, extra: Tuple = ()) -> str:
+    items = list(key) + list(extra)
+    if not items:
+        return ''
+    escaped = [
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in items
+    ]
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        """عداد تراكمي بتسميات اختيارية"""
+        self.name = name
+        self.help_text = help_text
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = _labels_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        """مدرج تكراري تراكمي بصيغة Prometheus"""
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple, List] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = _labels_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # [عدادات الحدود..., المجموع، العدد]
+                series = [0] * len(self.buckets) + [0.0, 0]
+                self._series[key] = series
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def mean(self, **labels) -> Optional[float]:
+        """متوسط القيم المرصودة (None قبل أول رصد)"""
+        with self._lock:
+            series = self._series.get(_labels_key(labels))
+            if not series or not series[-1]:
+                return None
+            return series[-2] / series[-1]
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {key: list(series) for key, series in self._series.items()}
+        for key, series in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(key, (('le', _format_value(bound)),))} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(key, (('le', '+Inf'),))} {series[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(series[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {series[-1]}")
+        return lines
+
+
+class Gauge:
+    def __init__(self, name: str, help_text: str, callback: Callable[[], Dict], metric_type: str = 'gauge'):
+        """مقياس تُقرأ قيمه عند كل جمع من دالة: {(تسميات): قيمة} أو رقم واحد
+        (metric_type='counter' للإجماليات التي تحسبها مكونات أخرى)"""
+        self.name = name
+        self.help_text = help_text
+        self.callback = callback
+        self.metric_type = metric_type
+
+    def render(self) -> List[str]:
+        try:
+            values = self.callback()
+        except Exception as e:
+            print(f"تحذير: تعذر قراءة المقياس {self.name}: {e}")
+            return []
+        if not isinstance(values, dict):
+            values = {(): values}
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.metric_type}"]
+        for key, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(key)} {_format_value(float(value))}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        """سجل المقاييس في العملية وتصديرها بصيغة Prometheus النصية"""
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, name: str, factory: Callable[[], object]):
+        metric = self._metrics.get(name)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(name)
+                if metric is None:
+                    metric = factory()
+                    self._metrics[name] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        return self._get_or_create(name, lambda: Counter(name, help_text))
+
+    def histogram(self, name: str, help_text: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(name, lambda: Histogram(name, help_text, buckets))
+
+    def gauge(self, name: str, help_text: str, callback: Callable[[], Dict],
+              metric_type: str = 'gauge') -> Gauge:
+        """تسجيل (أو استبدال) مقياس يُقرأ من دالة عند الجمع"""
+        with self._lock:
+            gauge = Gauge(name, help_text, callback, metric_type)
+            self._metrics[name] = gauge
+            return gauge
+
+    def render(self) -> str:
+        lines = []
+        for name in sorted(self._metrics):
+            lines.extend(self._metrics[name].render())
+        return '\n'.join(lines) + '\n'
+
+
+_registry = MetricsRegistry()
+
+STAGE_DURATION = _registry.histogram(
+    'rag_stage_duration_seconds', 'Duration of each pipeline stage in seconds'
+)
+MODEL_CALLS = _registry.counter(
+    'rag_model_calls_total', 'Model inputs processed (cache hits excluded) by model and stage'
+)
+
+
+def get_metrics_registry() -> MetricsRegistry:
+    """سجل المقاييس المشترك في العملية"""
+    return _registry
+
+
+@contextmanager
+def stage_timer(stage: str) -> Iterator[None]:
+    """قياس زمن مرحلة في المدرج وفي توقيتات الطلب الحالي إن كانت مفعلة"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_DURATION.observe(elapsed, stage=stage)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + elapsed * 1000
+
+
+def record_model_call(model: str, stage: str, count: int = 1):
+    MODEL_CALLS.inc(count, model=model, stage=stage)
+
+
+@contextmanager
+def collect_timings() -> Iterator[Dict[str, float]]:
+    """جمع توقيتات المراحل (بالميلي ثانية) للطلب الحالي في قاموس"""
+    timings: Dict[str, float] = {}
+    token = _request_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _request_timings.reset(token)
+
@@ -0,0 +1,146 @@
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from inference_backends import load_encoder, load_seq2seq_pipeline, load_text_generation_pipeline
+from settings import ENCODER_BACKEND, GENERATOR_BACKEND
+
+
+def _load_t5():
+    return load_seq2seq_pipeline("t5-small", GENERATOR_BACKEND, max_length=512)
+
+
+def _load_gpt2():
+    return load_text_generation_pipeline("gpt2", GENERATOR_BACKEND, max_length=200)
+
+
+class ModelRegistry:
+    def __init__(self):
+        """سجل نماذج مشترك على مستوى العملية: تحميل عند أول استخدام وإخلاء النماذج الخاملة"""
+        self._loaders: Dict[str, Callable[[], Any]] = {}
+        self._models: Dict[str, Any] = {}
+        self._failures: Dict[str, str] = {}
+        self._last_used: Dict[str, float] = {}
+        self._evictable: Dict[str, bool] = {}
+        self._lock = threading.Lock()
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self._eviction_thread = None
+
+    def register(self, name: str, loader: Callable[[], Any], evictable: bool = True):
+        """تسجيل دالة تحميل لنموذج باسم محدد (evictable=False يستثنيه من إخلاء الخاملة)"""
+        with self._lock:
+            self._loaders[name] = loader
+            self._evictable[name] = evictable
+            self._load_locks.setdefault(name, threading.Lock())
+
+    def get(self, name: str) -> Optional[Any]:
+        """إرجاع النموذج وتحميله عند أول طلب (None إذا فشل التحميل)"""
+        model = self._models.get(name)
+        if model is not None:
+            self._last_used[name] = time.monotonic()
+            return model
+
+        if name not in self._loaders:
+            raise KeyError(f"نموذج غير مسجل: {name}")
+
+        # قفل لكل نموذج حتى لا يُحمّل النموذج نفسه مرتين من خيوط متزامنة
+        with self._load_locks[name]:
+            model = self._models.get(name)
+            if model is None:
+                if name in self._failures:
+                    return None
+                print(f"تحميل نموذج {name}...")
+                try:
+                    model = self._loaders[name]()
+                except Exception as e:
+                    print(f"خطأ في تحميل {name}: {e}")
+                    self._failures[name] = str(e)
+                    return None
+                with self._lock:
+                    self._models[name] = model
+            self._last_used[name] = time.monotonic()
+            return model
+
+    def get_encoder(self, model_name: str) -> Optional[Any]:
+        """نموذج تمثيل مشترك بين المسترجع ومعالج النصوص (يُسجّل عند أول طلب)
+
+        لا يُخلى عند الخمول: كل استعلام يحتاجه، وإخلاؤه يحمّل أول استعلام بعده إعادة
+        تحميل كاملة ويهدر الأوزان المشتركة مع العملية الرئيسية في serve.py"""
+        name = f"encoder:{model_name}"
+        if name not in self._loaders:
+            self.register(name, lambda: load_encoder(model_name, ENCODER_BACKEND), evictable=False)
+        return self.get(name)
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._models
+
+    def loaded_models(self) -> List[str]:
+        return list(self._models)
+
+    def evict(self, name: str) -> bool:
+        """إزالة النموذج من السجل (الطلبات الجارية تحتفظ بمرجعها حتى تنتهي)"""
+        with self._lock:
+            self._failures.pop(name, None)
+            self._last_used.pop(name, None)
+            return self._models.pop(name, None) is not None
+
+    def evict_idle(self, max_idle_seconds: float) -> List[str]:
+        """إخلاء النماذج القابلة للإخلاء التي لم تُستخدم منذ max_idle_seconds"""
+        now = time.monotonic()
+        idle = [
+            name for name in list(self._models)
+            if self._evictable.get(name, True) and now - self._last_used.get(name, now) > max_idle_seconds
+        ]
+        evicted = [name for name in idle if self.evict(name)]
+        for name in evicted:
+            print(f"تم إخلاء النموذج الخامل {name}")
+        return evicted
+
+    def preload(self, names: List[str]) -> List[str]:
+        """تحميل النماذج مسبقاً (مثلاً في العملية الرئيسية قبل تفرع العمال)"""
+        return [name for name in names if self.get(name) is not None]
+
+    def reset_after_fork(self):
+        """إعادة تهيئة الأقفال والخيوط في العملية الابنة بعد fork
+
+        الخيوط لا تنتقل مع fork، وقد يُنسخ قفل محجوز فيبقى محجوزاً إلى الأبد.
+        النماذج المحملة تبقى مشتركة مع العملية الرئيسية (نسخ عند الكتابة)، فلا تُخلى
+        عند الخمول: إعادة تحميلها تعني نسخة خاصة كاملة في كل عامل."""
+        self._lock = threading.Lock()
+        self._load_locks = {name: threading.Lock() for name in self._loaders}
+        self._eviction_thread = None
+        now = time.monotonic()
+        for name in self._models:
+            self._last_used[name] = now
+            self._evictable[name] = False
+
+    def start_idle_eviction(self, max_idle_seconds: float, interval: float = None):
+        """تشغيل خيط خلفي يخلي النماذج الخاملة دورياً"""
+        if self._eviction_thread is not None or max_idle_seconds <= 0:
+            return
+        interval = interval or max(1.0, max_idle_seconds / 2)
+
+        def run():
+            while True:
+                time.sleep(interval)
+                self.evict_idle(max_idle_seconds)
+
+        self._eviction_thread = threading.Thread(target=run, name="model-eviction", daemon=True)
+        self._eviction_thread.start()
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_model_registry() -> ModelRegistry:
+    """السجل المشترك لجميع مولدات الإجابات في العملية"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                registry = ModelRegistry()
+                registry.register('t5', _load_t5)
+                registry.register('gpt2', _load_gpt2)
+                _registry = registry
+    return _registry
@@ -0,0 +1,99 @@
+import cProfile
+import os
+import pstats
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from settings import PROFILE_ALLOWLIST, PROFILE_DIR, PROFILE_TOP_N
+
+# ملفات خط المعالجة التي تُعرض دوالها منفصلة عن المكتبات
+PIPELINE_FILES = ('enhanced_retriever.py', 'advanced_text_processor.py', 'smart_answer_generator.py')
+
+# cProfile لا يسمح بأكثر من مُحلل نشط في الوقت نفسه
+_profile_lock = threading.Lock()
+
+
+def is_profiling_allowed(token: Optional[str], remote_addr: Optional[str]) -> bool:
+    """التحليل مسموح فقط لرمز أو عنوان عميل ضمن RAG_PROFILE_ALLOWLIST"""
+    if not PROFILE_ALLOWLIST:
+        return False
+    return (token in PROFILE_ALLOWLIST) or (remote_addr in PROFILE_ALLOWLIST)
+
+
+def _package_of(filename: str) -> str:
+    """اسم الحزمة العليا لملف (spacy، torch، difflib، ...) أو اسم ملف خط المعالجة"""
+    if filename.startswith('<') or filename == '~':
+        return 'builtins'
+    base = os.path.basename(filename)
+    if base in PIPELINE_FILES:
+        return base[:-3]
+    parts = filename.replace('\\', '/').split('/')
+    for marker in ('site-packages', 'dist-packages'):
+        if marker in parts:
+            index = parts.index(marker)
+            if index + 1 < len(parts):
+                return parts[index + 1].split('.')[0]
+    if base == '__init__.py' and len(parts) > 1:
+        return parts[-2]
+    return base[:-3] if base.endswith('.py') else base
+
+
+def _function_row(func: Tuple, stat: Tuple) -> Dict:
+    filename, line, name = func
+    calls, _, total_time, cumulative_time, _ = stat
+    return {
+        'function': f"{os.path.basename(filename)}:{line}({name})" if line else name,
+        'calls': calls,
+        'total_ms': round(total_time * 1000, 3),
+        'cumulative_ms': round(cumulative_time * 1000, 3)
+    }
+
+
+def summarize(profiler: cProfile.Profile, top_n: int = PROFILE_TOP_N) -> Dict:
+    """أهم دوال خط المعالجة (زمن تراكمي)، وأهم الدوال عموماً (زمن ذاتي)، والزمن الذاتي لكل حزمة"""
+    stats = pstats.Stats(profiler).stats
+    pipeline: List[Tuple] = []
+    by_package: Dict[str, float] = {}
+    for func, stat in stats.items():
+        package = _package_of(func[0])
+        by_package[package] = by_package.get(package, 0.0) + stat[2]
+        if os.path.basename(func[0]) in PIPELINE_FILES:
+            pipeline.append((func, stat))
+
+    pipeline.sort(key=lambda item: item[1][3], reverse=True)
+    overall = sorted(stats.items(), key=lambda item: item[1][2], reverse=True)
+    return {
+        'pipeline_functions': [_function_row(func, stat) for func, stat in pipeline[:top_n]],
+        'hot_functions': [_function_row(func, stat) for func, stat in overall[:top_n]],
+        'by_package_ms': {
+            package: round(seconds * 1000, 3)
+            for package, seconds in sorted(by_package.items(), key=lambda item: item[1], reverse=True)[:top_n]
+        }
+    }
+
+
+def profile_call(fn: Callable, *args, **kwargs) -> Tuple[Any, Dict]:
+    """تشغيل fn تحت cProfile وإرجاع نتيجتها مع ملخص التحليل (وحفظه في RAG_PROFILE_DIR إن وُجد).
+    يُحلّل الخيط الحالي فقط؛ ما يجري في خيوط أخرى يظهر كزمن انتظار."""
+    if not _profile_lock.acquire(blocking=False):
+        return fn(*args, **kwargs), {'error': 'طلب آخر قيد التحليل حالياً'}
+
+    profiler = cProfile.Profile()
+    start = time.perf_counter()
+    try:
+        profiler.enable()
+        try:
+            result = fn(*args, **kwargs)
+        finally:
+            profiler.disable()
+        report = summarize(profiler)
+        report['wall_ms'] = round((time.perf_counter() - start) * 1000, 3)
+        if PROFILE_DIR:
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            path = os.path.join(PROFILE_DIR, f"request-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{threading.get_ident()}.prof")
+            profiler.dump_stats(path)
+            report['stats_file'] = path
+        return result, report
+    finally:
+        _profile_lock.release()
@@ -0,0 +1,107 @@
+import os
+
+
+def _env_float(name: str, default: float) -> float:
+    """قراءة قيمة عشرية من متغيرات البيئة"""
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        print(f"تحذير: قيمة غير صالحة للمتغير {name} - سيتم استخدام {default}")
+        return default
+
+
+def _env_int(name: str, default: int) -> int:
+    """قراءة قيمة صحيحة من متغيرات البيئة"""
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        print(f"تحذير: قيمة غير صالحة للمتغير {name} - سيتم استخدام {default}")
+        return default
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    """قراءة قيمة منطقية من متغيرات البيئة (1/true/yes)"""
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+# إخلاء النماذج غير المستخدمة من الذاكرة بعد هذه المدة بالثواني (0 = معطل)
+MODEL_IDLE_SECONDS = _env_float('RAG_MODEL_IDLE_SECONDS', 0)
+
+# تجميع طلبات T5 المتزامنة في دفعات واحدة
+GENERATION_BATCHING = _env_bool('RAG_GENERATION_BATCHING', False)
+GENERATION_MAX_BATCH_SIZE = _env_int('RAG_GENERATION_MAX_BATCH_SIZE', 8)
+GENERATION_MAX_WAIT_MS = _env_float('RAG_GENERATION_MAX_WAIT_MS', 10)
+
+# خلفية الاستدلال لكل مكوّن: fp32 أو int8 أو onnx أو stub (نماذج حتمية بلا تنزيل لاختبارات الحمل)
+ENCODER_BACKEND = os.environ.get('RAG_ENCODER_BACKEND', 'fp32')
+GENERATOR_BACKEND = os.environ.get('RAG_GENERATOR_BACKEND', 'fp32')
+# أبعاد مرمز stub (384 مثل MiniLM) وزمن توليد محاكى لكل استدعاء بالميلي ثانية
+STUB_EMBEDDING_DIM = _env_int('RAG_STUB_EMBEDDING_DIM', 384)
+STUB_GENERATION_MS = _env_float('RAG_STUB_GENERATION_MS', 0)
+
+# ميزانية رموز مدخل T5 (السؤال + السياقات المعبأة)
+GENERATION_MAX_INPUT_TOKENS = _env_int('RAG_GENERATION_MAX_INPUT_TOKENS', 512)
+
+# إعدادات فك الترميز: sampling (السلوك الأصلي) أو greedy أو beam
+DECODING_PROFILE = os.environ.get('RAG_DECODING_PROFILE', 'sampling')
+# حجم ذاكرة نتائج التوليد الحتمية (0 = معطلة)
+GENERATION_CACHE_SIZE = _env_int('RAG_GENERATION_CACHE_SIZE', 1024)
+
+# تخطي توليد T5 عندما تتجاوز درجة أفضل مرشح مستخرج هذه العتبة (0 = معطل)
+CASCADE_THRESHOLD = _env_float('RAG_CASCADE_THRESHOLD', 0)
+
+# خادم الإنتاج (serve.py): عدد العمليات والخيوط لكل عملية
+SERVER_WORKERS = _env_int('RAG_SERVER_WORKERS', 2)
+SERVER_THREADS = _env_int('RAG_SERVER_THREADS', 4)
+# خيوط torch/FAISS لكل عملية (0 = أنوية المعالج مقسومة على عدد العمليات)
+WORKER_COMPUTE_THREADS = _env_int('RAG_WORKER_COMPUTE_THREADS', 0)
+
+# وضع التصحيح لخادم Flask التطويري (بدون إعادة التحميل التلقائي)
+FLASK_DEBUG = _env_bool('RAG_FLASK_DEBUG', False)
+
+# التحكم في القبول: حد الطلبات المتزامنة (0 = معطل) وطابور انتظار محدود
+ADMISSION_MAX_IN_FLIGHT = _env_int('RAG_ADMISSION_MAX_IN_FLIGHT', 0)
+ADMISSION_MAX_QUEUE = _env_int('RAG_ADMISSION_MAX_QUEUE', 16)
+ADMISSION_QUEUE_TIMEOUT_MS = _env_float('RAG_ADMISSION_QUEUE_TIMEOUT_MS', 2000)
+# خيوط مراحل الاسترجاع والتوليد (0 = التنفيذ على خيط الطلب)
+RETRIEVAL_WORKERS = _env_int('RAG_RETRIEVAL_WORKERS', 0)
+GENERATION_WORKERS = _env_int('RAG_GENERATION_WORKERS', 0)
+
+# الحد الأقصى لعدد الأسئلة في طلب /api/smart_ask_batch واحد
+BATCH_MAX_QUESTIONS = _env_int('RAG_BATCH_MAX_QUESTIONS', 64)
+
+# /api/retrieve: ميزانية الزمن (تُسجّل تجاوزاتها في المقاييس) وحد top_k وطول المقتطف
+RETRIEVE_BUDGET_MS = _env_float('RAG_RETRIEVE_BUDGET_MS', 250)
+RETRIEVE_MAX_TOP_K = _env_int('RAG_RETRIEVE_MAX_TOP_K', 50)
+SNIPPET_CHARS = _env_int('RAG_SNIPPET_CHARS', 200)
+
+# تشغيل استعلامات تجريبية عبر جميع المراحل قبل الإبلاغ عن الجاهزية في /readyz
+WARMUP_ENABLED = _env_bool('RAG_WARMUP', True)
+
+# ميزانية زمن افتراضية لكل طلب بالميلي ثانية (0 = بدون حد؛ يمكن تجاوزها بالترويسة X-Request-Deadline-Ms)
+REQUEST_DEADLINE_MS = _env_float('RAG_REQUEST_DEADLINE_MS', 0)
+
+# الاستجابات المفصلة افتراضياً (السلوك القديم)؛ وإلا الإجابة والثقة وأرقام السياقات ومقتطفاتها فقط
+VERBOSE_RESPONSES = _env_bool('RAG_VERBOSE_RESPONSES', False)
+# ضغط استجابات JSON حسب Accept-Encoding (0 = معطل) ومستوياته
+COMPRESSION_MIN_BYTES = _env_int('RAG_COMPRESSION_MIN_BYTES', 512)
+GZIP_LEVEL = _env_int('RAG_GZIP_LEVEL', 6)
+BROTLI_QUALITY = _env_int('RAG_BROTLI_QUALITY', 5)
+
+# تحليل أداء طلب واحد عند الطلب: رموز أو عناوين عملاء مسموح لها (فارغ = معطل)
+PROFILE_ALLOWLIST = frozenset(
+    item.strip() for item in os.environ.get('RAG_PROFILE_ALLOWLIST', '').split(',') if item.strip()
+)
+# مجلد حفظ ملفات pstats الكاملة (فارغ = الملخص في الاستجابة فقط)
+PROFILE_DIR = os.environ.get('RAG_PROFILE_DIR', '')
+PROFILE_TOP_N = _env_int('RAG_PROFILE_TOP_N', 15)
+
+# إعادة تحميل الفهرس والسياقات دون توقف: فحص embeddings/CURRENT كل عدد من الثواني (0 = معطل، يبقى /admin/reload)
+ARTIFACT_WATCH_SECONDS = _env_float('RAG_ARTIFACT_WATCH_SECONDS', 0)
+# رمز مطلوب في ترويسة X-Admin-Token لـ /admin/* (فارغ = نقاط الإدارة معطلة)
+ADMIN_TOKEN = os.environ.get('RAG_ADMIN_TOKEN', '')
+# السماح لطلبات الجهاز المحلي بدون رمز (لا يُستخدم خلف وكيل عكسي على الجهاز نفسه)
+ADMIN_ALLOW_LOCALHOST = _env_bool('RAG_ADMIN_ALLOW_LOCALHOST', False)
@@ -0,0 +1,142 @@
+import difflib
+import math
+from typing import Dict, List, Sequence, Tuple
+import numpy as np
+
+# أوزان تشابه جاكارد للكلمات المفردة والثنائية والثلاثية
+NGRAM_WEIGHTS = (0.5, 0.3, 0.2)
+
+# مضاعف تجميع تجزئات الكلمات داخل الـ n-gram (يلتف ضمن uint64)
+_NGRAM_MULTIPLIER = np.uint64(1099511628211)
+
+
+def hash_tokens(words: Sequence[str]) -> np.ndarray:
+    """تحويل الكلمات إلى مصفوفة تجزئات صحيحة"""
+    return np.fromiter((hash(word) for word in words), dtype=np.int64, count=len(words)).view(np.uint64)
+
+
+def hashed_shingles(words: Sequence[str], max_n: int = 3) -> List[np.ndarray]:
+    """مجموعات الـ n-grams (من 1 إلى max_n) كمصفوفات تجزئات فريدة ومرتبة"""
+    token_hashes = hash_tokens(words)
+    shingles = []
+    current = token_hashes
+    for n in range(1, max_n + 1):
+        if n > 1:
+            # تجزئة الـ n-gram = تجزئة الـ (n-1)-gram * M + تجزئة الكلمة التالية
+            current = current[:-1] * _NGRAM_MULTIPLIER + token_hashes[n - 1:]
+        shingles.append(np.unique(current))
+    return shingles
+
+
+def _jaccard(set1: np.ndarray, set2: np.ndarray) -> float:
+    """تشابه جاكارد بين مصفوفتين فريدتين ومرتبتين"""
+    if set1.size == 0 and set2.size == 0:
+        return 0.0
+    intersection = np.intersect1d(set1, set2, assume_unique=True).size
+    return intersection / (set1.size + set2.size - intersection)
+
+
+def ngram_jaccard(shingles1: List[np.ndarray], shingles2: List[np.ndarray],
+                  weights: Tuple[float, ...] = NGRAM_WEIGHTS) -> float:
+    """تشابه جاكارد الموزون للـ n-grams بين نصين"""
+    return float(sum(
+        weight * _jaccard(set1, set2)
+        for weight, set1, set2 in zip(weights, shingles1, shingles2)
+    ))
+
+
+# أقل عدد نصوص يصبح عنده البحث المدمج أسرع من حساب كل زوج على حدة
+_MANY_MIN_OTHERS = 6
+
+
+def ngram_jaccard_many(query_shingles: List[np.ndarray], others: List[List[np.ndarray]],
+                       weights: Tuple[float, ...] = NGRAM_WEIGHTS) -> np.ndarray:
+    """تشابه جاكارد الموزون بين نص واحد ومجموعة نصوص: بحث ثنائي واحد لكل مستوى
+    في المصفوفة المرتبة للنص بدلاً من تقاطع مجموعات لكل زوج"""
+    if len(others) < _MANY_MIN_OTHERS:
+        # لعدد قليل من النصوص تكلفة الدمج أعلى من التقاطع المباشر
+        return np.array([ngram_jaccard(query_shingles, other, weights) for other in others], dtype=np.float64)
+    scores = np.zeros(len(others), dtype=np.float64)
+    for level, weight in enumerate(weights):
+        query = query_shingles[level]
+        sets = [other_shingles[level] for other_shingles in others]
+        sizes = np.fromiter((other.size for other in sets), dtype=np.int64, count=len(sets))
+        if query.size:
+            # عدد العناصر المشتركة لكل نص من المجموع التراكمي للمطابقات على مصفوفة واحدة مدمجة
+            values = np.concatenate(sets)
+            positions = np.minimum(np.searchsorted(query, values), query.size - 1)
+            matches = np.concatenate(([0], np.cumsum(query[positions] == values)))
+            ends = np.cumsum(sizes)
+            intersections = matches[ends] - matches[ends - sizes]
+        else:
+            intersections = np.zeros(len(sets), dtype=np.int64)
+        unions = query.size + sizes - intersections
+        nonempty = unions > 0
+        scores[nonempty] += weight * intersections[nonempty] / unions[nonempty]
+    return scores
+
+
+# طول النص الثاني الذي يبدأ عنده difflib بإهمال الأحرف الشائعة (autojunk)
+_AUTOJUNK_MIN_CHARS = 200
+
+
+def sequence_ratio(text1: str, text2: str, exact_max_chars: int = 400) -> float:
+    """تشابه التسلسل بتكلفة محدودة: difflib على الأحرف للنصوص القصيرة وعلى الكلمات للطويلة.
+    أقصى فرق مقاس عن difflib على الأحرف ~0.10 (أثره على composite بوزن 0.10 لا يتجاوز ~0.01)؛
+    راجع scripts/benchmark_similarity.py"""
+    total_chars = len(text1) + len(text2)
+    if total_chars == 0:
+        return 1.0
+    if not text1 or not text2:
+        return 0.0
+
+    # النصوص القصيرة (جملة مقابل سؤال) تبقى على نتيجة difflib الدقيقة، وكذلك كل نص ثانٍ
+    # أقصر من حد autojunk: هناك يطابق difflib أحرفاً متفرقة بين كلمات مختلفة فيبتعد عنه
+    # التقريب على مستوى الكلمات حتى ~0.25
+    if total_chars <= exact_max_chars or len(text2) < _AUTOJUNK_MIN_CHARS:
+        return difflib.SequenceMatcher(None, text1, text2).ratio()
+
+    words1 = text1.split()
+    words2 = text2.split()
+    matcher = difflib.SequenceMatcher(None, words1, words2)
+
+    # خروج مبكر: لا توجد كلمات مشتركة إطلاقاً
+    if matcher.quick_ratio() == 0:
+        return 0.0
+
+    # وزن الكتل المتطابقة بعدد أحرفها ليبقى المقياس قريباً من نسبة الأحرف
+    prefix = [0]
+    for word in words1:
+        prefix.append(prefix[-1] + len(word) + 1)
+    matched_chars = sum(
+        prefix[i + size] - prefix[i] - 1
+        for i, _, size in matcher.get_matching_blocks() if size
+    )
+    return min(1.0, 2.0 * matched_chars / total_chars)
+
+
+# قيم idf لـ TfidfVectorizer (smooth_idf) عند ملاءمته على وثيقتين فقط
+_IDF_SHARED = 1.0
+_IDF_SINGLE = math.log(3 / 2) + 1.0
+
+
+def tfidf_pair_cosine(counts1: Dict[str, int], counts2: Dict[str, int]) -> float:
+    """مكافئ دقيق لملاءمة TfidfVectorizer على [نص1، نص2] ثم حساب جيب التمام بينهما،
+    دون بناء مُتجه جديد لكل زوج"""
+    if not counts1 or not counts2:
+        return 0.0
+
+    dot = 0.0
+    norm1 = 0.0
+    for term, count in counts1.items():
+        other = counts2.get(term)
+        if other is None:
+            norm1 += (count * _IDF_SINGLE) ** 2
+        else:
+            dot += count * other
+            norm1 += count * count
+    norm2 = sum(
+        (count * (_IDF_SHARED if term in counts1 else _IDF_SINGLE)) ** 2
+        for term, count in counts2.items()
+    )
+    return dot / math.sqrt(norm1 * norm2)
@@ -1,7 +1,17 @@
-from transformers import pipeline, AutoTokenizer, AutoModelForSeq2SeqLM
 from advanced_text_processor import AdvancedArabicProcessor
-from typing import List, Dict, Tuple
+from keyword_matcher import KeywordMatcher
+from model_registry import get_model_registry
+from generation_scheduler import get_generation_scheduler
+from context_packer import ContextPacker
+from decoding import get_decoding_config, get_generation_cache
+from metrics import record_model_call, stage_timer
+from deadline import Deadline
+from settings import CASCADE_THRESHOLD, GENERATION_BATCHING
+from collections import Counter
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+import queue
 import re
+import threading
 import numpy as np
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
@@ -11,264 +21,537 @@ class SmartAnswerGenerator:
         """مولد إجابات ذكي متقدم"""
         self.text_processor = AdvancedArabicProcessor()
         
-        # تحميل نماذج متعددة للحصول على أفضل النتائج
-        self.models = {}
+        # النماذج تُحمّل عند أول استخدام من السجل المشترك بين جميع المولدات
+        self.model_registry = get_model_registry()
+        self.use_batching = GENERATION_BATCHING
+        self.decoding_config = get_decoding_config()
+        self.generation_cache = get_generation_cache()
+        self.context_packer = ContextPacker(lambda: self.model_registry.get('t5').tokenizer)
         
-        try:
-            # نموذج T5 للنصوص العربية
-            self.models['t5'] = pipeline(
-                "text2text-generation",
-                model="t5-small",
-                tokenizer="t5-small",
-                max_length=512,
-                device=-1
-            )
-        except Exception as e:
-            print(f"خطأ في تحميل T5: {e}")
+        # عدد مرات اتخاذ كل مسار في التسلسل (استخراجي فقط أو مع التوليد العصبي)
+        self.cascade_threshold = CASCADE_THRESHOLD
+        self.path_counts = Counter()
+        self._path_lock = threading.Lock()
+    
+    def run_model(self, model_name: str, input_text: str, **generate_kwargs) -> List[Dict]:
+        """تشغيل نموذج توليد مباشرة أو عبر مجدول الدفعات المشترك، مع تخزين النتائج الحتمية"""
+        def generate():
+            record_model_call(model_name, 'generation')
+            if self.use_batching:
+                return get_generation_scheduler(model_name).generate(input_text, **generate_kwargs)
+            return self.model_registry.get(model_name)(input_text, **generate_kwargs)
         
-        try:
-            # نموذج GPT للنصوص
-            self.models['gpt'] = pipeline(
-                "text-generation",
-                model="gpt2",
-                max_length=200,
-                device=-1
-            )
-        except Exception as e:
-            print(f"خطأ في تحميل GPT: {e}")
+        return self.generation_cache.get_or_generate(model_name, input_text, generate_kwargs, generate)
     
-    def validate_answer_advanced(self, question: str, answer: str, contexts: List[str]) -> Dict:
+    def run_model_batch(self, model_name: str, input_texts: List[str], **generate_kwargs) -> List[List[Dict]]:
+        """تشغيل نموذج توليد على عدة مدخلات باستدعاء pipeline واحد (المخزن منها لا يُعاد توليده)"""
+        results: List[Optional[List[Dict]]] = [
+            self.generation_cache.get(model_name, input_text, generate_kwargs) for input_text in input_texts
+        ]
+        # المدخلات المكررة داخل الدفعة تُولّد مرة واحدة
+        pending = list(dict.fromkeys(
+            input_text for input_text, result in zip(input_texts, results) if result is None
+        ))
+        if pending:
+            record_model_call(model_name, 'generation', len(pending))
+            if self.use_batching:
+                scheduler = get_generation_scheduler(model_name)
+                futures = [scheduler.submit(input_text, **generate_kwargs) for input_text in pending]
+                outputs = [future.result() for future in futures]
+            else:
+                model = self.model_registry.get(model_name)
+                outputs = model(pending, batch_size=len(pending), **generate_kwargs)
+                # توحيد الشكل مع استدعاء النص الواحد: قائمة من القواميس لكل مدخل
+                outputs = [output if isinstance(output, list) else [output] for output in outputs]
+            generated = dict(zip(pending, outputs))
+            for input_text, output in generated.items():
+                self.generation_cache.put(model_name, input_text, generate_kwargs, output)
+            results = [
+                result if result is not None else generated[input_text]
+                for input_text, result in zip(input_texts, results)
+            ]
+        return results
+    
+    def validate_answer_advanced(self, question: str, answer: str, contexts: List[str],
+                                 question_info: Dict = None, matcher: KeywordMatcher = None,
+                                 embeddings: Dict[str, np.ndarray] = None) -> Dict:
         """تحقق متقدم من صحة الإجابة"""
-        validation = {
-            'is_valid': True,
-            'confidence_score': 0.0,
-            'quality_metrics': {},
-            'issues': [],
-            'strengths': []
-        }
+        return self.validate_answers_batch(question, [answer], contexts, question_info, matcher, embeddings)[0]
+    
+    def validate_answers_batch(self, question: str, answers: List[str], contexts: List[str],
+                               question_info: Dict = None, matcher: KeywordMatcher = None,
+                               embeddings: Dict[str, np.ndarray] = None) -> List[Dict]:
+        """تحقق متقدم من جميع الإجابات المرشحة بتمرير واحد: تحليل مشترك للسؤال
+        ومصفوفة تشابه واحدة (الإجابات × السياقات + السؤال). embeddings تمثيلات محسوبة
+        مسبقاً (embed_texts) فلا يُرمَّز إلا ما ليس فيها"""
+        if question_info is None:
+            question_info = self.text_processor.extract_question_type(question)
+        if matcher is None:
+            matcher = self.text_processor.build_question_matcher(question_info)
+        question_tokens = set(self.text_processor.advanced_clean_text(question).split())
         
-        # 1. فحص طول الإجابة
-        answer_length = len(answer.strip())
-        if answer_length < 5:
-            validation['is_valid'] = False
-            validation['issues'].append('الإجابة قصيرة جداً')
-        elif answer_length > 500:
-            validation['issues'].append('الإجابة طويلة جداً')
-        else:
-            validation['strengths'].append('طول الإجابة مناسب')
+        # العمود الأخير هو التشابه مع السؤال
+        similarity_matrix = self.text_processor.calculate_similarity_matrix(
+            answers, list(contexts) + [question], embeddings
+        ) if answers else []
         
-        # 2. فحص التشابه مع السياقات
-        context_similarities = []
-        for context in contexts:
-            sim = self.text_processor.calculate_advanced_similarity(answer, context)
-            context_similarities.append(sim['composite'])
+        validations = []
+        for answer, similarity_row in zip(answers, similarity_matrix):
+            validation = {
+                'is_valid': True,
+                'confidence_score': 0.0,
+                'quality_metrics': {},
+                'issues': [],
+                'strengths': []
+            }
+            
+            # 1. فحص طول الإجابة
+            answer_length = len(answer.strip())
+            if answer_length < 5:
+                validation['is_valid'] = False
+                validation['issues'].append('الإجابة قصيرة جداً')
+            elif answer_length > 500:
+                validation['issues'].append('الإجابة طويلة جداً')
+            else:
+                validation['strengths'].append('طول الإجابة مناسب')
+            
+            # 2. فحص التشابه مع السياقات
+            context_similarities = [sim['composite'] for sim in similarity_row[:-1]]
+            
+            max_context_sim = max(context_similarities) if context_similarities else 0
+            avg_context_sim = np.mean(context_similarities) if context_similarities else 0
+            
+            validation['quality_metrics']['max_context_similarity'] = max_context_sim
+            validation['quality_metrics']['avg_context_similarity'] = avg_context_sim
+            
+            if max_context_sim < 0.1:
+                validation['issues'].append('الإجابة لا تتطابق مع السياق')
+            elif max_context_sim > 0.5:
+                validation['strengths'].append('الإجابة مرتبطة بقوة بالسياق')
+            
+            # 3. فحص التشابه مع السؤال
+            question_sim = similarity_row[-1]
+            validation['quality_metrics']['question_similarity'] = question_sim['composite']
+            
+            if question_sim['composite'] > 0.8:
+                validation['issues'].append('الإجابة مطابقة للسؤال (تكرار)')
+            elif question_sim['composite'] < 0.1:
+                validation['issues'].append('الإجابة غير مرتبطة بالسؤال')
+            else:
+                validation['strengths'].append('الإجابة مرتبطة بالسؤال بشكل مناسب')
+            
+            # 4. فحص وجود معلومات جديدة
+            answer_tokens = set(self.text_processor.advanced_clean_text(answer).split())
+            
+            new_info_ratio = len(answer_tokens - question_tokens) / len(answer_tokens) if answer_tokens else 0
+            validation['quality_metrics']['new_information_ratio'] = new_info_ratio
+            
+            if new_info_ratio > 0.7:
+                validation['strengths'].append('الإجابة تحتوي على معلومات جديدة')
+            elif new_info_ratio < 0.3:
+                validation['issues'].append('الإجابة تكرر السؤال بدون إضافة معلومات')
+            
+            # 5. فحص الكيانات والكلمات المفتاحية
+            found = matcher.matched(answer)
+            entity_coverage = sum(1 for entity in question_info['entities'] if entity['text'] in found)
+            
+            if question_info['entities']:
+                entity_coverage = entity_coverage / len(question_info['entities'])
+                validation['quality_metrics']['entity_coverage'] = entity_coverage
+                
+                if entity_coverage > 0.5:
+                    validation['strengths'].append('الإجابة تغطي الكيانات المطلوبة')
+            
+            # حساب نتيجة الثقة المركبة
+            confidence_factors = [
+                max_context_sim * 0.4,  # التشابه مع السياق
+                min(question_sim['composite'], 0.5) * 0.2,  # التشابه المعتدل مع السؤال
+                new_info_ratio * 0.3,  # نسبة المعلومات الجديدة
+                entity_coverage * 0.1 if question_info['entities'] else 0.1  # تغطية الكيانات
+            ]
+            
+            validation['confidence_score'] = sum(confidence_factors)
+            
+            # تعديل الثقة بناءً على المشاكل
+            if validation['issues']:
+                validation['confidence_score'] *= (1 - len(validation['issues']) * 0.1)
+            
+            # تعزيز الثقة بناءً على نقاط القوة
+            if validation['strengths']:
+                validation['confidence_score'] *= (1 + len(validation['strengths']) * 0.05)
+            
+            validation['confidence_score'] = max(0.0, min(1.0, validation['confidence_score']))
+            
+            validations.append(validation)
         
-        max_context_sim = max(context_similarities) if context_similarities else 0
-        avg_context_sim = np.mean(context_similarities) if context_similarities else 0
+        return validations
+    
+    def stream_model(self, model_name: str, input_text: str, on_token: Callable[[str], None],
+                     **generate_kwargs) -> List[Dict]:
+        """تشغيل نموذج توليد مع إرسال النص المفكوك أولاً بأول إلى on_token"""
+        cached = self.generation_cache.get(model_name, input_text, generate_kwargs)
+        if cached is not None:
+            on_token(cached[0].get('generated_text', ''))
+            return cached
         
-        validation['quality_metrics']['max_context_similarity'] = max_context_sim
-        validation['quality_metrics']['avg_context_similarity'] = avg_context_sim
+        from transformers import TextIteratorStreamer
+        record_model_call(model_name, 'generation')
+        model = self.model_registry.get(model_name)
+        streamer = TextIteratorStreamer(model.tokenizer, skip_prompt=True, skip_special_tokens=True)
+        outputs = []
+        errors = []
         
-        if max_context_sim < 0.1:
-            validation['issues'].append('الإجابة لا تتطابق مع السياق')
-        elif max_context_sim > 0.5:
-            validation['strengths'].append('الإجابة مرتبطة بقوة بالسياق')
+        def run():
+            try:
+                outputs.extend(model(input_text, streamer=streamer, **generate_kwargs))
+            except Exception as e:
+                errors.append(e)
+                streamer.end()
         
-        # 3. فحص التشابه مع السؤال
-        question_sim = self.text_processor.calculate_advanced_similarity(answer, question)
-        validation['quality_metrics']['question_similarity'] = question_sim['composite']
+        # التوليد في خيط منفصل بينما يستهلك هذا الخيط الرموز من الـ streamer
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        for text in streamer:
+            if text:
+                on_token(text)
+        thread.join()
         
-        if question_sim['composite'] > 0.8:
-            validation['issues'].append('الإجابة مطابقة للسؤال (تكرار)')
-        elif question_sim['composite'] < 0.1:
-            validation['issues'].append('الإجابة غير مرتبطة بالسؤال')
+        if errors:
+            raise errors[0]
+        self.generation_cache.put(model_name, input_text, generate_kwargs, outputs)
+        return outputs
+    
+    def prepare_contexts(self, contexts: List) -> Tuple[List[str], List[float]]:
+        """استخراج نصوص ودرجات أفضل ثلاثة سياقات"""
+        if isinstance(contexts[0], dict):
+            context_texts = [ctx['context'] for ctx in contexts[:3]]
+            context_scores = [ctx.get('final_score', ctx.get('semantic_score', 1.0)) for ctx in contexts[:3]]
         else:
-            validation['strengths'].append('الإجابة مرتبطة بالسؤال بشكل مناسب')
+            context_texts = [str(ctx) for ctx in contexts[:3]]
+            context_scores = [1.0] * len(context_texts)
+        return context_texts, context_scores
+    
+    def analyze_question(self, question: str) -> Tuple[Dict, KeywordMatcher]:
+        """تحليل السؤال وبناء مطابق الكلمات المفتاحية مرة واحدة"""
+        with stage_timer('question_analysis'):
+            question_info = self.text_processor.extract_question_type(question)
+            matcher = self.text_processor.build_question_matcher(question_info)
+        return question_info, matcher
+    
+    def extract_candidates(self, question: str, context_texts: List[str],
+                           question_info: Dict, matcher: KeywordMatcher) -> List[Dict]:
+        """استخراج مرشحي الإجابات من كل سياق وترتيبهم"""
+        all_candidates = []
+        with stage_timer('candidate_extraction'):
+            for context in context_texts:
+                candidates = self.text_processor.extract_answer_candidates(
+                    question, context, question_info, matcher
+                )
+                all_candidates.extend(candidates)
         
-        # 4. فحص وجود معلومات جديدة
-        question_info = self.text_processor.extract_question_type(question)
-        answer_tokens = set(self.text_processor.advanced_clean_text(answer).split())
-        question_tokens = set(self.text_processor.advanced_clean_text(question).split())
+        all_candidates.sort(key=lambda x: x['composite_score'], reverse=True)
+        return all_candidates
+    
+    def generate_neural_answer(self, question: str, context_texts: List[str], context_scores: List[float],
+                               candidates: List[Dict],
+                               on_token: Callable[[str], None] = None) -> Tuple[Optional[Dict], Optional[Dict]]:
+        """توليد إجابة باستخدام T5 من السياقات المعبأة"""
+        if self.model_registry.get('t5') is None:
+            return None, None
         
-        new_info_ratio = len(answer_tokens - question_tokens) / len(answer_tokens) if answer_tokens else 0
-        validation['quality_metrics']['new_information_ratio'] = new_info_ratio
+        packed = None
+        try:
+            # تعبئة أعلى المقاطع والجمل درجة ضمن ميزانية رموز النموذج
+            with stage_timer('context_packing'):
+                packed = self.context_packer.pack(question, context_texts, context_scores, candidates)
+            input_text = packed['input_text']
+            with stage_timer('generation'):
+                if on_token is not None:
+                    result = self.stream_model('t5', input_text, on_token, **self.decoding_config)
+                else:
+                    result = self.run_model('t5', input_text, **self.decoding_config)
+            return self.neural_answer_from_output(result), packed
+        except Exception as e:
+            print(f"خطأ في T5: {e}")
+        return None, packed
+    
+    def neural_answer_from_output(self, result: List[Dict]) -> Optional[Dict]:
+        """تحويل مخرجات T5 إلى إجابة مرشحة (None إذا كان النص فارغاً)"""
+        if result and len(result) > 0:
+            generated_text = result[0].get('generated_text', '')
+            if generated_text:
+                return {
+                    'text': generated_text,
+                    'source': 't5_generated',
+                    'method': 'neural_generation'
+                }
+        return None
+    
+    def select_best_answer(self, question: str, context_texts: List[str], generated_answers: List[Dict],
+                           question_info: Dict, matcher: KeywordMatcher,
+                           deadline: Deadline = None) -> Tuple[Dict, int]:
+        """تقييم جميع الإجابات المرشحة واختيار أفضلها (مع محاولة الدمج عند ضعفها)"""
+        answers = [answer_data['text'] for answer_data in generated_answers]
+        # دفعة تمثيل واحدة للمرشحين والسياقات والسؤال يعيد الدمج استخدامها؛ جمل المرشحين
+        # تُرمَّز عند الدمج فقط (نادر: أفضل درجة أقل من 0.3) وما طابق منها مرشحاً لا يُعاد ترميزه
+        embeddings = self.text_processor.embed_texts(answers + list(context_texts) + [question])
+        validations = self.validate_answers_batch(
+            question,
+            answers,
+            context_texts,
+            question_info,
+            matcher,
+            embeddings
+        )
         
-        if new_info_ratio > 0.7:
-            validation['strengths'].append('الإجابة تحتوي على معلومات جديدة')
-        elif new_info_ratio < 0.3:
-            validation['issues'].append('الإجابة تكرر السؤال بدون إضافة معلومات')
+        evaluated_answers = []
+        for answer_data, validation in zip(generated_answers, validations):
+            evaluated_answers.append({
+                'text': answer_data['text'],
+                'validation': validation,
+                'source': answer_data['source'],
+                'method': answer_data['method'],
+                'final_score': validation['confidence_score']
+            })
         
-        # 5. فحص الكيانات والكلمات المفتاحية
-        entity_coverage = 0
-        for entity in question_info['entities']:
-            if entity['text'] in answer:
-                entity_coverage += 1
+        if not evaluated_answers:
+            return {
+                'text': 'عذراً، لم أتمكن من العثور على إجابة مناسبة في السياق المتاح.',
+                'validation': {'confidence_score': 0.0, 'issues': ['لا توجد إجابة مناسبة']},
+                'source': 'fallback',
+                'method': 'fallback',
+                'final_score': 0.0
+            }, 0
         
-        if question_info['entities']:
-            entity_coverage = entity_coverage / len(question_info['entities'])
-            validation['quality_metrics']['entity_coverage'] = entity_coverage
-            
-            if entity_coverage > 0.5:
-                validation['strengths'].append('الإجابة تغطي الكيانات المطلوبة')
-        
-        # حساب نتيجة الثقة المركبة
-        confidence_factors = [
-            max_context_sim * 0.4,  # التشابه مع السياق
-            min(question_sim['composite'], 0.5) * 0.2,  # التشابه المعتدل مع السؤال
-            new_info_ratio * 0.3,  # نسبة المعلومات الجديدة
-            entity_coverage * 0.1 if question_info['entities'] else 0.1  # تغطية الكيانات
-        ]
+        best_answer = max(evaluated_answers, key=lambda x: x['final_score'])
         
-        validation['confidence_score'] = sum(confidence_factors)
+        # إذا كانت أفضل إجابة ضعيفة، نحاول تحسينها
+        if best_answer['final_score'] < 0.3:
+            # إنشاء إجابة مركبة من أفضل المرشحين
+            top_candidates = [ans for ans in evaluated_answers if ans['final_score'] > 0.1]
+            if len(top_candidates) > 1 and (deadline is None or deadline.allows('combination')):
+                with stage_timer('combination'):
+                    combined_answer = self.combine_answers(top_candidates[:2], embeddings)
+                    combined_validation = self.validate_answer_advanced(
+                        question, combined_answer, context_texts, question_info, matcher, embeddings
+                    )
+                
+                if combined_validation['confidence_score'] > best_answer['final_score']:
+                    best_answer = {
+                        'text': combined_answer,
+                        'validation': combined_validation,
+                        'source': 'combined',
+                        'method': 'intelligent_combination',
+                        'final_score': combined_validation['confidence_score']
+                    }
+        
+        return best_answer, len(evaluated_answers)
+    
+    def record_path(self, path: str):
+        with self._path_lock:
+            self.path_counts[path] += 1
+    
+    def cascade_stats(self) -> Dict:
+        """عدد ونسبة الطلبات لكل مسار: extractive (عتبة التتالي)، deadline_extractive
+        (تخطي التوليد بسبب المهلة) و neural"""
+        with self._path_lock:
+            counts = dict(self.path_counts)
+        total = sum(counts.values())
+        return {
+            'threshold': self.cascade_threshold,
+            'counts': counts,
+            'rates': {path: count / total for path, count in counts.items()} if total else {}
+        }
+    
+    def plan_answer(self, question: str, contexts: List[Dict], cascade_threshold: float,
+                    analysis: Tuple[Dict, KeywordMatcher] = None, deadline: Deadline = None) -> Dict:
+        """المرحلة الأولى: تحليل السؤال واستخراج المرشحين واختيار المسار"""
+        # استخراج النصوص والنتائج
+        context_texts, context_scores = self.prepare_contexts(contexts)
+        
+        # تحليل السؤال
+        question_info, matcher = analysis or self.analyze_question(question)
         
-        # تعديل الثقة بناءً على المشاكل
-        if validation['issues']:
-            validation['confidence_score'] *= (1 - len(validation['issues']) * 0.1)
+        # استخراج مرشحي الإجابات من كل سياق
+        all_candidates = self.extract_candidates(question, context_texts, question_info, matcher)
+        
+        # المسار السريع: مرشح مستخرج بثقة كافية يغني عن التوليد العصبي
+        if cascade_threshold > 0 and all_candidates and all_candidates[0]['composite_score'] >= cascade_threshold:
+            path = 'extractive'
+            best_candidates = all_candidates[:1]
+        elif deadline is not None and not deadline.allows('neural_generation'):
+            # لا يتسع الوقت المتبقي للتوليد العصبي: الاختيار بين المرشحين المستخرجين فقط
+            # (مسار مستقل حتى لا تُحتسب ضمن إصابات عتبة التتالي)
+            path = 'deadline_extractive'
+            best_candidates = all_candidates[:3]
+        else:
+            path = 'neural'
+            best_candidates = all_candidates[:3]
+        self.record_path(path)
+        
+        return {
+            'question': question,
+            'context_texts': context_texts,
+            'context_scores': context_scores,
+            'question_info': question_info,
+            'matcher': matcher,
+            'all_candidates': all_candidates,
+            'best_candidates': best_candidates,
+            'path': path
+        }
+    
+    def finish_answer(self, plan: Dict, neural_answer: Optional[Dict], packed: Optional[Dict],
+                      deadline: Deadline = None) -> Dict:
+        """المرحلة الأخيرة: تقييم الإجابات المرشحة وبناء النتيجة"""
+        # توليد إجابات باستخدام النماذج
+        generated_answers = []
+        if neural_answer:
+            generated_answers.append(neural_answer)
         
-        # تعزيز الثقة بناءً على نقاط القوة
-        if validation['strengths']:
-            validation['confidence_score'] *= (1 + len(validation['strengths']) * 0.05)
+        # إضافة أفضل المرشحين المستخرجين
+        for candidate in plan['best_candidates']:
+            generated_answers.append({
+                'text': candidate['text'],
+                'source': 'extracted',
+                'method': 'rule_based_extraction',
+                'score': candidate['composite_score']
+            })
         
-        validation['confidence_score'] = max(0.0, min(1.0, validation['confidence_score']))
+        # تقييم جميع الإجابات المرشحة واختيار أفضلها
+        with stage_timer('validation'):
+            best_answer, evaluated_count = self.select_best_answer(
+                plan['question'], plan['context_texts'], generated_answers, plan['question_info'], plan['matcher'],
+                deadline
+            )
         
-        return validation
+        return {
+            'answer': best_answer['text'],
+            'confidence': best_answer['final_score'],
+            'validation': best_answer['validation'],
+            'source': best_answer['source'],
+            'method': best_answer['method'],
+            'context_scores': plan['context_scores'],
+            'used_contexts': len(plan['context_texts']),
+            'question_analysis': plan['question_info'],
+            'all_candidates': evaluated_count,
+            'path': plan['path'],
+            'generation_input': {
+                key: value for key, value in packed.items()
+                if key not in ('input_text', 'context')
+            } if packed else None,
+            'skipped_stages': list(deadline.skipped_stages) if deadline is not None else []
+        }
+    
+    def error_result(self, error: Exception) -> Dict:
+        return {
+            'answer': f'حدث خطأ في النظام: {str(error)}',
+            'confidence': 0.0,
+            'validation': {'issues': [str(error)]},
+            'source': 'error',
+            'method': 'error_handling',
+            'context_scores': [],
+            'used_contexts': 0
+        }
     
-    def generate_smart_answer(self, question: str, contexts: List[Dict]) -> Dict:
-        """توليد إجابة ذكية متقدمة"""
+    def generate_smart_answer(self, question: str, contexts: List[Dict],
+                              on_token: Callable[[str], None] = None,
+                              cascade_threshold: float = None,
+                              deadline: Deadline = None) -> Dict:
+        """توليد إجابة ذكية متقدمة (on_token يستقبل نص T5 أثناء فك الترميز،
+        و deadline يسمح بتخطي التوليد العصبي والدمج عند اقتراب نهاية الميزانية)"""
+        if cascade_threshold is None:
+            cascade_threshold = self.cascade_threshold
         try:
-            # استخراج النصوص والنتائج
-            if isinstance(contexts[0], dict):
-                context_texts = [ctx['context'] for ctx in contexts[:3]]
-                context_scores = [ctx.get('final_score', ctx.get('semantic_score', 1.0)) for ctx in contexts[:3]]
-            else:
-                context_texts = [str(ctx) for ctx in contexts[:3]]
-                context_scores = [1.0] * len(context_texts)
-            
-            # تحليل السؤال
-            question_info = self.text_processor.extract_question_type(question)
-            
-            # استخراج مرشحي الإجابات من كل سياق
-            all_candidates = []
-            for context in context_texts:
-                candidates = self.text_processor.extract_answer_candidates(question, context)
-                all_candidates.extend(candidates)
-            
-            # ترتيب جميع المرشحين
-            all_candidates.sort(key=lambda x: x['composite_score'], reverse=True)
-            
-            # اختيار أفضل المرشحين
-            best_candidates = all_candidates[:3]
-            
-            # توليد إجابات باستخدام النماذج
-            generated_answers = []
-            
-            # دمج السياقات
-            combined_context = "\n".join(context_texts)
+            plan = self.plan_answer(question, contexts, cascade_threshold, deadline=deadline)
             
             # توليد باستخدام T5
-            if 't5' in self.models:
-                try:
-                    input_text = f"question: {question} context: {combined_context}"
-                    result = self.models['t5'](
-                        input_text,
-                        max_length=200,
-                        num_return_sequences=1,
-                        temperature=0.7,
-                        do_sample=True
-                    )
-                    if result and len(result) > 0:
-                        generated_text = result[0].get('generated_text', '')
-                        if generated_text:
-                            generated_answers.append({
-                                'text': generated_text,
-                                'source': 't5_generated',
-                                'method': 'neural_generation'
-                            })
-                except Exception as e:
-                    print(f"خطأ في T5: {e}")
-            
-            # إضافة المرشحين المستخرجين
-            for candidate in best_candidates:
-                generated_answers.append({
-                    'text': candidate['text'],
-                    'source': 'extracted',
-                    'method': 'rule_based_extraction',
-                    'score': candidate['composite_score']
-                })
-            
-            # تقييم جميع الإجابات المرشحة
-            evaluated_answers = []
-            for answer_data in generated_answers:
-                validation = self.validate_answer_advanced(
-                    question, 
-                    answer_data['text'], 
-                    context_texts
+            neural_answer, packed = None, None
+            if plan['path'] == 'neural':
+                neural_answer, packed = self.generate_neural_answer(
+                    question, plan['context_texts'], plan['context_scores'], plan['all_candidates'], on_token
                 )
-                
-                evaluated_answers.append({
-                    'text': answer_data['text'],
-                    'validation': validation,
-                    'source': answer_data['source'],
-                    'method': answer_data['method'],
-                    'final_score': validation['confidence_score']
-                })
-            
-            # اختيار أفضل إجابة
-            if evaluated_answers:
-                best_answer = max(evaluated_answers, key=lambda x: x['final_score'])
-                
-                # إذا كانت أفضل إجابة ضعيفة، نحاول تحسينها
-                if best_answer['final_score'] < 0.3:
-                    # إنشاء إجابة مركبة من أفضل المرشحين
-                    top_candidates = [ans for ans in evaluated_answers if ans['final_score'] > 0.1]
-                    if len(top_candidates) > 1:
-                        combined_answer = self.combine_answers(top_candidates[:2])
-                        combined_validation = self.validate_answer_advanced(
-                            question, combined_answer, context_texts
-                        )
-                        
-                        if combined_validation['confidence_score'] > best_answer['final_score']:
-                            best_answer = {
-                                'text': combined_answer,
-                                'validation': combined_validation,
-                                'source': 'combined',
-                                'method': 'intelligent_combination',
-                                'final_score': combined_validation['confidence_score']
-                            }
-            else:
-                best_answer = {
-                    'text': 'عذراً، لم أتمكن من العثور على إجابة مناسبة في السياق المتاح.',
-                    'validation': {'confidence_score': 0.0, 'issues': ['لا توجد إجابة مناسبة']},
-                    'source': 'fallback',
-                    'method': 'fallback',
-                    'final_score': 0.0
-                }
             
-            return {
-                'answer': best_answer['text'],
-                'confidence': best_answer['final_score'],
-                'validation': best_answer['validation'],
-                'source': best_answer['source'],
-                'method': best_answer['method'],
-                'context_scores': context_scores,
-                'used_contexts': len(context_texts),
-                'question_analysis': question_info,
-                'all_candidates': len(evaluated_answers)
-            }
+            return self.finish_answer(plan, neural_answer, packed, deadline)
             
         except Exception as e:
-            return {
-                'answer': f'حدث خطأ في النظام: {str(e)}',
-                'confidence': 0.0,
-                'validation': {'issues': [str(e)]},
-                'source': 'error',
-                'method': 'error_handling',
-                'context_scores': [],
-                'used_contexts': 0
-            }
+            return self.error_result(e)
     
-    def combine_answers(self, candidates: List[Dict]) -> str:
-        """دمج إجابات متعددة لإنشاء إجابة محسنة"""
+    def generate_smart_answers_batch(self, questions: List[str], contexts_batch: List[List[Dict]],
+                                     cascade_threshold: float = None, deadline: Deadline = None) -> List[Dict]:
+        """توليد إجابات لعدة أسئلة: تحليل كل سؤال فريد مرة واحدة واستدعاء T5 واحد
+        لجميع الأسئلة التي تحتاج التوليد العصبي، مع الحفاظ على ترتيب النتائج"""
+        if cascade_threshold is None:
+            cascade_threshold = self.cascade_threshold
+        
+        results: List[Optional[Dict]] = [None] * len(questions)
+        plans: Dict[int, Dict] = {}
+        analyses: Dict[str, Tuple[Dict, KeywordMatcher]] = {}
+        for i, (question, contexts) in enumerate(zip(questions, contexts_batch)):
+            try:
+                if question not in analyses:
+                    analyses[question] = self.analyze_question(question)
+                plans[i] = self.plan_answer(question, contexts, cascade_threshold, analyses[question], deadline)
+            except Exception as e:
+                results[i] = self.error_result(e)
+        
+        # تعبئة مدخلات T5 لجميع الأسئلة ذات المسار العصبي ثم توليدها دفعة واحدة
+        packed_inputs: Dict[int, Dict] = {}
+        neural_answers: Dict[int, Dict] = {}
+        neural = [i for i, plan in plans.items() if plan['path'] == 'neural']
+        if neural and self.model_registry.get('t5') is not None:
+            try:
+                with stage_timer('context_packing'):
+                    for i in neural:
+                        plan = plans[i]
+                        packed_inputs[i] = self.context_packer.pack(
+                            plan['question'], plan['context_texts'], plan['context_scores'], plan['all_candidates']
+                        )
+                with stage_timer('generation'):
+                    outputs = self.run_model_batch(
+                        't5', [packed_inputs[i]['input_text'] for i in neural], **self.decoding_config
+                    )
+                for i, output in zip(neural, outputs):
+                    neural_answers[i] = self.neural_answer_from_output(output)
+            except Exception as e:
+                print(f"خطأ في T5: {e}")
+        
+        for i, plan in plans.items():
+            try:
+                results[i] = self.finish_answer(plan, neural_answers.get(i), packed_inputs.get(i), deadline)
+            except Exception as e:
+                results[i] = self.error_result(e)
+        
+        return results
+    
+    def generate_smart_answer_stream(self, question: str, contexts: List[Dict],
+                                     deadline: Deadline = None) -> Iterator[Dict]:
+        """نسخة متدفقة: أحداث token أثناء التوليد ثم حدث result بالنتيجة الكاملة"""
+        events = queue.Queue()
+        
+        def run():
+            try:
+                result = self.generate_smart_answer(
+                    question, contexts, on_token=lambda text: events.put({'event': 'token', 'text': text}),
+                    deadline=deadline
+                )
+            except Exception as e:
+                result = self.error_result(e)
+            events.put({'event': 'result', 'result': result})
+        
+        threading.Thread(target=run, daemon=True).start()
+        while True:
+            event = events.get()
+            yield event
+            if event['event'] == 'result':
+                break
+    
+    @staticmethod
+    def split_answer_sentences(text: str) -> List[str]:
+        """الجمل المرشحة للدمج من نص إجابة"""
+        return [sentence.strip() for sentence in text.split('.') if len(sentence.strip()) > 10]
+    
+    def combine_answers(self, candidates: List[Dict], embeddings: Dict[str, np.ndarray] = None) -> str:
+        """دمج إجابات متعددة لإنشاء إجابة محسنة (embeddings: تمثيلات الجمل إن حُسبت مسبقاً)"""
         if not candidates:
             return ""
         
@@ -279,23 +562,18 @@ class SmartAnswerGenerator:
         important_sentences = []
         
         for candidate in candidates:
-            sentences = candidate['text'].split('.')
-            for sentence in sentences:
-                sentence = sentence.strip()
-                if len(sentence) > 10:
-                    important_sentences.append(sentence)
-        
-        # إزالة التكرار
-        unique_sentences = []
-        for sentence in important_sentences:
-            is_duplicate = False
-            for existing in unique_sentences:
-                similarity = self.text_processor.calculate_advanced_similarity(sentence, existing)
-                if similarity['composite'] > 0.7:
-                    is_duplicate = True
-                    break
+            important_sentences.extend(self.split_answer_sentences(candidate['text']))
+        
+        # إزالة التكرار باستخدام مصفوفة تشابه واحدة بين جميع الجمل
+        similarity_matrix = self.text_processor.calculate_similarity_matrix(
+            important_sentences, important_sentences, embeddings
+        ) if important_sentences else []
+        unique_indices = []
+        for i in range(len(important_sentences)):
+            is_duplicate = any(similarity_matrix[i][j]['composite'] > 0.7 for j in unique_indices)
             if not is_duplicate:
-                unique_sentences.append(sentence)
+                unique_indices.append(i)
+        unique_sentences = [important_sentences[i] for i in unique_indices]
         
         # دمج الجمل
         combined = '. '.join(unique_sentences[:3])  # أفضل 3 جمل
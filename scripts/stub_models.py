@@ -0,0 +1,142 @@
+import hashlib
+import re
+import threading
+import time
+from types import SimpleNamespace
+from typing import Dict, List, Optional, Union
+import numpy as np
+
+from settings import STUB_EMBEDDING_DIM, STUB_GENERATION_MS
+
+# نماذج بديلة حتمية لا تحتاج تنزيلاً من الشبكة: لاختبارات الحمل وقياس طبقات الخدمة
+# والاسترجاع والتخزين والجدولة دون MiniLM أو T5 أو GPT-2. جودة الإجابات ليست هدفاً.
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+_T5_INPUT_RE = re.compile(r'question:\s*(.*?)\s*context:\s*(.*)', re.DOTALL)
+_CAUSAL_INPUT_RE = re.compile(r'السياق:\s*(.*?)\s*السؤال:\s*(.*?)\s*الإجابة:', re.DOTALL)
+
+
+def _stable_hash(feature: str) -> int:
+    """تجزئة ثابتة بين العمليات (بخلاف hash() المعشّى في بايثون)"""
+    return int.from_bytes(hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+class StubEncoder:
+    def __init__(self, model_name: str = 'stub', dimension: int = STUB_EMBEDDING_DIM):
+        """مرمز حتمي بتجزئة الكلمات وثلاثيات الأحرف إلى متجه ثابت الأبعاد (بديل SentenceTransformer)"""
+        self.model_name = model_name
+        self.dimension = dimension
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dimension
+
+    def _embed(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        words = _WORD_RE.findall(text.lower())
+        features = list(words)
+        for word in words:
+            padded = f"#{word}#"
+            features.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+        for feature in features:
+            h = _stable_hash(feature)
+            # البت الأعلى يحدد الإشارة حتى تتلاشى التصادمات في المتوسط
+            vector[h % self.dimension] += 1.0 if (h >> 63) else -1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def encode(self, sentences: Union[str, List[str]], batch_size: int = 32, show_progress_bar: bool = False,
+               convert_to_numpy: bool = True, normalize_embeddings: bool = False, **kwargs) -> np.ndarray:
+        """نفس واجهة SentenceTransformer.encode: مصفوفة (n, dimension) أو متجه لنص واحد"""
+        if isinstance(sentences, str):
+            return self._embed(sentences)
+        if len(sentences) == 0:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+        return np.stack([self._embed(str(sentence)) for sentence in sentences])
+
+
+class StubTokenizer:
+    def __init__(self):
+        """مقسم على مستوى الكلمات بمعجم يُبنى أثناء التشغيل؛ يكفي لعد الرموز وبث النص"""
+        self.eos_token_id = 0
+        self.pad_token_id = 0
+        self._vocab: Dict[str, int] = {}
+        self._words: List[str] = ['</s>']
+        self._lock = threading.Lock()
+
+    def _token_id(self, word: str) -> int:
+        token_id = self._vocab.get(word)
+        if token_id is None:
+            with self._lock:
+                token_id = self._vocab.get(word)
+                if token_id is None:
+                    token_id = len(self._words)
+                    self._words.append(word)
+                    self._vocab[word] = token_id
+        return token_id
+
+    def encode(self, text: str, add_special_tokens: bool = True) -> List[int]:
+        ids = [self._token_id(word) for word in text.split()]
+        return ids + [self.eos_token_id] if add_special_tokens else ids
+
+    def __call__(self, text: str, add_special_tokens: bool = True, **kwargs) -> Dict[str, List[int]]:
+        return {'input_ids': self.encode(text, add_special_tokens)}
+
+    def decode(self, token_ids, skip_special_tokens: bool = False, **kwargs) -> str:
+        words = [
+            self._words[token_id] for token_id in token_ids
+            if not (skip_special_tokens and token_id == self.eos_token_id) and token_id < len(self._words)
+        ]
+        return ' '.join(words)
+
+
+class StubGenerationPipeline:
+    def __init__(self, model_name: str, task: str = 'text2text-generation',
+                 max_length: int = 512, delay_ms: float = STUB_GENERATION_MS):
+        """مولد قالبي استخراجي بواجهة pipeline من transformers: يعيد جملة السياق الأكثر
+        تداخلاً مع كلمات السؤال. delay_ms يحاكي زمن النموذج لكل استدعاء (دفعة)"""
+        self.task = task
+        self.max_length = max_length
+        self.delay_ms = delay_ms
+        self.tokenizer = StubTokenizer()
+        self.model = SimpleNamespace(config=SimpleNamespace(_name_or_path=f"stub-{model_name}"))
+
+    def parse_input(self, text: str):
+        """(السؤال، السياق) من صيغة T5 أو صيغة GPT-2 المستخدمة في المولدات"""
+        match = _T5_INPUT_RE.search(text)
+        if match:
+            return match.group(1), match.group(2)
+        match = _CAUSAL_INPUT_RE.search(text)
+        if match:
+            return match.group(2), match.group(1)
+        return '', text
+
+    def answer(self, text: str, max_words: int) -> str:
+        question, context = self.parse_input(text)
+        sentences = [s.strip() for s in re.split(r'(?<=[.؟!?\n])\s+', context) if s.strip()]
+        if not sentences:
+            return ''
+        question_words = set(_WORD_RE.findall(question.lower()))
+        # أكبر تداخل، والأسبق عند التساوي حتى تكون النتيجة حتمية
+        best = max(sentences, key=lambda s: len(question_words & set(_WORD_RE.findall(s.lower()))))
+        return ' '.join(best.split()[:max_words])
+
+    def _generate_one(self, text: str, kwargs: Dict, streamer=None) -> List[Dict]:
+        max_words = kwargs.get('max_new_tokens') or kwargs.get('max_length') or self.max_length
+        answer = self.answer(text, max_words)
+        if streamer is not None:
+            # نفس تسلسل الاستدعاءات في generate: المدخل أولاً (يُتخطى مع skip_prompt) ثم رمز تلو رمز
+            streamer.put(np.array([self.tokenizer.encode(text, add_special_tokens=False)]))
+            for token_id in self.tokenizer.encode(answer, add_special_tokens=False):
+                streamer.put(np.array([token_id]))
+            streamer.end()
+        if self.task == 'text-generation' and kwargs.get('return_full_text', True):
+            answer = f"{text} {answer}"
+        return [{'generated_text': answer}]
+
+    def __call__(self, inputs: Union[str, List[str]], streamer=None, batch_size: Optional[int] = None,
+                 **generate_kwargs) -> Union[List[Dict], List[List[Dict]]]:
+        if self.delay_ms > 0:
+            time.sleep(self.delay_ms / 1000)
+        if isinstance(inputs, str):
+            return self._generate_one(inputs, generate_kwargs, streamer)
+        return [self._generate_one(text, generate_kwargs) for text in inputs]
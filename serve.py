@@ -0,0 +1,115 @@
+"""خادم الإنتاج: تهيئة النماذج مرة واحدة في العملية الرئيسية ثم تفريع العمال
+
+    python serve.py --bind 0.0.0.0:5000 --workers 4 --threads 4
+
+الأوزان والفهرس تُحمّل قبل fork فتتشاركها العمليات عبر النسخ عند الكتابة
+بدلاً من أن تحمّل كل عملية نسخة خاصة بها.
+"""
+import argparse
+import gc
+import os
+import sys
+
+from gunicorn.app.base import BaseApplication
+
+import smart_app
+from model_registry import get_model_registry
+from settings import MODEL_IDLE_SECONDS, SERVER_THREADS, SERVER_WORKERS, WORKER_COMPUTE_THREADS
+
+
+def compute_threads_per_worker(workers: int, configured: int = WORKER_COMPUTE_THREADS) -> int:
+    """خيوط torch/FAISS لكل عامل حتى لا يتجاوز المجموع عدد الأنوية"""
+    if configured > 0:
+        return configured
+    return max(1, (os.cpu_count() or 1) // max(1, workers))
+
+
+def set_compute_threads(threads: int):
+    """ضبط خيوط torch و FAISS (OpenMP) في العملية الحالية"""
+    os.environ['OMP_NUM_THREADS'] = str(threads)
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except Exception as e:
+        print(f"تحذير: تعذر ضبط خيوط torch: {e}")
+    try:
+        import faiss
+        faiss.omp_set_num_threads(threads)
+    except Exception as e:
+        print(f"تحذير: تعذر ضبط خيوط FAISS: {e}")
+
+
+def preload_system() -> bool:
+    """تهيئة المسترجع والمولد وتحميل T5 في العملية الرئيسية"""
+    if not smart_app.initialize_smart_system():
+        return False
+    # T5 يُحمّل عند أول طلب افتراضياً؛ تحميله هنا يجعله مشتركاً بين العمال
+    loaded = get_model_registry().preload(['t5'])
+    print(f"النماذج المحملة قبل التفريع: {get_model_registry().loaded_models()}")
+    if 't5' not in loaded:
+        print("تحذير: تعذر تحميل T5 مسبقاً - سيحاول كل عامل تحميله عند الحاجة")
+    return True
+
+
+class SmartRAGServer(BaseApplication):
+    def __init__(self, application, options: dict):
+        """تطبيق gunicorn يستخدم كائن Flask المهيأ مسبقاً"""
+        self.application = application
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            if key in self.cfg.settings and value is not None:
+                self.cfg.set(key, value)
+
+    def load(self):
+        return self.application
+
+
+def main():
+    parser = argparse.ArgumentParser(description="تشغيل نظام RAG الذكي بخادم gunicorn متعدد العمليات")
+    parser.add_argument('--bind', default='0.0.0.0:5000')
+    parser.add_argument('--workers', type=int, default=SERVER_WORKERS)
+    parser.add_argument('--threads', type=int, default=SERVER_THREADS)
+    parser.add_argument('--compute-threads', type=int, default=WORKER_COMPUTE_THREADS,
+                        help="خيوط torch/FAISS لكل عامل (0 = تلقائي)")
+    parser.add_argument('--timeout', type=int, default=120)
+    args = parser.parse_args()
+
+    compute_threads = compute_threads_per_worker(args.workers, args.compute_threads)
+
+    if not preload_system():
+        print("❌ فشل في تهيئة النظام الذكي.")
+        sys.exit(1)
+
+    # نقل الكائنات الحالية إلى الجيل الدائم حتى لا يلمس جامع القمامة صفحاتها
+    # في العمال فيكسر مشاركة النسخ عند الكتابة
+    gc.collect()
+    gc.freeze()
+
+    def post_fork(server, worker):
+        set_compute_threads(compute_threads)
+        registry = get_model_registry()
+        registry.reset_after_fork()
+        registry.start_idle_eviction(MODEL_IDLE_SECONDS)
+        # الإحماء داخل كل عامل (لا تُشغّل نوى torch في العملية الرئيسية قبل fork)؛
+        # /readyz للعامل يعيد 503 حتى ينتهي
+        smart_app.start_background_initialization()
+
+    options = {
+        'bind': args.bind,
+        'workers': args.workers,
+        'threads': args.threads,
+        'worker_class': 'gthread' if args.threads > 1 else 'sync',
+        'timeout': args.timeout,
+        'preload_app': True,
+        'post_fork': post_fork,
+    }
+    print(f"🚀 تشغيل {args.workers} عامل × {args.threads} خيط "
+          f"({compute_threads} خيط حساب لكل عامل) على {args.bind}")
+    SmartRAGServer(smart_app.app, options).run()
+
+
+if __name__ == '__main__':
+    main()
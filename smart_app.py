@@ -1,47 +1,190 @@
-from flask import Flask, request, jsonify, render_template_string
+from flask import Flask, Response, g, request, jsonify, render_template_string, stream_with_context
+import hmac
+import json
 import os
 import sys
+import threading
+import time
 sys.path.append(os.path.abspath(os.path.dirname(__file__)))
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), 'scripts')))
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 print("Importing EnhancedContextRetriever and SmartAnswerGenerator...")
 try:
-    from scripts.enhanced_retriever import EnhancedContextRetriever
+    from scripts.enhanced_retriever import EnhancedContextRetriever, SEARCH_MODES
     from scripts.smart_answer_generator import SmartAnswerGenerator
+    from model_registry import get_model_registry
+    from admission import Overloaded, get_admission_controller, get_stage_executor
+    from metrics import collect_timings, get_metrics_registry, stage_timer
+    from deadline import parse_deadline
+    from compression import choose_encoding, compress_body, should_compress
+    from request_profiler import is_profiling_allowed, profile_call
+    from artifacts import ArtifactReloader, resolve_artifacts
+    from decoding import get_generation_cache
+    from generation_scheduler import generation_scheduler_stats
+    from settings import (
+        MODEL_IDLE_SECONDS, FLASK_DEBUG, BATCH_MAX_QUESTIONS,
+        RETRIEVE_BUDGET_MS, RETRIEVE_MAX_TOP_K, SNIPPET_CHARS, WARMUP_ENABLED,
+        VERBOSE_RESPONSES, ARTIFACT_WATCH_SECONDS, ADMIN_TOKEN, ADMIN_ALLOW_LOCALHOST
+    )
     print("Modules imported successfully.")
 except Exception as e:
     print(f"Error importing modules: {e}")
 
 app = Flask(__name__)
+# UTF-8 مباشرة بدلاً من \uXXXX: يقلص النص العربي إلى الثلث تقريباً
+app.json.ensure_ascii = False
 
 
 EMBEDDINGS_DIR = "embeddings"
+# المسارات المسطحة القديمة؛ تُستخدم فقط إن لم يوجد embeddings/CURRENT
 INDEX_PATH = os.path.join(EMBEDDINGS_DIR, "faiss_index.index")
 CONTEXTS_PATH = os.path.join(EMBEDDINGS_DIR, "unique_contexts.txt")
 
 
 retriever = None
 generator = None
+artifact_reloader = None
+
+# حالة التشغيل لـ /readyz: starting ← loading ← loaded ← warming ← ready (أو failed)
+system_state = {'status': 'starting', 'error': None, 'warmup_seconds': None}
+_state_lock = threading.Lock()
+
+WARMUP_QUESTIONS = [
+    "ما هو الذكاء الاصطناعي؟",
+    "من هو مؤسس الدولة العثمانية؟"
+]
+
+def set_system_status(status, **fields):
+    with _state_lock:
+        system_state['status'] = status
+        system_state.update(fields)
 
 def initialize_smart_system():
     """تهيئة النظام الذكي"""
-    global retriever, generator
+    global retriever, generator, artifact_reloader
     
-    if not os.path.exists(INDEX_PATH) or not os.path.exists(CONTEXTS_PATH):
+    version, index_path, contexts_path = resolve_artifacts(EMBEDDINGS_DIR)
+    if version is None:
+        index_path, contexts_path = INDEX_PATH, CONTEXTS_PATH
+    if not os.path.exists(index_path) or not os.path.exists(contexts_path):
         print("تحذير: لم يتم العثور على فهرس FAISS أو ملف السياقات.")
+        set_system_status('failed', error='لم يتم العثور على فهرس FAISS أو ملف السياقات')
         return False
     
     print("Initializing EnhancedContextRetriever and SmartAnswerGenerator...")
+    set_system_status('loading')
     try:
-        retriever = EnhancedContextRetriever(INDEX_PATH, CONTEXTS_PATH)
-        print("EnhancedContextRetriever initialized successfully.")
+        retriever = EnhancedContextRetriever(index_path, contexts_path, version=version)
+        artifact_reloader = ArtifactReloader(retriever, EMBEDDINGS_DIR)
+        print(f"EnhancedContextRetriever initialized successfully (version: {version or 'legacy'}).")
         generator = SmartAnswerGenerator()
         print("SmartAnswerGenerator initialized successfully.")
+        register_runtime_metrics()
+        set_system_status('loaded')
         return True
     except Exception as e:
         print(f"Error during initialization: {e}")
+        set_system_status('failed', error=str(e))
         return False
 
+def warmup_system():
+    """تمرير أسئلة تجريبية عبر التمثيل و FAISS و TF-IDF وتحليل السياق و T5 والتحقق
+    حتى لا يدفع أول طلب حقيقي تكلفة التهيئة الكسولة للنوى والمقسمات"""
+    set_system_status('warming')
+    started = time.perf_counter()
+    steps = {}
+    
+    def step(name, fn):
+        step_start = time.perf_counter()
+        try:
+            fn()
+        except Exception as e:
+            print(f"تحذير: فشل الإحماء في مرحلة {name}: {e}")
+        steps[name] = round((time.perf_counter() - step_start) * 1000, 1)
+    
+    for question in WARMUP_QUESTIONS:
+        step('encoder', lambda: retriever.model.encode([question]))
+        step('faiss', lambda: retriever.search_ids(question, 'semantic'))
+        step('keyword', lambda: retriever.search_ids(question, 'keyword'))
+        analysis = {}
+        step('context_analysis', lambda: analysis.update(retriever.retrieve_with_context_analysis(question)))
+        
+        def generate():
+            # استدعاء المراحل مباشرة حتى لا تُحتسب أسئلة الإحماء في إحصاءات التسلسل
+            context_texts, context_scores = generator.prepare_contexts(analysis['analyzed_results'])
+            question_info, matcher = generator.analyze_question(question)
+            candidates = generator.extract_candidates(question, context_texts, question_info, matcher)
+            neural_answer, _ = generator.generate_neural_answer(question, context_texts, context_scores, candidates)
+            answers = [c['text'] for c in candidates[:3]] + ([neural_answer['text']] if neural_answer else [])
+            generator.validate_answers_batch(question, answers, context_texts, question_info, matcher)
+        step('generation', generate)
+    
+    duration = time.perf_counter() - started
+    print(f"🔥 اكتمل الإحماء في {duration:.2f} ثانية (بالميلي ثانية: {steps})")
+    set_system_status('ready', warmup_seconds=round(duration, 3))
+
+def start_background_initialization(warmup=WARMUP_ENABLED):
+    """تهيئة النظام والإحماء في خيط خلفي بينما يستجيب الخادم لـ /healthz و /readyz"""
+    def run():
+        if retriever is None or generator is None:
+            if not initialize_smart_system():
+                print("❌ فشل في تهيئة النظام الذكي.")
+                return
+        if warmup:
+            warmup_system()
+        else:
+            set_system_status('ready')
+        # المراقبة تبدأ هنا لا في initialize_smart_system لأن الخيوط لا تنتقل عبر fork في serve.py
+        artifact_reloader.start_watching(ARTIFACT_WATCH_SECONDS)
+        print("🚀 تم تهيئة النظام الذكي بنجاح!")
+    
+    thread = threading.Thread(target=run, name="system-init", daemon=True)
+    thread.start()
+    return thread
+
+
+def register_runtime_metrics():
+    """مقاييس تُقرأ من مكونات النظام عند كل طلب لـ /metrics"""
+    metrics = get_metrics_registry()
+    cache = get_generation_cache()
+    metrics.gauge('rag_generation_cache_hits_total', 'Generation cache hits',
+                  lambda: cache.stats()['hits'], 'counter')
+    metrics.gauge('rag_generation_cache_misses_total', 'Generation cache misses',
+                  lambda: cache.stats()['misses'], 'counter')
+    metrics.gauge('rag_generation_cache_hit_rate', 'Generation cache hit rate',
+                  lambda: cache.stats()['hit_rate'])
+    metrics.gauge('rag_generation_cache_entries', 'Entries in the generation cache',
+                  lambda: cache.stats()['entries'])
+    metrics.gauge('rag_scheduler_queue_depth', 'Requests waiting in the generation scheduler',
+                  lambda: {(('model', name),): stats['queue_depth']
+                           for name, stats in generation_scheduler_stats().items()})
+    metrics.gauge('rag_scheduler_avg_batch_size', 'Average generation batch size',
+                  lambda: {(('model', name),): stats['avg_batch_size']
+                           for name, stats in generation_scheduler_stats().items()})
+    metrics.gauge('rag_cascade_answers_total', 'Answers by path (extractive, deadline_extractive or neural)',
+                  lambda: {(('path', path),): count
+                           for path, count in generator.cascade_stats()['counts'].items()} if generator else {},
+                  'counter')
+    admission = get_admission_controller()
+    metrics.gauge('rag_admission_in_flight', 'Requests currently admitted',
+                  lambda: admission.stats()['in_flight'])
+    metrics.gauge('rag_admission_waiting', 'Requests waiting for admission',
+                  lambda: admission.stats()['waiting'])
+    metrics.gauge('rag_admission_rejected_total', 'Requests rejected with 503',
+                  lambda: admission.stats()['rejected'], 'counter')
+    metrics.gauge('rag_ready', 'Whether this process reports ready on /readyz',
+                  lambda: 1 if system_state['status'] == 'ready' else 0)
+    metrics.gauge('rag_warmup_seconds', 'Duration of the startup warmup',
+                  lambda: system_state['warmup_seconds'] or 0)
+    metrics.gauge('rag_models_loaded', 'Models currently loaded in this process',
+                  lambda: {(('model', name),): 1 for name in get_model_registry().loaded_models()})
+    metrics.gauge('rag_artifact_info', 'Active index/contexts version',
+                  lambda: {(('version', artifact_reloader.version or 'legacy'),): 1} if artifact_reloader else {})
+    metrics.gauge('rag_artifact_reloads_total', 'Successful index/contexts reloads',
+                  lambda: artifact_reloader.reloads if artifact_reloader else 0, 'counter')
+    metrics.gauge('rag_artifact_reload_failures_total', 'Failed index/contexts reloads',
+                  lambda: artifact_reloader.failures if artifact_reloader else 0, 'counter')
+
 
 SMART_HTML_TEMPLATE = """
 <!DOCTYPE html>
@@ -280,7 +423,7 @@ SMART_HTML_TEMPLATE = """
                     headers: {
                         'Content-Type': 'application/json',
                     },
-                    body: JSON.stringify({ question: question })
+                    body: JSON.stringify({ question: question, verbose: true })
                 });
                 
                 const data = await response.json();
@@ -389,12 +532,230 @@ SMART_HTML_TEMPLATE = """
 </html>
 """
 
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    start = getattr(g, 'request_start', None)
+    if start is not None and request.endpoint:
+        metrics = get_metrics_registry()
+        metrics.counter('rag_http_requests_total', 'HTTP requests by endpoint and status').inc(
+            endpoint=request.endpoint, status=str(response.status_code)
+        )
+        # للبث يُقاس الزمن حتى بدء الاستجابة
+        metrics.histogram('rag_http_request_duration_seconds', 'HTTP request latency by endpoint').observe(
+            time.perf_counter() - start, endpoint=request.endpoint
+        )
+    return response
+
+@app.after_request
+def compress_response(response):
+    """ضغط استجابات JSON بـ Brotli أو gzip حسب Accept-Encoding وتسجيل أحجامها"""
+    if response.is_streamed or response.direct_passthrough or response.mimetype != 'application/json':
+        return response
+    if 'Content-Encoding' in response.headers:
+        return response
+    
+    body = response.get_data()
+    metrics = get_metrics_registry()
+    endpoint = request.endpoint or 'unknown'
+    metrics.histogram('rag_response_body_bytes', 'Uncompressed JSON response size by endpoint',
+                      PAYLOAD_BUCKETS).observe(len(body), endpoint=endpoint)
+    
+    encoding = choose_encoding(request.accept_encodings) if should_compress(len(body)) else None
+    if encoding:
+        body = compress_body(body, encoding)
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    metrics.histogram('rag_response_wire_bytes', 'JSON response size sent on the wire by endpoint and encoding',
+                      PAYLOAD_BUCKETS).observe(len(body), endpoint=endpoint, encoding=encoding or 'identity')
+    return response
+
+def is_true(value):
+    if isinstance(value, bool):
+        return value
+    return str(value or '').strip().lower() in ('1', 'true', 'yes')
+
+def wants_timings(data):
+    """إرجاع توقيتات المراحل في الاستجابة عند طلبها (timings في JSON أو ?timings=1)"""
+    if data and data.get('timings'):
+        return True
+    return is_true(request.args.get('timings'))
+
+def requested_fields(data=None):
+    """حقول الاستجابة: قائمة fields صريحة، أو جميع الحقول مع verbose، وإلا الاستجابة المختصرة"""
+    data = data or {}
+    fields = data.get('fields') or request.args.get('fields')
+    if fields:
+        if isinstance(fields, str):
+            fields = fields.split(',')
+        return [field.strip() for field in fields if str(field).strip() in RESPONSE_FIELDS]
+    verbose = data['verbose'] if 'verbose' in data else request.args.get('verbose')
+    if is_true(verbose) or (verbose is None and VERBOSE_RESPONSES):
+        return VERBOSE_FIELDS
+    return SLIM_FIELDS
+
+def profiling_requested(data=None):
+    """تحليل الطلب بـ cProfile عند إرسال X-Profile أو profile من رمز أو عنوان ضمن RAG_PROFILE_ALLOWLIST"""
+    token = request.headers.get('X-Profile') or (data or {}).get('profile') or request.args.get('profile')
+    if not token:
+        return False
+    if is_profiling_allowed(str(token), request.remote_addr):
+        return True
+    print(f"تحذير: طلب تحليل أداء مرفوض من {request.remote_addr}")
+    return False
+
+def request_deadline(data=None):
+    """ميزانية زمن الطلب من ترويسة X-Request-Deadline-Ms أو معامل deadline_ms
+    (جسم JSON ليس كائناً - قائمة مثلاً - يُتجاهل هنا ويُرفض لاحقاً برسالة JSON)"""
+    data = data if isinstance(data, dict) else {}
+    param = data.get('deadline_ms') or request.args.get('deadline_ms')
+    return parse_deadline(request.headers.get('X-Request-Deadline-Ms'), param)
+
+def request_cascade_threshold(data=None):
+    """عتبة التتالي من معامل cascade_threshold (None = الإعداد الافتراضي)؛
+    ValueError برسالة للمستخدم إن لم تكن عدداً بين 0 و 1"""
+    value = data.get('cascade_threshold') if isinstance(data, dict) else None
+    if value is None:
+        return None
+    try:
+        threshold = float(value)
+    except (TypeError, ValueError):
+        raise ValueError('cascade_threshold يجب أن يكون عدداً.')
+    if not 0 <= threshold <= 1:
+        raise ValueError('cascade_threshold يجب أن يكون بين 0 و 1.')
+    return threshold
+
+def rounded_timings(timings):
+    return {stage: round(ms, 3) for stage, ms in timings.items()}
+
 @app.route('/')
 def home():
     return render_template_string(SMART_HTML_TEMPLATE)
 
+@app.route('/healthz')
+def healthz():
+    """العملية حية وتستجيب (بغض النظر عن تحميل النماذج)"""
+    return jsonify({'status': 'ok'})
+
+@app.route('/readyz')
+def readyz():
+    """جاهزية استقبال الطلبات: 200 بعد التحميل والإحماء، و503 قبل ذلك أو عند الفشل"""
+    with _state_lock:
+        state = dict(system_state)
+    state['artifact_version'] = retriever.state.version if retriever else None
+    return jsonify(state), 200 if state['status'] == 'ready' else 503
+
+def is_admin_request():
+    """X-Admin-Token يطابق RAG_ADMIN_TOKEN، أو طلب من الجهاز المحلي عند تفعيل
+    RAG_ADMIN_ALLOW_LOCALHOST صراحةً. بدون أي منهما نقاط الإدارة مغلقة"""
+    token = request.headers.get('X-Admin-Token', '')
+    if ADMIN_TOKEN and hmac.compare_digest(token.encode('utf-8'), ADMIN_TOKEN.encode('utf-8')):
+        return True
+    # خلف وكيل عكسي على الجهاز نفسه تصل جميع الطلبات العامة من 127.0.0.1
+    return ADMIN_ALLOW_LOCALHOST and request.remote_addr in ('127.0.0.1', '::1')
+
+@app.route('/admin/reload', methods=['POST'])
+def admin_reload():
+    """إعادة تحميل الإصدار النشط من embeddings/ دون توقف (في الخلفية، أو انتظار النتيجة مع wait=1).
+    force=1 يعيد البناء حتى إن لم تتغير الملفات."""
+    if not is_admin_request():
+        return jsonify({'error': 'غير مصرح'}), 403
+    if not artifact_reloader:
+        return jsonify({'error': '❌ النظام غير جاهز.'}), 503
+    
+    data = request.get_json(silent=True) or {}
+    force = is_true(data.get('force', request.args.get('force')))
+    if is_true(data.get('wait', request.args.get('wait'))):
+        result = artifact_reloader.reload(force)
+        status_code = {'failed': 500, 'in_progress': 409}.get(result['status'], 200)
+        return jsonify(result), status_code
+    if not artifact_reloader.reload_in_background(force):
+        return jsonify({'status': 'in_progress', 'version': artifact_reloader.version}), 409
+    return jsonify({'status': 'started', 'version': artifact_reloader.version}), 202
+
+@app.route('/admin/artifacts')
+def admin_artifacts():
+    """الإصدار النشط وسجل آخر إعادة تحميل"""
+    if not is_admin_request():
+        return jsonify({'error': 'غير مصرح'}), 403
+    if not artifact_reloader:
+        return jsonify({'error': '❌ النظام غير جاهز.'}), 503
+    return jsonify(artifact_reloader.stats())
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """المقاييس بصيغة Prometheus النصية"""
+    return Response(get_metrics_registry().render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+# حدود مدرجات أحجام الاستجابات بالبايت
+PAYLOAD_BUCKETS = (256, 512, 1024, 2048, 4096, 8192, 16384, 32768, 65536, 131072, 262144)
+
+VERBOSE_FIELDS = (
+    'answer', 'confidence', 'contexts', 'context_ids', 'used_contexts', 'question_analysis',
+    'validation', 'method', 'source', 'all_candidates', 'path', 'generation_input', 'skipped_stages'
+)
+SLIM_FIELDS = ('answer', 'confidence', 'context_ids', 'snippets')
+RESPONSE_FIELDS = VERBOSE_FIELDS + ('snippets',)
+
+def build_answer_response(answer_result, contexts, fields=VERBOSE_FIELDS):
+    """تحويل نتيجة المولد والسياقات المسترجعة إلى استجابة الـ API (الحقول المطلوبة فقط)"""
+    context_texts = [ctx['context'] for ctx in contexts] if contexts else []
+    
+    response = {
+        'answer': answer_result['answer'],
+        'confidence': answer_result['confidence'],
+        'contexts': context_texts,
+        'context_ids': [ctx.get('id') for ctx in contexts] if contexts else [],
+        'snippets': [text[:SNIPPET_CHARS] for text in context_texts],
+        'used_contexts': answer_result['used_contexts'],
+        'question_analysis': answer_result.get('question_analysis', {}),
+        'validation': answer_result.get('validation', {}),
+        'method': answer_result.get('method', 'ذكي'),
+        'source': answer_result.get('source', 'متقدم'),
+        'all_candidates': answer_result.get('all_candidates', 0),
+        'path': answer_result.get('path'),
+        'generation_input': answer_result.get('generation_input'),
+        'skipped_stages': answer_result.get('skipped_stages', [])
+    }
+    selected = {field: response[field] for field in fields if field in response}
+    # الإجابة المخفضة بسبب المهلة تُعلَّم دائماً مهما كانت الحقول المطلوبة
+    if response['skipped_stages']:
+        selected['skipped_stages'] = response['skipped_stages']
+    return selected
+
+def overloaded_response(error):
+    """رد سريع 503 مع Retry-After عند امتلاء النظام"""
+    response = jsonify({
+        'answer': '⏳ النظام مشغول حالياً، يرجى المحاولة بعد قليل.',
+        'confidence': 0.0,
+        'contexts': [],
+        'used_contexts': 0,
+        'retry_after': error.retry_after
+    })
+    response.status_code = 503
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
 @app.route('/api/smart_ask', methods=['POST'])
 def smart_ask():
+    data = request.get_json(silent=True)
+    try:
+        cascade_threshold = request_cascade_threshold(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    # الميزانية تبدأ قبل الانتظار في طابور القبول
+    deadline = request_deadline(data)
+    try:
+        with get_admission_controller().admit():
+            return answer_question(deadline, cascade_threshold)
+    except Overloaded as e:
+        return overloaded_response(e)
+
+def answer_question(deadline=None, cascade_threshold=None):
     try:
         if not retriever or not generator:
             return jsonify({
@@ -415,27 +776,43 @@ def smart_ask():
                 'used_contexts': 0
             })
         
-        # Retrieve contexts with advanced analysis
-        retrieval_result = retriever.retrieve_with_context_analysis(question)
-        contexts = retrieval_result.get('analyzed_results', [])
+        profiling = profiling_requested(data)
         
+        def run_stage(stage, fn, *args, **kwargs):
+            # تحت التحليل تعمل المراحل على خيط الطلب نفسه حتى يراها cProfile
+            if profiling:
+                return fn(*args, **kwargs)
+            return get_stage_executor(stage).run(fn, *args, **kwargs)
         
-        answer_result = generator.generate_smart_answer(question, contexts)
+        def pipeline():
+            with collect_timings() as timings:
+                # Retrieve contexts with advanced analysis
+                with stage_timer('retrieval'):
+                    retrieval_result = run_stage(
+                        'retrieval', retriever.retrieve_with_context_analysis, question, deadline=deadline
+                    )
+                contexts = retrieval_result.get('analyzed_results', [])
+                
+                
+                with stage_timer('answering'):
+                    answer_result = run_stage(
+                        'generation', generator.generate_smart_answer,
+                        question, contexts, cascade_threshold=cascade_threshold, deadline=deadline
+                    )
+            return contexts, answer_result, timings
         
-       
-        context_texts = [ctx['context'] for ctx in contexts] if contexts else []
+        profile = None
+        if profiling:
+            (contexts, answer_result, timings), profile = profile_call(pipeline)
+        else:
+            contexts, answer_result, timings = pipeline()
         
-        return jsonify({
-            'answer': answer_result['answer'],
-            'confidence': answer_result['confidence'],
-            'contexts': context_texts,
-            'used_contexts': answer_result['used_contexts'],
-            'question_analysis': answer_result.get('question_analysis', {}),
-            'validation': answer_result.get('validation', {}),
-            'method': answer_result.get('method', 'ذكي'),
-            'source': answer_result.get('source', 'متقدم'),
-            'all_candidates': answer_result.get('all_candidates', 0)
-        })
+        response = build_answer_response(answer_result, contexts, requested_fields(data))
+        if wants_timings(data):
+            response['timings'] = rounded_timings(timings)
+        if profile is not None:
+            response['profile'] = profile
+        return jsonify(response)
         
     except Exception as e:
         return jsonify({
@@ -446,11 +823,199 @@ def smart_ask():
             'validation': {'issues': [str(e)]}
         })
 
+@app.route('/api/smart_ask_batch', methods=['POST'])
+def smart_ask_batch():
+    """الإجابة عن قائمة أسئلة بدفعة واحدة في كل مرحلة، والنتائج بترتيب الأسئلة"""
+    data = request.get_json(silent=True)
+    try:
+        cascade_threshold = request_cascade_threshold(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    deadline = request_deadline(data)
+    try:
+        with get_admission_controller().admit():
+            return answer_batch(deadline, cascade_threshold)
+    except Overloaded as e:
+        return overloaded_response(e)
+
+def answer_batch(deadline=None, cascade_threshold=None):
+    data = request.get_json(silent=True)
+    data = data if isinstance(data, dict) else {}
+    questions = data.get('questions')
+    if not isinstance(questions, list) or not questions:
+        return jsonify({'error': 'يجب إرسال questions كقائمة غير فارغة من الأسئلة.'}), 400
+    if len(questions) > BATCH_MAX_QUESTIONS:
+        return jsonify({'error': f'الحد الأقصى {BATCH_MAX_QUESTIONS} سؤالاً في الطلب الواحد.'}), 400
+    
+    if not retriever or not generator:
+        return jsonify({'results': [{
+            'answer': '❌ النظام غير جاهز. تأكد من تشغيل generate_embeddings.py و build_index.py أولاً.',
+            'confidence': 0.0,
+            'contexts': [],
+            'used_contexts': 0
+        } for _ in questions]})
+    
+    questions = [str(question or '').strip() for question in questions]
+    valid = [i for i, question in enumerate(questions) if question]
+    results = [{
+        'answer': '⚠️ يرجى إدخال سؤال صحيح.',
+        'confidence': 0.0,
+        'contexts': [],
+        'used_contexts': 0
+    } for _ in questions]
+    
+    timings = {}
+    fields = requested_fields(data)
+    try:
+        valid_questions = [questions[i] for i in valid]
+        with collect_timings() as timings:
+            with stage_timer('retrieval'):
+                retrievals = get_stage_executor('retrieval').run(
+                    retriever.retrieve_with_context_analysis_batch, valid_questions, deadline=deadline
+                )
+            contexts_batch = [retrieval.get('analyzed_results', []) for retrieval in retrievals]
+            
+            with stage_timer('answering'):
+                answers = get_stage_executor('generation').run(
+                    generator.generate_smart_answers_batch,
+                    valid_questions, contexts_batch, cascade_threshold=cascade_threshold,
+                    deadline=deadline
+                )
+        for i, answer_result, contexts in zip(valid, answers, contexts_batch):
+            results[i] = build_answer_response(answer_result, contexts, fields)
+    except Exception as e:
+        for i in valid:
+            results[i] = {
+                'answer': f'❌ حدث خطأ في النظام: {str(e)}',
+                'confidence': 0.0,
+                'contexts': [],
+                'used_contexts': 0,
+                'validation': {'issues': [str(e)]}
+            }
+    
+    payload = {'results': results}
+    if wants_timings(data):
+        payload['timings'] = rounded_timings(timings)
+    return jsonify(payload)
+
+@app.route('/api/retrieve', methods=['GET', 'POST'])
+def retrieve():
+    """استرجاع فقط (بدون توليد أو تحقق): أرقام السياقات ودرجاتها ومقتطفات اختيارية.
+    لا يمر عبر طابور القبول الخاص بطلبات التوليد."""
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+    else:
+        data = request.args
+    
+    query = str(data.get('query') or data.get('question') or '').strip()
+    mode = str(data.get('mode', 'hybrid')).lower()
+    snippets = str(data.get('snippets', '')).lower() in ('1', 'true', 'yes')
+    try:
+        top_k = int(data.get('top_k', 5))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'top_k يجب أن يكون عدداً صحيحاً.'}), 400
+    
+    if not query:
+        return jsonify({'error': '⚠️ يرجى إدخال استعلام صحيح.'}), 400
+    if mode not in SEARCH_MODES:
+        return jsonify({'error': f"نمط غير معروف: {mode} (المتاح: {', '.join(SEARCH_MODES)})"}), 400
+    if not 1 <= top_k <= RETRIEVE_MAX_TOP_K:
+        return jsonify({'error': f'top_k يجب أن يكون بين 1 و {RETRIEVE_MAX_TOP_K}.'}), 400
+    if not retriever:
+        return jsonify({'error': '❌ النظام غير جاهز. تأكد من تشغيل generate_embeddings.py و build_index.py أولاً.'}), 503
+    
+    # النصوص تُقرأ من الإصدار نفسه الذي بُحث فيه حتى لو بُدّل أثناء الطلب
+    state = retriever.state
+    start = time.perf_counter()
+    with stage_timer('retrieve_endpoint'):
+        hits = get_stage_executor('retrieval').run(retriever.search_ids, query, mode, top_k, state)
+    latency_ms = (time.perf_counter() - start) * 1000
+    if latency_ms > RETRIEVE_BUDGET_MS:
+        get_metrics_registry().counter(
+            'rag_retrieve_budget_exceeded_total', '/api/retrieve requests slower than RAG_RETRIEVE_BUDGET_MS'
+        ).inc(mode=mode)
+    
+    results = []
+    for idx, score in hits:
+        item = {'id': idx, 'score': score}
+        if snippets:
+            item['snippet'] = state.contexts[idx][:SNIPPET_CHARS]
+        results.append(item)
+    
+    return jsonify({
+        'query': query,
+        'mode': mode,
+        'top_k': top_k,
+        'results': results,
+        'version': state.version,
+        'latency_ms': round(latency_ms, 3),
+        'budget_ms': RETRIEVE_BUDGET_MS
+    })
+
+def sse_event(event, data):
+    """تنسيق حدث Server-Sent Events بحمولة JSON"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.route('/api/smart_ask_stream', methods=['GET', 'POST'])
+def smart_ask_stream():
+    """بث الإجابة: السياقات فور الاسترجاع، ثم رموز T5 أثناء التوليد، ثم التحقق والثقة"""
+    if request.method == 'POST':
+        data = request.get_json(silent=True)
+        data = data if isinstance(data, dict) else {}
+        question = str(data.get('question') or '').strip()
+    else:
+        data = {}
+        question = request.args.get('question', '').strip()
+    deadline = request_deadline(data)
+    fields = requested_fields(data)
+    
+    admission = get_admission_controller()
+    try:
+        admission.acquire()
+    except Overloaded as e:
+        return overloaded_response(e)
+    started = time.monotonic()
+    
+    def events():
+        if not retriever or not generator:
+            yield sse_event('error', {'answer': '❌ النظام غير جاهز. تأكد من تشغيل generate_embeddings.py و build_index.py أولاً.'})
+            return
+        if not question:
+            yield sse_event('error', {'answer': '⚠️ يرجى إدخال سؤال صحيح.'})
+            return
+        
+        try:
+            retrieval_result = retriever.retrieve_with_context_analysis(question, deadline=deadline)
+            contexts = retrieval_result.get('analyzed_results', [])
+            yield sse_event('contexts', {
+                'contexts': [ctx['context'] for ctx in contexts],
+                'scores': [ctx['final_score'] for ctx in contexts]
+            })
+            
+            for event in generator.generate_smart_answer_stream(question, contexts, deadline):
+                if event['event'] == 'token':
+                    yield sse_event('token', {'text': event['text']})
+                else:
+                    yield sse_event('result', build_answer_response(event['result'], contexts, fields))
+        except Exception as e:
+            yield sse_event('error', {'answer': f'❌ حدث خطأ في النظام: {str(e)}'})
+    
+    response = Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+    # المكان محجوز حتى انتهاء البث أو انقطاع العميل
+    response.call_on_close(lambda: admission.release(time.monotonic() - started))
+    return response
+
 if __name__ == '__main__':
     print("Current sys.path:", sys.path)  # Debug statement to print current sys.path
-    if initialize_smart_system():
-        print("🚀 تم تهيئة النظام الذكي بنجاح!")
-        print("🌐 النظام متاح على: http://localhost:5000")
-        app.run(host='0.0.0.0', port=5000, debug=True)
-    else:
-        print("❌ فشل في تهيئة النظام الذكي.")
+    # التحميل والإحماء في الخلفية؛ /readyz يعيد 503 حتى يكتملا
+    start_background_initialization()
+    # الإخلاء لا يبدأ في initialize_smart_system: في serve.py تستدعيها العملية الرئيسية
+    # التي لا تخدم طلبات، فتخلي T5 المشترك ولا تُنشأ خيوط قبل fork (راجع post_fork)
+    get_model_registry().start_idle_eviction(MODEL_IDLE_SECONDS)
+    print("🌐 النظام متاح على: http://localhost:5000 (الجاهزية على /readyz)")
+    # إعادة التحميل التلقائي تشغل العملية مرتين وتحمّل النماذج مرتين
+    app.run(host='0.0.0.0', port=5000, debug=FLASK_DEBUG, use_reloader=False)
@@ -0,0 +1,43 @@
+import os
+import sys
+
+# نماذج بديلة حتمية لا تحتاج تنزيلاً من الشبكة؛ يجب ضبطها قبل استيراد settings
+os.environ.setdefault('RAG_ENCODER_BACKEND', 'stub')
+os.environ.setdefault('RAG_GENERATOR_BACKEND', 'stub')
+os.environ.setdefault('RAG_STUB_EMBEDDING_DIM', '64')
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (ROOT, os.path.join(ROOT, 'scripts')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+import numpy as np
+import pytest
+
+CONTEXTS = [
+    "القاهرة هي عاصمة مصر وأكبر مدنها. تقع على ضفاف نهر النيل.",
+    "الرياض هي عاصمة المملكة العربية السعودية. تأسست الدولة السعودية الثالثة عام 1932.",
+    "نهر النيل أطول أنهار العالم. يبلغ طوله نحو 6650 كيلومتراً.",
+    "ابن سينا طبيب وفيلسوف مسلم. ألف كتاب القانون في الطب."
+]
+
+
+@pytest.fixture(scope='session')
+def smart_client(tmp_path_factory):
+    """عميل اختبار Flask لنظام مهيأ بفهرس صغير مبني بالمرمز البديل"""
+    from build_index import build_faiss_index
+    from stub_models import StubEncoder
+    import smart_app
+
+    embeddings_dir = str(tmp_path_factory.mktemp('embeddings'))
+    index_path = os.path.join(embeddings_dir, 'faiss_index.index')
+    contexts_path = os.path.join(embeddings_dir, 'unique_contexts.txt')
+    with open(contexts_path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(CONTEXTS) + '\n')
+    build_faiss_index(np.asarray(StubEncoder().encode(CONTEXTS), dtype=np.float32), index_path)
+
+    smart_app.EMBEDDINGS_DIR = embeddings_dir
+    smart_app.INDEX_PATH = index_path
+    smart_app.CONTEXTS_PATH = contexts_path
+    assert smart_app.initialize_smart_system()
+    return smart_app.app.test_client()
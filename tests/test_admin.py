@@ -0,0 +1,25 @@
+import pytest
+
+import smart_app
+
+
+@pytest.mark.parametrize('endpoint, method', [('/admin/artifacts', 'get'), ('/admin/reload', 'post')])
+def test_admin_requires_token_by_default(smart_client, monkeypatch, endpoint, method):
+    monkeypatch.setattr(smart_app, 'ADMIN_TOKEN', '')
+    monkeypatch.setattr(smart_app, 'ADMIN_ALLOW_LOCALHOST', False)
+    # عميل الاختبار يرسل من 127.0.0.1: المحلي وحده لا يكفي
+    assert getattr(smart_client, method)(endpoint).status_code == 403
+
+
+def test_admin_accepts_matching_token(smart_client, monkeypatch):
+    monkeypatch.setattr(smart_app, 'ADMIN_TOKEN', 'secret')
+    assert smart_client.get('/admin/artifacts', headers={'X-Admin-Token': 'wrong'}).status_code == 403
+    assert smart_client.get('/admin/artifacts', headers={'X-Admin-Token': 'secret'}).status_code == 200
+
+
+def test_localhost_fallback_is_opt_in(smart_client, monkeypatch):
+    monkeypatch.setattr(smart_app, 'ADMIN_TOKEN', '')
+    monkeypatch.setattr(smart_app, 'ADMIN_ALLOW_LOCALHOST', True)
+    assert smart_client.get('/admin/artifacts').status_code == 200
+    response = smart_client.get('/admin/artifacts', environ_base={'REMOTE_ADDR': '203.0.113.5'})
+    assert response.status_code == 403
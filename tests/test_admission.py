@@ -0,0 +1,52 @@
+import threading
+import time
+
+import pytest
+
+from admission import AdmissionController, Overloaded
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def saturated():
+    """متحكم بمكانين وطابور بطلب واحد: المكانان محجوزان والطابور ممتلئ"""
+    controller = AdmissionController(max_in_flight=2, max_queue=1, queue_timeout_ms=5000)
+    controller.acquire()
+    controller.acquire()
+    queued = threading.Thread(target=controller.acquire)
+    queued.start()
+    wait_for(lambda: controller.stats()['waiting'] == 1)
+    yield controller, queued
+    # إطلاق الطلب المنتظر إن بقي في الطابور
+    controller.release()
+    queued.join(5)
+
+
+def test_rejects_beyond_in_flight_plus_queue(saturated):
+    controller, queued = saturated
+    with pytest.raises(Overloaded) as error:
+        controller.acquire()
+    assert error.value.retry_after >= 1
+    assert controller.stats()['rejected'] == 1
+
+    # تحرير مكان يُدخل الطلب المنتظر
+    controller.release()
+    queued.join(5)
+    assert controller.stats()['in_flight'] == 2
+
+
+def test_smart_ask_returns_503_with_retry_after(smart_client, saturated, monkeypatch):
+    import smart_app
+
+    controller, _ = saturated
+    monkeypatch.setattr(smart_app, 'get_admission_controller', lambda: controller)
+    response = smart_client.post('/api/smart_ask', json={'question': 'ما هي عاصمة مصر؟'})
+    assert response.status_code == 503
+    assert int(response.headers['Retry-After']) >= 1
+    assert response.get_json()['retry_after'] == int(response.headers['Retry-After'])
@@ -0,0 +1,55 @@
+import os
+import threading
+
+import pytest
+
+from generation_scheduler import BATCH_SIZE, GenerationScheduler
+from metrics import get_metrics_registry
+
+
+def test_batches_are_observed_in_histograms():
+    release = threading.Event()
+
+    def model(inputs, batch_size=None, **kwargs):
+        release.wait(5)
+        return [[{'generated_text': text.upper()}] for text in inputs]
+
+    scheduler = GenerationScheduler(lambda: model, 'test-model', max_batch_size=4, max_wait_ms=200)
+    futures = [scheduler.submit(f"q{i}") for i in range(3)]
+    release.set()
+    assert [future.result(5)[0]['generated_text'] for future in futures] == ['Q0', 'Q1', 'Q2']
+
+    assert scheduler.stats()['requests'] == 3
+    assert BATCH_SIZE.mean(model='test-model') == 3 / scheduler.stats()['batches']
+    rendered = get_metrics_registry().render()
+    assert 'rag_scheduler_batch_size_count{model="test-model"}' in rendered
+    assert 'rag_scheduler_queue_wait_seconds_count{model="test-model"} 3' in rendered
+
+
+def echo_model(inputs, batch_size=None, **kwargs):
+    return [[{'generated_text': text}] for text in inputs]
+
+
+def test_dead_worker_is_restarted_on_submit():
+    scheduler = GenerationScheduler(lambda: echo_model, 'restart-model', max_wait_ms=0)
+    dead = threading.Thread(target=lambda: None)
+    dead.start()
+    dead.join()
+    scheduler._worker = dead
+
+    assert scheduler.generate('q', timeout=5) == [{'generated_text': 'q'}]
+    assert scheduler._worker.is_alive()
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason="يتطلب fork")
+def test_scheduler_created_before_fork_serves_in_child():
+    scheduler = GenerationScheduler(lambda: echo_model, 'fork-model', max_wait_ms=0)
+    pid = os.fork()
+    if pid == 0:
+        try:
+            ok = scheduler.generate('child', timeout=5) == [{'generated_text': 'child'}]
+        except BaseException:
+            ok = False
+        os._exit(0 if ok else 1)
+    _, status = os.waitpid(pid, 0)
+    assert os.WEXITSTATUS(status) == 0
@@ -0,0 +1,25 @@
+from model_registry import ModelRegistry
+
+
+def test_evict_idle_skips_encoders():
+    registry = ModelRegistry()
+    registry.register('t5', object)
+    registry.get_encoder('stub-encoder')
+    registry.get('t5')
+
+    assert registry.evict_idle(-1) == ['t5']
+    assert registry.loaded_models() == ['encoder:stub-encoder']
+    # الإخلاء الصريح يبقى ممكناً
+    assert registry.evict('encoder:stub-encoder')
+
+
+def test_models_preloaded_before_fork_are_not_evicted():
+    registry = ModelRegistry()
+    registry.register('t5', object)
+    registry.register('gpt2', object)
+    registry.preload(['t5'])
+    registry.reset_after_fork()
+    registry.get('gpt2')
+
+    assert registry.evict_idle(-1) == ['gpt2']
+    assert registry.loaded_models() == ['t5']
@@ -0,0 +1,37 @@
+import pytest
+
+
+@pytest.mark.parametrize('endpoint, payload', [
+    ('/api/smart_ask', {'question': 'ما هي عاصمة مصر؟'}),
+    ('/api/smart_ask_batch', {'questions': ['ما هي عاصمة مصر؟']})
+])
+@pytest.mark.parametrize('threshold', ['abc', [0.5], 1.5, -0.1, 'nan'])
+def test_invalid_cascade_threshold_is_rejected(smart_client, endpoint, payload, threshold):
+    response = smart_client.post(endpoint, json=dict(payload, cascade_threshold=threshold))
+    assert response.status_code == 400
+    assert 'cascade_threshold' in response.get_json()['error']
+
+
+def test_numeric_string_cascade_threshold_is_accepted(smart_client):
+    response = smart_client.post('/api/smart_ask', json={
+        'question': 'ما هي عاصمة مصر؟', 'cascade_threshold': '0.5', 'verbose': True
+    })
+    assert response.status_code == 200
+    assert not response.get_json()['answer'].startswith('❌')
+
+    response = smart_client.post('/api/smart_ask_batch', json={
+        'questions': ['ما هي عاصمة مصر؟', 'ما هو أطول أنهار العالم؟'], 'cascade_threshold': '0.5'
+    })
+    assert response.status_code == 200
+    assert all(not result['answer'].startswith('❌') for result in response.get_json()['results'])
+
+
+@pytest.mark.parametrize('endpoint', ['/api/smart_ask', '/api/smart_ask_batch', '/api/smart_ask_stream'])
+@pytest.mark.parametrize('body', [['x'], 'x', 3])
+def test_non_object_json_body_returns_json(smart_client, endpoint, body):
+    response = smart_client.post(endpoint, json=body)
+    assert response.status_code in (200, 400)
+    if endpoint.endswith('stream'):
+        assert b'event: error' in response.data
+    else:
+        assert response.is_json
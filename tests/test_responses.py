@@ -0,0 +1,47 @@
+from smart_app import SLIM_FIELDS, build_answer_response
+
+ANSWER_RESULT = {
+    'answer': 'القاهرة',
+    'confidence': 0.8,
+    'used_contexts': 1,
+    'path': 'deadline_extractive',
+    'skipped_stages': ['neural_generation', 'combination']
+}
+CONTEXTS = [{'id': 0, 'context': 'القاهرة هي عاصمة مصر.'}]
+
+
+def test_slim_response_keeps_skipped_stages():
+    response = build_answer_response(ANSWER_RESULT, CONTEXTS, SLIM_FIELDS)
+    assert response['skipped_stages'] == ['neural_generation', 'combination']
+    assert set(response) == set(SLIM_FIELDS) | {'skipped_stages'}
+
+
+def test_selected_fields_keep_skipped_stages():
+    response = build_answer_response(ANSWER_RESULT, CONTEXTS, ('answer',))
+    assert response == {'answer': 'القاهرة', 'skipped_stages': ['neural_generation', 'combination']}
+
+
+def test_no_skipped_stages_when_nothing_skipped():
+    result = dict(ANSWER_RESULT, skipped_stages=[])
+    assert 'skipped_stages' not in build_answer_response(result, CONTEXTS, SLIM_FIELDS)
+
+
+def test_deadline_marks_default_slim_response(smart_client):
+    response = smart_client.post('/api/smart_ask', json={'question': 'ما هي عاصمة مصر؟', 'deadline_ms': 1})
+    assert response.status_code == 200
+    data = response.get_json()
+    assert 'contexts' not in data
+    assert 'neural_generation' in data['skipped_stages']
+
+
+def test_deadline_path_is_not_counted_as_cascade_hit(smart_client):
+    import smart_app
+
+    before = smart_app.generator.cascade_stats()['counts'].get('extractive', 0)
+    response = smart_client.post('/api/smart_ask', json={
+        'question': 'ما هو أطول أنهار العالم؟', 'deadline_ms': 1, 'verbose': True
+    })
+    assert response.get_json()['path'] == 'deadline_extractive'
+    counts = smart_app.generator.cascade_stats()['counts']
+    assert counts.get('extractive', 0) == before
+    assert counts['deadline_extractive'] >= 1
@@ -0,0 +1,16 @@
+import threading
+
+import serve
+from model_registry import get_model_registry
+
+
+def test_preload_starts_no_threads_in_master(smart_client, monkeypatch):
+    calls = []
+    monkeypatch.setattr(get_model_registry(), 'start_idle_eviction', lambda *args: calls.append(args))
+    before = {thread.ident for thread in threading.enumerate()}
+
+    assert serve.preload_system()
+
+    assert calls == []
+    started = [thread.name for thread in threading.enumerate() if thread.ident not in before]
+    assert started == []
@@ -0,0 +1,22 @@
+import pytest
+
+from similarity_kernels import hashed_shingles, ngram_jaccard, ngram_jaccard_many
+
+TEXTS = [
+    "القاهرة هي عاصمة مصر وأكبر مدنها",
+    "عاصمة مصر هي القاهرة",
+    "نهر النيل أطول أنهار العالم",
+    "",
+    "ابن سينا طبيب وفيلسوف مسلم ألف كتاب القانون في الطب",
+    "القاهرة",
+    "تقع القاهرة على ضفاف نهر النيل",
+    "الرياض هي عاصمة المملكة العربية السعودية"
+]
+
+
+@pytest.mark.parametrize('count', [1, 3, len(TEXTS)])
+def test_ngram_jaccard_many_matches_pairwise(count):
+    shingles = [hashed_shingles(text.split()) for text in TEXTS]
+    for query in shingles:
+        expected = [ngram_jaccard(query, other) for other in shingles[:count]]
+        assert ngram_jaccard_many(query, shingles[:count]).tolist() == pytest.approx(expected, abs=1e-12)
@@ -0,0 +1,67 @@
+import pytest
+
+from advanced_text_processor import AdvancedArabicProcessor
+from smart_answer_generator import SmartAnswerGenerator
+from stub_models import StubEncoder
+
+
+class CountingEncoder(StubEncoder):
+    def __init__(self):
+        super().__init__()
+        self.inputs = 0
+
+    def encode(self, sentences, **kwargs):
+        self.inputs += 1 if isinstance(sentences, str) else len(sentences)
+        return super().encode(sentences, **kwargs)
+
+
+@pytest.fixture
+def encoder(monkeypatch):
+    encoder = CountingEncoder()
+    monkeypatch.setattr(AdvancedArabicProcessor, 'sentence_model', property(lambda self: encoder))
+    return encoder
+
+
+CANDIDATES = [
+    {'text': 'القاهرة هي عاصمة مصر وأكبر مدنها. تقع القاهرة على ضفاف نهر النيل'},
+    {'text': 'عاصمة مصر هي القاهرة وأكبر مدنها. يبلغ طول نهر النيل نحو 6650 كيلومتراً'}
+]
+
+
+def test_similarity_matrix_reuses_precomputed_embeddings(encoder):
+    processor = AdvancedArabicProcessor()
+    texts = [candidate['text'] for candidate in CANDIDATES]
+    expected = processor.calculate_similarity_matrix(texts, texts)
+
+    embeddings = processor.embed_texts(texts)
+    encoder.inputs = 0
+    assert processor.calculate_similarity_matrix(texts, texts, embeddings) == expected
+    assert encoder.inputs == 0
+
+
+def test_combine_answers_reuses_sentence_embeddings(encoder):
+    generator = SmartAnswerGenerator()
+    expected = generator.combine_answers(CANDIDATES)
+
+    sentences = [s for c in CANDIDATES for s in generator.split_answer_sentences(c['text'])]
+    embeddings = generator.text_processor.embed_texts(sentences)
+    encoder.inputs = 0
+    assert generator.combine_answers(CANDIDATES, embeddings) == expected
+    assert encoder.inputs == 0
+
+
+def test_select_best_answer_does_not_embed_sentences_up_front(encoder, monkeypatch):
+    generator = SmartAnswerGenerator()
+    calls = []
+    embed_texts = generator.text_processor.embed_texts
+    monkeypatch.setattr(generator.text_processor, 'embed_texts', lambda texts: calls.append(texts) or embed_texts(texts))
+
+    answers = [dict(candidate, source='extracted', method='extraction') for candidate in CANDIDATES]
+    question = 'ما هي عاصمة مصر؟'
+    question_info = generator.text_processor.extract_question_type(question)
+    matcher = generator.text_processor.build_question_matcher(question_info)
+    generator.select_best_answer(question, ['القاهرة هي عاصمة مصر.'], answers, question_info, matcher)
+
+    sentences = {s for c in CANDIDATES for s in generator.split_answer_sentences(c['text'])}
+    assert len(calls) == 1
+    assert not sentences & set(calls[0])